@@ -3,24 +3,82 @@ Real-time Gesture Recognition for MPV Media Control
 Uses TensorFlow Lite model for edge deployment on Jetson Nano
 Controls MPV via IPC socket (no external packages needed!)
 """
+import time
 import cv2
 import numpy as np
-import tensorflow as tf
-import json
 import os
-import time
+import sys
 import platform
+import signal
+import threading
 import subprocess
-import socket
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared modules live in PC-TRAINING; on the Nano copy them next to this script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PC-TRAINING'))
+from capture import add_capture_arguments, capture_config_from_args, open_camera, print_probe, probe_capture, roi_box
+from frame_bus import open_bus_capture
+from gesture_decider import DECISION_CONFIG_FILE, MotionTrigger, create_decider, load_decision_config
+from hard_negatives import HardNegativeSink, add_hard_negative_arguments, print_sink_stats, sampling_sender
+from hot_swap import HotSwapBackend, add_hot_swap_arguments
+from inference_backends import BackendError, add_backend_arguments, create_backend
+from model_bundle import DEFAULT_IMG_SIZE, BundleError, load_model_metadata, preprocess_roi
+from mpv_ipc import MPVClient
+from preview_server import PreviewServer, add_preview_arguments
+from sampling_profiler import SamplingProfiler, add_profiler_arguments, install_signal_toggle
+from session_trace import TraceWriter, traced_sender
+from shadow_model import ShadowEvaluator, add_shadow_arguments
+from temporal_head import TemporalHeadError, load_temporal_head
+from tflite_loader import StartupTimer, get_interpreter_class
+
+startup = StartupTimer('media_control_mpv')
 
 # Configuration
-MODEL_PATH = 'gesture_model.tflite'
-MODEL_INFO_PATH = 'model_info.json'
+BUNDLE_PATH = 'gesture_model.gmb'   # Preferred: model + metadata in one file
+MODEL_PATH = 'gesture_model.tflite' # Fallback: bare model + model_info.json
+BACKBONE_PATH = 'gesture_backbone.gmb'  # --backend split: backbone + gesture_head.npz
+STAGE1_PATH = 'gesture_stage1.gmb'  # --backend cascade: stage-1 model, falls back to gesture_model.gmb
 MPV_SOCKET = '/tmp/mpv-socket'
+CAMERA_INDICES = (0, 1)  # Camera indices tried in order
 CONFIDENCE_THRESHOLD = 90.0  # 90%+ confidence required
 COMMAND_COOLDOWN = 0.5  # seconds between commands (for forward/reverse)
 VOLUME_CHANGE_INTERVAL = 0.5  # 0.5 seconds between volume changes
 GESTURE_HOLD_TIME = 0.5  # Must hold gesture for 0.5 seconds before triggering
+MOTION_THRESHOLD = 85.0  # Confidence for swipes from the temporal head
+MOTION_COOLDOWN = 1.0  # Seconds before another swipe may fire
+WARMUP_INVOKES = 3  # Warm-up invokes run while the camera is still negotiating
+PLAYER_CONNECT_TIMEOUT = 3.0  # Seconds to wait for the MPV socket during startup
+CONTROL_SOCKET = '/tmp/gesture-control.sock'  # Default for --control-socket (runtime_control.py)
+DISPLAY_HEIGHT = 480  # Overlays are laid out for 480 lines; smaller capture modes are upscaled for display
+# Socket of a running inference_server.py; when set the model is shared with
+# other scripts and TFLite is never imported here
+INFERENCE_SERVER = os.environ.get('GESTURE_INFERENCE_SERVER')
+
+parser = argparse.ArgumentParser(description="MPV gesture control")
+add_backend_arguments(parser, default_backend='server' if INFERENCE_SERVER else 'tflite')
+if INFERENCE_SERVER:
+    parser.set_defaults(server_socket=INFERENCE_SERVER)
+parser.add_argument('--mpv-socket', default=MPV_SOCKET, help='MPV IPC socket to control')
+parser.add_argument('--frame-bus', default=None,
+                    help='read frames from a frame_bus.py producer instead of opening the camera')
+parser.add_argument('--temporal-head', default=None, metavar='PATH',
+                    help='motion gesture head from train_temporal.py (needs --backend split)')
+parser.add_argument('--trace', default=None, metavar='PATH',
+                    help='record a session trace (frames, probabilities, decisions, commands)')
+parser.add_argument('--decision-config', default=DECISION_CONFIG_FILE, metavar='PATH',
+                    help='per-class thresholds / hold times / cooldowns from tune_decisions.py (used if present)')
+add_hard_negative_arguments(parser)
+add_hot_swap_arguments(parser)
+add_shadow_arguments(parser)
+add_profiler_arguments(parser)
+add_preview_arguments(parser)
+parser.add_argument('--headless', action='store_true',
+                    help='no cv2.imshow window (units without a display); stop with Ctrl+C or SIGTERM')
+parser.add_argument('--control-socket', nargs='?', const=CONTROL_SOCKET, default=None, metavar='PATH',
+                    help='accept runtime_control.py commands (profile, status, model, shadow) on this Unix socket')
+add_capture_arguments(parser, raw=False)  # The full frame is always displayed, so it is converted anyway
+args = parser.parse_args()
 
 # Detect platform
 IS_JETSON = os.path.exists('/etc/nv_tegra_release') or 'tegra' in platform.platform().lower()
@@ -30,156 +88,245 @@ print("=" * 50)
 print("MPV Gesture Control (TFLite)")
 print("=" * 50)
 
-# Load TFLite model
-if not os.path.exists(MODEL_PATH):
-    print(f"\n❌ ERROR: Model file not found: {MODEL_PATH}")
-    print("Please ensure gesture_model.tflite is in the same directory.")
-    exit(1)
+# One persistent IPC connection (commands are only printed in simulation mode,
+# i.e. off the Jetson with no player or fake_mpv.py listening on the socket)
+player = MPVClient(args.mpv_socket, simulate=not IS_JETSON and not os.path.exists(args.mpv_socket))
 
-print(f"\nLoading model: {MODEL_PATH}")
-interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-interpreter.allocate_tensors()
+def send_mpv_command(gesture):
+    """Send command to MPV via IPC socket"""
+    return player.send_gesture(gesture)
 
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
-input_shape = input_details[0]['shape']
-IMG_SIZE = input_shape[1]
+def check_mpv_status():
+    """Check if MPV IPC socket is available"""
+    return player.connected()
 
-print(f"✓ Model loaded successfully")
-print(f"  Input shape: {input_shape}")
-print(f"  Image size: {IMG_SIZE}x{IMG_SIZE}")
+def model_file_for_backend():
+    if args.backend == 'split':
+        return args.model or BACKBONE_PATH
+    if args.backend == 'cascade':
+        return args.model or STAGE1_PATH
+    return args.model or (BUNDLE_PATH if os.path.exists(BUNDLE_PATH) else MODEL_PATH)
 
-# Load class names
-if os.path.exists(MODEL_INFO_PATH):
-    with open(MODEL_INFO_PATH, 'r') as f:
-        model_info = json.load(f)
-        class_names = model_info['class_names']
-    print(f"✓ Loaded class names from {MODEL_INFO_PATH}")
-else:
-    # Fallback to directory listing
-    dataset_path = 'dataset'
-    if os.path.exists(dataset_path):
-        class_names = sorted([d for d in os.listdir(dataset_path) 
-                            if os.path.isdir(os.path.join(dataset_path, d))])
-        print(f"⚠ Using class names from dataset folder")
-    else:
-        class_names = ['forward', 'play', 'reverse', 'stop', 'volume_up']
-        print(f"⚠ Using default class names")
+def planned_img_size():
+    """Model input size read from the metadata only, so the camera can open while the model loads"""
+    if args.backend == 'server':
+        return DEFAULT_IMG_SIZE
+    # The cascade's stage 1 is smaller than the full model that classifies the same ROI
+    model_file = BUNDLE_PATH if args.backend == 'cascade' else model_file_for_backend()
+    try:
+        return load_model_metadata(model_file)['img_size']
+    except (BundleError, OSError, ValueError):
+        return DEFAULT_IMG_SIZE
 
-print(f"  Classes: {class_names}")
-print(f"  Platform: {PLATFORM_NAME}")
-if IS_JETSON:
-    print(f"  MPV Socket: {MPV_SOCKET}")
-    print("\n⚠ IMPORTANT: Start MPV with IPC socket:")
-    print("  mpv --input-ipc-server=/tmp/mpv-socket --loop video.mp4")
-print("\nPress 'q' to quit")
-print("=" * 50 + "\n")
+def load_model():
+    """
+    Load and verify the model through the selected backend, then warm it up.
+    Returns the backend; its predict() maps a preprocessed batch to class probabilities.
+    """
+    model_file = model_file_for_backend()
+    if args.backend in ('tflite', 'split', 'cascade'):
+        startup.timed('import', get_interpreter_class)  # tflite_runtime if installed, else TensorFlow
+    backend = startup.timed('load', create_backend, args.backend, model_file,
+                            threads=args.threads, socket_path=args.server_socket, head_path=args.head)
+    start = time.time()
+    for _ in range(WARMUP_INVOKES):
+        backend.warm_up()
+    startup.record('warm_up', time.time() - start)
+    return backend
 
-# MPV command mappings (JSON IPC format)
-MPV_COMMANDS = {
-    'play': {'command': ['cycle', 'pause']},
-    'stop': {'command': ['cycle', 'pause']},  # Pause instead of stop
-    'forward': {'command': ['seek', '10']},   # Skip forward 10 seconds
-    'reverse': {'command': ['seek', '-10']},  # Skip backward 10 seconds
-    'volume_up': {'command': ['add', 'volume', '10']}     # Increase volume by 10%
-}
-
-def send_mpv_command(gesture):
-    """Send command to MPV via IPC socket"""
-    if gesture not in MPV_COMMANDS:
-        return False
-    
-    if IS_JETSON:
-        sock = None
-        try:
-            # Connect to MPV socket
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.settimeout(1.0)
-            sock.connect(MPV_SOCKET)
-            
-            # Send JSON command
-            command = json.dumps(MPV_COMMANDS[gesture]) + '\n'
-            sock.sendall(command.encode('utf-8'))
-            
-            # Read response to avoid broken pipe
-            try:
-                sock.recv(1024)
-            except:
-                pass
-            
-            return True
-        except (socket.error, FileNotFoundError, ConnectionRefusedError, OSError):
+def connect_player():
+    """Wait briefly for the MPV IPC socket so the first command does not fail"""
+    deadline = time.time() + PLAYER_CONNECT_TIMEOUT
+    while not player.connect(force=True):
+        if time.time() >= deadline:
             return False
-        finally:
-            if sock:
-                try:
-                    sock.close()
-                except:
-                    pass
+        time.sleep(0.2)
+    return True
+
+def open_capture():
+    """Open the camera with the capture flags, then time a few frames for the latency report"""
+    cap, index, frame = startup.timed('camera', open_camera, CAMERA_INDICES, config=capture_config)
+    probe = None
+    if cap is not None and args.capture_probe:
+        probe = startup.timed('capture_probe', probe_capture, cap, args.capture_probe)
+        if probe['frame'] is not None:
+            frame = probe['frame']
+    return cap, index, frame, probe
+
+try:
+    capture_config = capture_config_from_args(args, planned_img_size())
+except ValueError as e:
+    print(f"❌ ERROR: {e}")
+    exit(1)
+
+# Initialize model, camera and player link concurrently: TFLite and OpenCV
+# release the GIL, so model load and warm-up overlap camera format negotiation
+print("\nInitializing model, camera and MPV connection in parallel...")
+with ThreadPoolExecutor(max_workers=3) as executor:
+    model_future = executor.submit(load_model)
+    if args.frame_bus:
+        camera_future = executor.submit(lambda: startup.timed('camera', open_bus_capture, args.frame_bus) + (None,))
     else:
-        # Simulation mode on Windows
-        print(f"  [SIMULATION] Would send: {MPV_COMMANDS[gesture]}")
-        return True
+        camera_future = executor.submit(open_capture)
+    player_future = executor.submit(startup.timed, 'player', connect_player)
+    cap, camera_index, first_frame, capture_probe = camera_future.result()
+    mpv_ready = player_future.result()
+    try:
+        backend = model_future.result()
+    except (BackendError, BundleError) as e:
+        print(f"\n❌ ERROR: Refusing model: {e}")
+        print("Please ensure gesture_model.gmb (or gesture_model.tflite) is in the same directory.")
+        if cap is not None:
+            cap.release()
+        exit(1)
+startup.mark('init')
 
-def check_mpv_status():
-    """Check if MPV IPC socket is available"""
-    if IS_JETSON:
-        sock = None
-        try:
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.settimeout(0.5)
-            sock.connect(MPV_SOCKET)
-            return True
-        except (socket.error, FileNotFoundError, ConnectionRefusedError, OSError):
-            return False
-        finally:
-            if sock:
-                try:
-                    sock.close()
-                except:
-                    pass
+if cap is None:
+    if args.frame_bus:
+        print(f"❌ ERROR: No frames on bus '{args.frame_bus}' (is frame_bus.py running?)")
     else:
-        return True  # Always true in simulation mode
+        print(f"❌ ERROR: Cannot open camera (tried {list(CAMERA_INDICES)})")
+    exit(1)
+
+model_metadata = backend.metadata
+IMG_SIZE = backend.img_size
+PREPROCESSING = backend.preprocessing
+class_names = backend.classes
+
+print(f"✓ Model loaded: {backend.describe()}")
+print(f"  Input shape: {model_metadata['input_spec']['shape']}")
+print(f"  Image size: {IMG_SIZE}x{IMG_SIZE} ({PREPROCESSING['color_order']})")
+print(f"✓ Loaded class names from {model_metadata['source']}")
+print(f"  Classes: {class_names}")
+if args.frame_bus:
+    print(f"✓ Camera {camera_index} opened (shared frame bus)")
+else:
+    print(f"✓ Camera {camera_index} opened: {cap.describe()}")
+    if capture_probe is not None:
+        print_probe(capture_probe)
+roi_size = roi_box(first_frame.shape)[2]
+print(f"  ROI: {roi_size}x{roi_size} → {IMG_SIZE}x{IMG_SIZE}")
+if roi_size < IMG_SIZE:
+    print("  ⚠ ROI is smaller than the model input (upsampled); use a larger --capture-size")
+print(f"  Platform: {PLATFORM_NAME}")
+if IS_JETSON:
+    print(f"  MPV Socket: {args.mpv_socket} ({'connected' if mpv_ready else 'not available yet'})")
+    if not mpv_ready:
+        print("\n⚠ IMPORTANT: Start MPV with IPC socket:")
+        print(f"  mpv --input-ipc-server={args.mpv_socket} --loop video.mp4")
+print("\nPress Ctrl+C to quit" if args.headless else "\nPress 'q' to quit")
+print("=" * 50 + "\n")
 
 def preprocess_frame(frame, x, y, w, h):
     """Extract ROI and preprocess for model"""
-    roi = frame[y:y+h, x:x+w]
-    roi_resized = cv2.resize(roi, (IMG_SIZE, IMG_SIZE))
-    roi_normalized = roi_resized.astype(np.float32) / 255.0
-    roi_input = np.expand_dims(roi_normalized, axis=0)
-    return roi_input
+    return preprocess_roi(frame[y:y+h, x:x+w], IMG_SIZE, PREPROCESSING)
 
 def predict_gesture(roi_input):
-    """Run inference with TFLite model"""
-    interpreter.set_tensor(input_details[0]['index'], roi_input)
-    interpreter.invoke()
-    output_data = interpreter.get_tensor(output_details[0]['index'])
+    """Run inference through the selected backend; returns (gesture, confidence %, probabilities)"""
+    start = time.perf_counter()
+    output_data = backend.predict(roi_input)
+    if shadow is not None:
+        shadow.offer(roi_input, output_data, time.perf_counter() - start)
     
     predicted_class = np.argmax(output_data[0])
     confidence = output_data[0][predicted_class] * 100
     
-    return class_names[predicted_class], confidence
+    return class_names[predicted_class], confidence, output_data[0]
 
-# Initialize camera
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("❌ ERROR: Cannot open camera")
+# Motion gestures: temporal head over the embeddings the split backend already keeps
+temporal_head = None
+if args.temporal_head:
+    try:
+        if backend.name != 'split':
+            raise TemporalHeadError("motion gestures need --backend split (per-frame embeddings)")
+        temporal_head = load_temporal_head(args.temporal_head)
+        if temporal_head.embedding_dim != backend.embedding_dim:
+            raise TemporalHeadError(f"head expects {temporal_head.embedding_dim}-d embeddings, "
+                                    f"backbone outputs {backend.embedding_dim}")
+    except TemporalHeadError as e:
+        print(f"❌ ERROR: Refusing temporal head: {e}")
+        cap.release()
+        exit(1)
+    print(f"✓ Motion gestures: {temporal_head.classes} "
+          f"({temporal_head.steps} steps over {temporal_head.duration}s)")
+
+# Tracking variables
+try:
+    decision_config = load_decision_config(args.decision_config)
+except (OSError, ValueError) as e:
+    print(f"❌ ERROR: Refusing decision config: {e}")
+    cap.release()
     exit(1)
+decider = create_decider(decision_config, confidence_threshold=CONFIDENCE_THRESHOLD, hold_time=GESTURE_HOLD_TIME,
+                         command_cooldown=COMMAND_COOLDOWN, volume_interval=VOLUME_CHANGE_INTERVAL)
+if decision_config:
+    print(f"✓ Per-class decisions from {args.decision_config}: " + ", ".join(
+        f"{name} {decider.threshold_for(name):.0f}%/{decider.hold_time_for(name):.2f}s"
+        for name in decider.class_config))
+motion = MotionTrigger(MOTION_THRESHOLD, MOTION_COOLDOWN)
+trace = None
+send_command = send_mpv_command
+if args.trace:
+    trace = TraceWriter(args.trace, class_names, IMG_SIZE, PREPROCESSING, decider=decider,
+                        extra={'model': backend.model_path, 'backend': backend.name})
+    send_command = traced_sender(trace, send_mpv_command)
+    print(f"✓ Recording session trace to {args.trace}")
+sink = None
+if args.hard_negatives:
+    sink = HardNegativeSink(class_names, args.hard_negatives, max_per_hour=args.hard_negative_rate)
+    send_command = sampling_sender(sink, send_command)
+    print(f"✓ Saving hard negatives to {args.hard_negatives} (up to {args.hard_negative_rate:.0f}/hour)")
 
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+# Model hot-swap: a new model file (or a control command) is loaded and validated in the
+# background and replaces the running one between frames
+if args.backend != 'server':  # The server owns its model
+    backend = HotSwapBackend(backend, lambda path: create_backend(
+        args.backend, path, threads=args.threads, socket_path=args.server_socket, head_path=args.head),
+        watch=args.watch_model)
+    if args.watch_model:
+        print(f"✓ Watching {backend.model_path} for a new model (deploy with mv, not cp over it)")
 
-# Tracking variables
-last_command_time = 0
-last_volume_change_time = 0
-gesture_start_time = None  # Time when current gesture started being detected
-current_stable_gesture = None  # Currently stable gesture
-last_detected_gesture = None
+# Shadow model: a candidate classifies a sample of the same frames on a CPU-capped thread, never actuating
+shadow = None
+if args.shadow:
+    try:
+        shadow = ShadowEvaluator(lambda: create_backend('auto', args.shadow, threads=args.shadow_threads),
+                                 backend, args.shadow_fraction, args.shadow_cpu, args.shadow_threads,
+                                 threshold_for=decider.threshold_for, log_path=args.shadow_log)
+    except ValueError as e:
+        print(f"❌ ERROR: {e}")
+        cap.release()
+        exit(1)
+    print(f"✓ Shadow model {args.shadow} loading in the background (reports to {args.shadow_log})")
+
+def runtime_status(message):
+    """runtime_control.py 'status': read-only snapshot of the frame loop"""
+    return {'fps': round(fps, 1), 'latency_ms': round(latency_ms, 1), 'backend': backend.name,
+            'model': backend.model_path, 'mpv_connected': player.sock is not None,
+            'commands_sent': player.sent, 'commands_failed': player.failed}
+
+# Sampling profiler: idle (no thread) until toggled by signal or control command
+profiler = SamplingProfiler('media_control_mpv', args.profile_rate, args.profile_dir)
+if install_signal_toggle(profiler):
+    print(f"✓ Profiler: kill -USR2 {os.getpid()} to start/stop (dumps to {args.profile_dir}/)")
+control = None
+if args.control_socket:
+    from runtime_control import ControlServer  # Unix sockets only; not needed otherwise
+    control = ControlServer(args.control_socket)
+    control.register('profile', profiler.handle_command)
+    control.register('status', runtime_status)
+    if isinstance(backend, HotSwapBackend):
+        control.register('model', backend.handle_command)
+    if shadow is not None:
+        control.register('shadow', shadow.handle_command)
+    control.start()
+    print(f"✓ Control socket: {args.control_socket} (python3 runtime_control.py --socket {args.control_socket} help)")
 fps_start_time = time.time()
 fps_frame_count = 0
 fps = 0
 latency_ms = 0  # End-to-end latency in milliseconds
-is_playing = True  # Track video playback state (starts playing)
+pending_frame = first_frame  # Frame read while opening the camera
+first_action_reported = False
 
 print("\n🎥 Camera ready! Show gestures in the green box.\n")
 print("📺 Control Settings:")
@@ -189,8 +336,24 @@ print("   • Forward/Reverse: ±10 seconds")
 print("   • Volume: ±10% (1.5-second delay between changes)")
 print("   • Play/Stop: State-based control\n")
 
-while True:
-    ret, frame = cap.read()
+# Headless: no window to press 'q' in, so signals end the loop and the cleanup below still runs
+stop_requested = threading.Event()
+if args.headless:
+    signal.signal(signal.SIGINT, lambda *_: stop_requested.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
+preview = None
+if args.preview:
+    try:
+        preview = PreviewServer(args.preview, args.preview_host, args.preview_fps, args.preview_quality)
+        print(f"✓ Preview: {preview.address} (encoded only while someone watches)")
+    except OSError as e:
+        print(f"⚠ Preview server not started: {e}")
+
+while not stop_requested.is_set():
+    if pending_frame is not None:
+        ret, frame, pending_frame = True, pending_frame, None
+    else:
+        ret, frame = cap.read()
     if not ret:
         break
     
@@ -205,10 +368,8 @@ while True:
     frame = cv2.flip(frame, 1)
     h, w, _ = frame.shape
     
-    # Define ROI (center square)
-    roi_size = 300
-    x = (w - roi_size) // 2
-    y = (h - roi_size) // 2
+    # Define ROI (center square, same field of view at every capture size)
+    x, y, roi_size = roi_box(frame.shape)
     
     # Draw ROI
     cv2.rectangle(frame, (x, y), (x + roi_size, y + roi_size), (0, 255, 0), 2)
@@ -218,73 +379,45 @@ while True:
     
     # Preprocess and predict
     roi_input = preprocess_frame(frame, x, y, roi_size, roi_size)
-    gesture, confidence = predict_gesture(roi_input)
+    gesture, confidence, probs = predict_gesture(roi_input)
     
     # End latency measurement
     latency_end = time.time()
     latency_ms = (latency_end - latency_start) * 1000  # Convert to milliseconds
+    current_time = latency_end
     
-    # 3-second hold time check
-    if confidence >= CONFIDENCE_THRESHOLD:
-        # If this is the same gesture as before, continue timing
-        if current_stable_gesture == gesture:
-            if gesture_start_time is not None:
-                hold_duration = current_time - gesture_start_time
-                if hold_duration >= GESTURE_HOLD_TIME:
-                    stable_gesture = gesture
-                else:
-                    stable_gesture = None
-            else:
-                gesture_start_time = current_time
-                stable_gesture = None
-        else:
-            # New gesture detected, reset timer
-            current_stable_gesture = gesture
-            gesture_start_time = current_time
-            stable_gesture = None
-    else:
-        # Confidence too low, reset
-        current_stable_gesture = None
-        gesture_start_time = None
-        stable_gesture = None
+    # Time-to-first-action: process start until the first live frame is classified
+    if not first_action_reported:
+        first_action_reported = True
+        startup.report(model=backend.model_path, backend=backend.name, camera=camera_index, mpv_connected=mpv_ready,
+                       time_to_first_action_ms=round(startup.total() * 1000, 1))
     
-    # Execute command if stable gesture detected
-    current_time = time.time()
-    command_sent = False
+    # Hold time, cooldowns and play/pause state (one timestamp, so traces replay exactly)
+    stable_gesture = decider.observe(gesture, confidence, current_time)
+    command_sent = decider.act(send_command, current_time) is not None
+    motion_sent = None
+    if temporal_head is not None:
+        motion_probs = temporal_head.predict_ring(backend.embeddings)
+        if motion_probs is not None:
+            motion_index = int(np.argmax(motion_probs))
+            motion_sent = motion.update(temporal_head.classes[motion_index], motion_probs[motion_index] * 100,
+                                        send_command, current_time)
+    is_playing = decider.is_playing
+    if trace is not None:
+        trace.frame(current_time, frame[y:y+roi_size, x:x+roi_size], probs, decider)
+    if sink is not None:
+        sink.observe(current_time, frame[y:y+roi_size, x:x+roi_size], probs)
     
-    if stable_gesture:
-        # State-based play/stop control
-        if stable_gesture == 'play' and not is_playing:
-            # Only play if currently paused
-            if send_mpv_command('play'):
-                is_playing = True
-                command_sent = True
-                last_detected_gesture = 'play'
-        elif stable_gesture == 'stop' and is_playing:
-            # Only pause if currently playing
-            if send_mpv_command('stop'):
-                is_playing = False
-                command_sent = True
-                last_detected_gesture = 'stop'
-        # Volume gesture with shorter cooldown (continuous control)
-        elif stable_gesture == 'volume_up':
-            if current_time - last_volume_change_time >= VOLUME_CHANGE_INTERVAL:
-                if send_mpv_command(stable_gesture):
-                    last_volume_change_time = current_time
-                    command_sent = True
-        # Forward/Reverse with cooldown
-        elif stable_gesture in ['forward', 'reverse']:
-            if (current_time - last_command_time >= COMMAND_COOLDOWN and 
-                stable_gesture != last_detected_gesture):
-                if send_mpv_command(stable_gesture):
-                    last_command_time = current_time
-                    last_detected_gesture = stable_gesture
-                    command_sent = True
-    else:
-        # Reset last detected gesture for forward/reverse when no stable gesture
-        if current_time - last_command_time > COMMAND_COOLDOWN:
-            if last_detected_gesture in ['forward', 'reverse']:
-                last_detected_gesture = None
+    if args.headless and (command_sent or motion_sent):
+        print(f"  -> {(motion_sent or stable_gesture).upper()}")
+    # Everything below only draws the view: skipped when headless and nobody watches the preview
+    if args.headless and not (preview is not None and preview.wants_frame(now=current_time)):
+        continue
+    
+    if h < DISPLAY_HEIGHT:
+        scale = DISPLAY_HEIGHT / h
+        frame = cv2.resize(frame, (int(w * scale), DISPLAY_HEIGHT), interpolation=cv2.INTER_NEAREST)
+        h, w = frame.shape[:2]
     
     # Check MPV status
     mpv_running = check_mpv_status()
@@ -321,12 +454,11 @@ while True:
         text = f"Gesture: {gesture} ({confidence:.1f}%) ✓ READY"
         color = (0, 255, 0)
     else:
-        if confidence >= CONFIDENCE_THRESHOLD and gesture_start_time is not None:
-            hold_duration = current_time - gesture_start_time
-            remaining = GESTURE_HOLD_TIME - hold_duration
+        if confidence >= decider.threshold_for(gesture) and decider.gesture_start_time is not None:
+            remaining = decider.hold_remaining(current_time)
             text = f"Hold: {gesture} ({confidence:.1f}%) → {remaining:.1f}s to trigger"
             color = (255, 165, 0)  # Orange when holding
-        elif confidence >= CONFIDENCE_THRESHOLD:
+        elif confidence >= decider.threshold_for(gesture):
             text = f"Detecting: {gesture} ({confidence:.1f}%)"
             color = (255, 165, 0)
         else:
@@ -341,15 +473,47 @@ while True:
         cv2.putText(frame, f"-> {action_text}!", 
                    (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
     
+    if motion_sent:
+        info_y += 35
+        cv2.putText(frame, f"-> {motion_sent.upper()}!",
+                   (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    
     # Instructions
     cv2.putText(frame, "Press 'q' to quit | Hold gesture 1.5s at 90%+ confidence", (10, h - 20),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
     
+    if preview is not None and preview.wants_frame(now=current_time):
+        preview.publish(frame)
+    if args.headless:
+        continue
     cv2.imshow('MPV Gesture Control', frame)
     
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
 cap.release()
-cv2.destroyAllWindows()
+if preview is not None:
+    preview.close()
+if control is not None:
+    control.close()
+if profiler.running():
+    profiler.stop()
+if backend.name == 'cascade':
+    stats = backend.stats()
+    print(f"✓ Cascade: {stats['frames']} frames, {stats['background_exits']} background + "
+          f"{stats['gesture_exits']} pose exits at stage 1, full model on {stats['full_rate'] * 100:.1f}%")
+if isinstance(backend, HotSwapBackend) and (backend.swaps or backend.rejected):
+    print(f"✓ Model swaps: {backend.swaps} ({backend.rollbacks} rolled back), {backend.rejected} rejected")
+if shadow is not None:
+    shadow.close()
+backend.close()
+player.close()
+if trace is not None:
+    trace.close()
+    print(f"✓ Session trace saved: {args.trace}")
+if sink is not None:
+    sink.close()
+    print_sink_stats(sink)
+if not args.headless:
+    cv2.destroyAllWindows()
 print("\n✓ Gesture control stopped.")
@@ -0,0 +1,396 @@
+"""
+Multi-Camera, Multi-Player Gesture Control
+
+One process serves N camera/player pairs (one per kiosk screen). Each
+camera is read by its own thread so a slow device never stalls the others;
+every tick the newest ROI of each stream is stacked into one batch and
+classified with a single invoke, then routed to that stream's own
+GestureDecider and MPV socket. The cameras are not in phase, so most ticks
+carry fewer frames than streams; the TFLite backend keeps one interpreter
+per batch bucket (1, 2, 4, ..., N) so such a tick is not padded to N images.
+
+Usage:
+    python3 multi_stream_control.py --stream 0=/tmp/mpv-socket-0 --stream 1=/tmp/mpv-socket-1
+    python3 multi_stream_control.py --stream bus:gesture-frames=/tmp/mpv-socket --display
+    python3 multi_stream_control.py --benchmark 4      # invoke cost for batch sizes 1..4
+
+A stream source is a camera index or bus:NAME for a frame_bus.py producer.
+"""
+import time
+import cv2
+import numpy as np
+import os
+import sys
+import platform
+import argparse
+import threading
+
+# Shared modules live in PC-TRAINING; on the Nano copy them next to this script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PC-TRAINING'))
+from capture import (add_capture_arguments, capture_config_from_args, open_camera, print_probe, probe_capture,
+                     roi_box, to_bgr)
+from frame_bus import open_bus_capture
+from gesture_decider import DECISION_CONFIG_FILE, create_decider, load_decision_config
+from hard_negatives import (STORE_LIMIT_MB, HardNegativeSink, add_hard_negative_arguments, print_sink_stats,
+                            sampling_sender)
+from hot_swap import HotSwapBackend, add_hot_swap_arguments
+from inference_backends import BackendError, add_backend_arguments, backend_from_args, create_backend
+from model_bundle import BundleError, preprocess_roi
+from mpv_ipc import MPVClient
+from preview_server import PreviewServer, add_preview_arguments
+from sampling_profiler import SamplingProfiler, add_profiler_arguments, install_signal_toggle
+from session_trace import TraceWriter, traced_sender
+from shadow_model import ShadowEvaluator, add_shadow_arguments
+
+# Configuration
+CONFIDENCE_THRESHOLD = 90.0  # 90%+ confidence required
+COMMAND_COOLDOWN = 0.5  # seconds between commands (for forward/reverse)
+VOLUME_CHANGE_INTERVAL = 0.5  # seconds between volume changes
+GESTURE_HOLD_TIME = 0.5  # Must hold gesture for 0.5 seconds before triggering
+IDLE_SLEEP = 0.002  # Seconds to wait when no stream has a new frame
+STATS_INTERVAL = 5.0  # Seconds between throughput reports
+CONTROL_SOCKET = '/tmp/gesture-control.sock'  # Default for --control-socket (runtime_control.py)
+
+IS_JETSON = os.path.exists('/etc/nv_tegra_release') or 'tegra' in platform.platform().lower()
+
+
+class Stream:
+    """One camera feeding one player, with its own decision state"""
+
+    def __init__(self, name, cap, socket_path, first_frame=None, decision_config=None):
+        self.name = name
+        self.cap = cap
+        # Off the Jetson, real IPC is used only if a player (or fake_mpv.py) is listening
+        self.player = MPVClient(socket_path, simulate=not IS_JETSON and not os.path.exists(socket_path))
+        self.decider = create_decider(decision_config, confidence_threshold=CONFIDENCE_THRESHOLD,
+                                      hold_time=GESTURE_HOLD_TIME, command_cooldown=COMMAND_COOLDOWN,
+                                      volume_interval=VOLUME_CHANGE_INTERVAL)
+        self.lock = threading.Lock()
+        self.latest = first_frame
+        self.captured = 0 if first_frame is None else 1
+        self.taken = 0
+        self.running = True
+        self.last_result = None
+        self.trace = None
+        self.sink = None
+        self.send = self.player.send_gesture
+        self.thread = threading.Thread(target=self._capture_loop, name=f"capture-{name}", daemon=True)
+        self.thread.start()
+
+    def _capture_loop(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                print(f"⚠ Stream {self.name}: camera read failed")
+                self.running = False
+                break
+            # Camera reads release the GIL, so all streams capture in parallel
+            with self.lock:
+                self.latest = frame
+                self.captured += 1
+
+    def take(self):
+        """Newest frame if it has not been classified yet, else None"""
+        with self.lock:
+            if self.captured == self.taken:
+                return None
+            self.taken = self.captured
+            return self.latest
+
+    def record(self, path, backend):
+        """Start a session trace for this stream"""
+        self.trace = TraceWriter(path, backend.classes, backend.img_size, backend.preprocessing,
+                                 decider=self.decider,
+                                 extra={'model': backend.model_path, 'stream': self.name,
+                                        'mpv_socket': self.player.socket_path})
+        self.send = traced_sender(self.trace, self.player.send_gesture)
+
+    def sample(self, root, classes, max_per_hour, store_limit_mb):
+        """Save this stream's hard negatives (call after record() so commands are traced too)"""
+        self.sink = HardNegativeSink(classes, root, max_per_hour=max_per_hour, store_limit_mb=store_limit_mb)
+        self.send = sampling_sender(self.sink, self.send)
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=1.0)
+        self.cap.release()
+        self.player.close()
+        if self.trace is not None:
+            self.trace.close()
+        if self.sink is not None:
+            self.sink.close()
+            print_sink_stats(self.sink, f"Stream {self.name} hard negatives")
+
+
+def center_roi(frame):
+    """Mirrored center square (same view the single-stream controller uses); raw frames are converted here"""
+    x, y, size = roi_box(frame.shape)
+    return cv2.flip(to_bgr(frame, (x, y, size, size)), 1), (x, y, size)
+
+
+def parse_stream(spec):
+    """'SOURCE=SOCKET' where SOURCE is a camera index or bus:NAME"""
+    source, sep, socket_path = spec.partition('=')
+    if not sep or not socket_path:
+        raise argparse.ArgumentTypeError(f"expected SOURCE=MPV_SOCKET, got {spec!r}")
+    return source, socket_path
+
+
+def open_stream(source, socket_path, decision_config=None, capture_config=None, probe_frames=0):
+    if source.startswith('bus:'):
+        cap, _, first_frame = open_bus_capture(source[4:])
+    else:
+        cap, _, first_frame = open_camera((int(source),), config=capture_config)
+    if cap is None:
+        return None
+    if not source.startswith('bus:'):
+        print(f"  Camera {source}: {cap.describe()}")
+        if probe_frames:
+            probe = probe_capture(cap, probe_frames)
+            print_probe(probe, indent="    ")
+            first_frame = probe['frame'] if probe['frame'] is not None else first_frame
+    return Stream(source, cap, socket_path, first_frame, decision_config)
+
+
+def run_benchmark(backend, max_streams, repeats=50):
+    """Invoke cost per batch size: total should grow much slower than the stream count"""
+    print(f"\n{'streams':>8} {'ms/tick':>10} {'ms/stream':>10}")
+    single = None
+    for n in range(1, max_streams + 1):
+        batch = np.random.rand(n, backend.img_size, backend.img_size, 3).astype(np.float32)
+        backend.predict(batch)
+        start = time.time()
+        for _ in range(repeats):
+            backend.predict(batch)
+        elapsed = (time.time() - start) / repeats * 1000
+        single = single or elapsed
+        print(f"{n:>8} {elapsed:>10.2f} {elapsed / n:>10.2f}   ({elapsed / single:.2f}x the cost of one stream)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera, multi-player gesture control")
+    add_backend_arguments(parser, default_backend='tflite')
+    parser.add_argument('--stream', action='append', type=parse_stream, default=[],
+                        help='SOURCE=MPV_SOCKET (repeatable); SOURCE is a camera index or bus:NAME')
+    parser.add_argument('--display', action='store_true', help='show one preview window per stream')
+    parser.add_argument('--trace-dir', default=None,
+                        help='record one session trace per stream into this directory')
+    parser.add_argument('--decision-config', default=DECISION_CONFIG_FILE, metavar='PATH',
+                        help='per-class thresholds / hold times / cooldowns from tune_decisions.py (used if present)')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='N',
+                        help='measure batched invoke cost for 1..N streams and exit')
+    add_hard_negative_arguments(parser)
+    add_hot_swap_arguments(parser)
+    add_shadow_arguments(parser)
+    add_profiler_arguments(parser)
+    add_preview_arguments(parser)
+    parser.add_argument('--control-socket', nargs='?', const=CONTROL_SOCKET, default=None, metavar='PATH',
+                        help='accept runtime_control.py commands (profile, status, model, shadow) on this Unix socket')
+    add_capture_arguments(parser)
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("MPV Gesture Control (multi-stream)")
+    print("=" * 50)
+
+    max_batch = max(len(args.stream), args.benchmark, 1)
+    try:
+        backend = backend_from_args(args, max_batch=max_batch)
+    except (BackendError, BundleError) as e:
+        print(f"\n❌ ERROR: Refusing model: {e}")
+        exit(1)
+    print(f"✓ Model loaded: {backend.describe()} (batch up to {max_batch})")
+
+    if args.benchmark:
+        run_benchmark(backend, args.benchmark)
+        backend.close()
+        return
+    if args.backend != 'server':  # The server owns its model
+        backend = HotSwapBackend(backend, lambda path: create_backend(
+            args.backend, path, max_batch, args.threads, args.server_socket, head_path=args.head),
+            watch=args.watch_model)
+
+    try:
+        decision_config = load_decision_config(args.decision_config)
+    except (OSError, ValueError) as e:
+        print(f"❌ ERROR: Refusing decision config: {e}")
+        backend.close()
+        exit(1)
+    if decision_config:
+        print(f"✓ Per-class decisions from {args.decision_config}: {', '.join(decision_config['classes'])}")
+
+    shadow = None
+    if args.shadow:
+        # Confident agreement uses the same per-class thresholds as the streams' deciders
+        thresholds = create_decider(decision_config, confidence_threshold=CONFIDENCE_THRESHOLD)
+        try:
+            shadow = ShadowEvaluator(lambda: create_backend('auto', args.shadow, max_batch, args.shadow_threads),
+                                     backend, args.shadow_fraction, args.shadow_cpu, args.shadow_threads,
+                                     threshold_for=thresholds.threshold_for, log_path=args.shadow_log)
+        except ValueError as e:
+            print(f"❌ ERROR: {e}")
+            backend.close()
+            exit(1)
+        print(f"✓ Shadow model {args.shadow} loading in the background (reports to {args.shadow_log})")
+
+    try:
+        capture_config = capture_config_from_args(args, backend.img_size)
+    except ValueError as e:
+        print(f"❌ ERROR: {e}")
+        backend.close()
+        exit(1)
+
+    if not args.stream:
+        args.stream = [('0', '/tmp/mpv-socket')]
+    streams = []
+    for source, socket_path in args.stream:
+        stream = open_stream(source, socket_path, decision_config, capture_config, args.capture_probe)
+        if stream is None:
+            print(f"❌ ERROR: Cannot open stream {source}")
+            for opened in streams:
+                opened.close()
+            exit(1)
+        streams.append(stream)
+        if args.trace_dir:
+            os.makedirs(args.trace_dir, exist_ok=True)
+            name = source.replace(':', '-').replace('/', '-')
+            stream.record(os.path.join(args.trace_dir, f"stream-{name}-{time.strftime('%Y%m%d-%H%M%S')}.trace"),
+                          backend)
+        if args.hard_negatives:
+            # Rate and size caps are shared by all streams
+            name = source.replace(':', '-').replace('/', '-')
+            stream.sample(os.path.join(args.hard_negatives, f"stream-{name}"), backend.classes,
+                          args.hard_negative_rate / len(args.stream), STORE_LIMIT_MB / len(args.stream))
+        status = 'connected' if stream.player.connected() else 'not available yet'
+        print(f"✓ Stream {source} → {socket_path} ({status})")
+
+    def runtime_status(message):
+        """runtime_control.py 'status': per-stream counters, read without locking the loop"""
+        return {'backend': backend.name, 'model': backend.model_path,
+                'streams': [{'name': stream.name, 'mpv_socket': stream.player.socket_path,
+                             'running': stream.running, 'frames_captured': stream.captured,
+                             'frames_classified': stream.taken, 'mpv_connected': stream.player.sock is not None,
+                             'commands_sent': stream.player.sent, 'commands_failed': stream.player.failed,
+                             'last': stream.last_result[:2] if stream.last_result else None}
+                            for stream in streams]}
+
+    # Sampling profiler: idle (no thread) until toggled by signal or control command
+    profiler = SamplingProfiler('multi_stream_control', args.profile_rate, args.profile_dir)
+    if install_signal_toggle(profiler):
+        print(f"✓ Profiler: kill -USR2 {os.getpid()} to start/stop (dumps to {args.profile_dir}/)")
+    control = None
+    if args.control_socket:
+        from runtime_control import ControlServer  # Unix sockets only; not needed otherwise
+        control = ControlServer(args.control_socket)
+        control.register('profile', profiler.handle_command)
+        control.register('status', runtime_status)
+        if isinstance(backend, HotSwapBackend):
+            control.register('model', backend.handle_command)
+        if shadow is not None:
+            control.register('shadow', shadow.handle_command)
+        control.start()
+        print(f"✓ Control socket: {args.control_socket}")
+    preview = None
+    if args.preview:
+        try:
+            preview = PreviewServer(args.preview, args.preview_host, args.preview_fps, args.preview_quality)
+            print(f"✓ Preview: {preview.address} (one channel per stream, encoded only while someone watches)")
+        except OSError as e:
+            print(f"⚠ Preview server not started: {e}")
+    print("\nPress Ctrl+C (or 'q' in a preview window) to quit")
+    print("=" * 50 + "\n")
+
+    ticks = frames = 0
+    invoke_time = 0.0
+    padded_start = backend.padded_slots()
+    stats_start = time.time()
+    try:
+        while True:
+            # Newest unclassified frame of each stream
+            active = []
+            for stream in streams:
+                frame = stream.take()
+                if frame is not None:
+                    active.append((stream, frame))
+            if not active:
+                if not any(stream.running for stream in streams):
+                    break
+                time.sleep(IDLE_SLEEP)
+                continue
+
+            rois = [center_roi(frame) for _, frame in active]
+            batch = np.concatenate([preprocess_roi(roi, backend.img_size, backend.preprocessing)
+                                    for roi, _ in rois])
+            start = time.time()
+            probs = backend.predict(batch)  # one invoke for every stream
+            now = time.time()
+            invoke_time += now - start
+            if shadow is not None:
+                shadow.offer(batch, probs, now - start)  # never actuates
+            ticks += 1
+            frames += len(active)
+
+            for (stream, frame), (roi, box), p in zip(active, rois, probs):
+                index = int(np.argmax(p))
+                gesture, confidence = backend.classes[index], float(p[index]) * 100
+                sent = stream.decider.update(gesture, confidence, stream.send, now)
+                if sent:
+                    print(f"  [{stream.name}] -> {sent.upper()}")
+                if stream.trace is not None:
+                    stream.trace.frame(now, roi, p, stream.decider)
+                if stream.sink is not None:
+                    stream.sink.observe(now, roi, p, copy=False)  # center_roi() already copied
+                stream.last_result = (gesture, confidence, box)
+
+            for stream, frame in active:
+                # Annotated view only for a window or a connected preview viewer
+                watched = preview is not None and preview.wants_frame(stream.name, now)
+                if not args.display and not watched:
+                    continue
+                gesture, confidence, (x, y, size) = stream.last_result
+                view = to_bgr(frame, copy=True)
+                cv2.rectangle(view, (x, y), (x + size, y + size), (0, 255, 0), 2)
+                color = (0, 255, 0) if stream.decider.stable_gesture else (255, 165, 0)
+                cv2.putText(view, f"{gesture} ({confidence:.1f}%)", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                if watched:
+                    preview.publish(view, stream.name)
+                if args.display:
+                    cv2.imshow(f"Stream {stream.name}", view)
+            if args.display and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            if now - stats_start >= STATS_INTERVAL:
+                elapsed = now - stats_start
+                padded = max(backend.padded_slots() - padded_start, 0)  # A model swap restarts the count
+                print(f"⏱ {ticks / elapsed:.1f} ticks/s | {frames / max(ticks, 1):.2f} streams/invoke "
+                      f"(+{padded / max(ticks, 1):.2f} padded) | "
+                      f"{invoke_time / max(ticks, 1) * 1000:.1f} ms/invoke | "
+                      f"{invoke_time / max(frames, 1) * 1000:.1f} ms/frame"
+                      + (f" | full model on {backend.stats()['full_rate'] * 100:.0f}%"
+                         if backend.name == 'cascade' else ""))
+                ticks = frames = 0
+                invoke_time = 0.0
+                padded_start = backend.padded_slots()
+                stats_start = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if preview is not None:
+            preview.close()
+        if control is not None:
+            control.close()
+        if profiler.running():
+            profiler.stop()
+        for stream in streams:
+            stream.close()
+        if shadow is not None:
+            shadow.close()
+        backend.close()
+        if args.display:
+            cv2.destroyAllWindows()
+    print("\n✓ Gesture control stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Actuation Benchmark
+
+Measures command round-trip time and throughput of the ways a gesture can
+reach the player:
+
+    socket          persistent MPVClient connection (what the Jetson scripts use)
+    socket-oneshot  new IPC connection per command (the pre-mpv_ipc.py behaviour)
+    playerctl       `playerctl` subprocess per command (MPRIS over D-Bus)
+    dbus            MPRIS method calls on one D-Bus connection (python-dbus),
+                    or a `dbus-send` subprocess per command if python-dbus is missing
+
+Socket paths run against an in-process fake_mpv.py server by default, so the
+delay/fault flags apply to them; pass --socket to measure a real MPV instead.
+playerctl and D-Bus need an MPRIS player (mpv with the mpv-mpris plugin) and
+are skipped when none is found.
+
+Usage:
+    python actuation_benchmark.py
+    python actuation_benchmark.py --count 2000 --clients 4 --delay 0.002 --error-rate 0.01
+    python actuation_benchmark.py --socket /tmp/mpv-socket --paths socket,playerctl,dbus
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from fake_mpv import FakeMPVServer, add_fault_arguments, faults_from_args
+from mpv_ipc import MPVClient
+
+PATHS = ('socket', 'socket-oneshot', 'playerctl', 'dbus')
+GESTURES = ('forward', 'reverse')  # Net-zero seek pair, leaves the player where it was
+COUNT = 500
+WARMUP = 10
+MPRIS_PREFIX = 'org.mpris.MediaPlayer2.'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+MPRIS_PLAYER = 'org.mpris.MediaPlayer2.Player'
+SEEK_STEP = 10  # Seconds, matches mpv_ipc.MPV_COMMANDS
+VOLUME_STEP = 0.1
+
+# Gesture -> playerctl arguments / MPRIS method (same effect as mpv_ipc.MPV_COMMANDS)
+PLAYERCTL_COMMANDS = {
+    'play': ['play-pause'],
+    'stop': ['play-pause'],
+    'forward': ['position', f'{SEEK_STEP}+'],
+    'reverse': ['position', f'{SEEK_STEP}-'],
+    'volume_up': ['volume', f'{VOLUME_STEP}+'],
+    'swipe_left': ['position', f'{SEEK_STEP}-'],
+    'swipe_right': ['position', f'{SEEK_STEP}+'],
+}
+MPRIS_COMMANDS = {
+    'play': ('PlayPause', None),
+    'stop': ('PlayPause', None),
+    'forward': ('Seek', SEEK_STEP * 1000000),
+    'reverse': ('Seek', -SEEK_STEP * 1000000),
+    'volume_up': ('Volume', VOLUME_STEP),
+    'swipe_left': ('Seek', -SEEK_STEP * 1000000),
+    'swipe_right': ('Seek', SEEK_STEP * 1000000),
+}
+
+
+class ActuatorUnavailable(Exception):
+    """Actuation path cannot run on this machine; the benchmark skips it"""
+    pass
+
+
+class OneShotClient:
+    """Opens a fresh IPC connection for every command"""
+
+    def __init__(self, socket_path, timeout):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def send_gesture(self, gesture):
+        client = MPVClient(self.socket_path, timeout=self.timeout)
+        try:
+            return client.send_gesture(gesture)
+        finally:
+            client.close()
+
+    def close(self):
+        pass
+
+
+def _run(cmd, timeout):
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              timeout=timeout).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def find_mpris_player(name='mpv'):
+    """Bus name of a running MPRIS player whose name contains `name`, or None"""
+    if shutil.which('dbus-send') is None:
+        return None
+    try:
+        out = subprocess.run(['dbus-send', '--session', '--print-reply', '--dest=org.freedesktop.DBus',
+                              '/org/freedesktop/DBus', 'org.freedesktop.DBus.ListNames'],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=2.0).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    for token in out.decode('utf-8', 'replace').split('"'):
+        if token.startswith(MPRIS_PREFIX) and name in token[len(MPRIS_PREFIX):]:
+            return token
+    return None
+
+
+class PlayerctlClient:
+    """One `playerctl` process per command"""
+
+    def __init__(self, player, timeout):
+        if shutil.which('playerctl') is None:
+            raise ActuatorUnavailable("playerctl not installed")
+        if player is None:
+            raise ActuatorUnavailable("no MPRIS player on the session bus")
+        self.player = player[len(MPRIS_PREFIX):]
+        self.timeout = timeout
+
+    def send_gesture(self, gesture):
+        if gesture not in PLAYERCTL_COMMANDS:
+            return False
+        return _run(['playerctl', f'--player={self.player}'] + PLAYERCTL_COMMANDS[gesture], self.timeout)
+
+    def close(self):
+        pass
+
+
+class DBusClient:
+    """MPRIS calls over one python-dbus connection"""
+
+    def __init__(self, bus_name, timeout):
+        if bus_name is None:
+            raise ActuatorUnavailable("no MPRIS player on the session bus")
+        try:
+            import dbus
+        except ImportError:
+            raise ActuatorUnavailable("python-dbus not installed")
+        self.dbus = dbus
+        self.timeout = timeout
+        obj = dbus.SessionBus().get_object(bus_name, MPRIS_PATH)
+        self.player = dbus.Interface(obj, MPRIS_PLAYER)
+        self.properties = dbus.Interface(obj, 'org.freedesktop.DBus.Properties')
+
+    def send_gesture(self, gesture):
+        if gesture not in MPRIS_COMMANDS:
+            return False
+        method, value = MPRIS_COMMANDS[gesture]
+        try:
+            if method == 'PlayPause':
+                self.player.PlayPause(timeout=self.timeout)
+            elif method == 'Seek':
+                self.player.Seek(self.dbus.Int64(value), timeout=self.timeout)
+            else:
+                volume = self.properties.Get(MPRIS_PLAYER, 'Volume', timeout=self.timeout)
+                self.properties.Set(MPRIS_PLAYER, 'Volume', self.dbus.Double(float(volume) + value),
+                                    timeout=self.timeout)
+        except self.dbus.exceptions.DBusException:
+            return False
+        return True
+
+    def close(self):
+        pass
+
+
+class DBusSendClient:
+    """One `dbus-send` process per MPRIS call (fallback without python-dbus)"""
+
+    def __init__(self, bus_name, timeout):
+        if bus_name is None:
+            raise ActuatorUnavailable("no MPRIS player on the session bus")
+        self.base = ['dbus-send', '--session', '--print-reply', f'--dest={bus_name}',
+                     f'--reply-timeout={int(timeout * 1000)}', MPRIS_PATH]
+        self.timeout = timeout
+
+    def send_gesture(self, gesture):
+        if gesture not in MPRIS_COMMANDS:
+            return False
+        method, value = MPRIS_COMMANDS[gesture]
+        if method == 'PlayPause':
+            return _run(self.base + [f'{MPRIS_PLAYER}.PlayPause'], self.timeout)
+        if method == 'Seek':
+            return _run(self.base + [f'{MPRIS_PLAYER}.Seek', f'int64:{value}'], self.timeout)
+        # Volume is a property: read it, then write it back one step higher (two processes)
+        try:
+            out = subprocess.run(self.base + ['org.freedesktop.DBus.Properties.Get', f'string:{MPRIS_PLAYER}',
+                                              'string:Volume'],
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=self.timeout).stdout
+            volume = float(out.decode('utf-8', 'replace').split('double')[1].split()[0])
+        except (OSError, subprocess.TimeoutExpired, IndexError, ValueError):
+            return False
+        return _run(self.base + ['org.freedesktop.DBus.Properties.Set', f'string:{MPRIS_PLAYER}',
+                                 'string:Volume', f'variant:double:{volume + value}'], self.timeout)
+
+    def close(self):
+        pass
+
+
+def make_dbus_client(bus_name, timeout):
+    try:
+        return DBusClient(bus_name, timeout)
+    except ActuatorUnavailable as e:
+        if bus_name is None or shutil.which('dbus-send') is None:
+            raise
+        print(f"  ⚠ {e}, using dbus-send per command")
+        return DBusSendClient(bus_name, timeout)
+
+
+def benchmark_path(make_client, gestures, count, clients=1, warmup=WARMUP):
+    """
+    Send `count` gestures split across `clients` threads (each with its own client).
+    Returns latency percentiles (ms), success rate and aggregate throughput.
+    """
+    per_client = max(1, count // clients)
+    latencies = [[] for _ in range(clients)]
+    failures = [0] * clients
+    errors = []
+    ready = threading.Barrier(clients + 1)
+
+    def worker(index):
+        try:
+            client = make_client()
+        except Exception as e:
+            errors.append(e)
+            ready.abort()
+            return
+        try:
+            for i in range(warmup):
+                client.send_gesture(gestures[i % len(gestures)])
+            ready.wait()
+            for i in range(per_client):
+                start = time.perf_counter()
+                ok = client.send_gesture(gestures[i % len(gestures)])
+                latencies[index].append(time.perf_counter() - start)
+                if not ok:
+                    failures[index] += 1
+        except threading.BrokenBarrierError:
+            pass
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        for thread in threads:
+            thread.join()
+        raise errors[0] if errors else ActuatorUnavailable("client setup failed")
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    times = np.array([t for per in latencies for t in per]) * 1000.0
+    total = len(times)
+    return {
+        'commands': total,
+        'clients': clients,
+        'success_rate': (total - sum(failures)) / max(total, 1),
+        'throughput': total / elapsed if elapsed > 0 else 0.0,
+        'mean_ms': float(times.mean()) if total else 0.0,
+        'p50_ms': float(np.percentile(times, 50)) if total else 0.0,
+        'p95_ms': float(np.percentile(times, 95)) if total else 0.0,
+        'p99_ms': float(np.percentile(times, 99)) if total else 0.0,
+        'max_ms': float(times.max()) if total else 0.0,
+    }
+
+
+def print_results(results):
+    print("\n" + "=" * 60)
+    print("ACTUATION BENCHMARK")
+    print("=" * 60)
+    print(f"{'path':<16}{'cmd/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'ok':>8}")
+    for path, result in results.items():
+        if 'skipped' in result:
+            print(f"{path:<16}  skipped: {result['skipped']}")
+            continue
+        print(f"{path:<16}{result['throughput']:>9.0f}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}"
+              f"{result['p99_ms']:>9.3f}{result['max_ms']:>9.2f}{result['success_rate']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MPV actuation paths")
+    parser.add_argument('--paths', default=','.join(PATHS), help=f'comma-separated subset of {",".join(PATHS)}')
+    parser.add_argument('--socket', default=None,
+                        help='MPV IPC socket of a running player (default: start a fake_mpv.py server)')
+    parser.add_argument('--player', default='mpv', help='MPRIS player name for playerctl / D-Bus')
+    parser.add_argument('--gestures', default=','.join(GESTURES), help='gestures sent in rotation')
+    parser.add_argument('--count', type=int, default=COUNT, help='commands per path')
+    parser.add_argument('--clients', type=int, default=1, help='concurrent clients per path')
+    parser.add_argument('--timeout', type=float, default=1.0, help='per-command timeout in seconds')
+    parser.add_argument('--output', default=None, metavar='JSON', help='write results to a JSON file')
+    parser.add_argument('--event-interval', type=float, default=0.05,
+                        help='fake server: seconds between pushed time-pos changes (0 = off)')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        parser.error(f"unknown path(s): {', '.join(unknown)}")
+    gestures = [g.strip() for g in args.gestures.split(',') if g.strip()]
+
+    server = None
+    socket_path = args.socket
+    if socket_path is None and any(p.startswith('socket') for p in paths):
+        socket_path = os.path.join(tempfile.mkdtemp(prefix='fake-mpv-'), 'mpv-socket')
+        server = FakeMPVServer(socket_path, faults_from_args(args), args.event_interval).start()
+        print(f"✓ Fake MPV on {socket_path}")
+    bus_name = None
+    if 'playerctl' in paths or 'dbus' in paths:
+        bus_name = find_mpris_player(args.player)
+        print(f"✓ MPRIS player: {bus_name}" if bus_name else "⚠ No MPRIS player found on the session bus")
+
+    factories = {
+        'socket': lambda: MPVClient(socket_path, timeout=args.timeout),
+        'socket-oneshot': lambda: OneShotClient(socket_path, args.timeout),
+        'playerctl': lambda: PlayerctlClient(bus_name, args.timeout),
+        'dbus': lambda: make_dbus_client(bus_name, args.timeout),
+    }
+    results = {}
+    try:
+        for path in paths:
+            print(f"\n{path}: {args.count} commands, {args.clients} client(s)...")
+            try:
+                results[path] = benchmark_path(factories[path], gestures, args.count, args.clients)
+            except ActuatorUnavailable as e:
+                print(f"  ⚠ Skipped: {e}")
+                results[path] = {'skipped': str(e)}
+    finally:
+        if server is not None:
+            stats = server.stats()
+            server.stop()
+            os.rmdir(os.path.dirname(socket_path))
+            print(f"\n✓ Fake MPV handled {stats['total']} commands, faults injected: {stats['faults']}")
+
+    print_results(results)
+    if args.output:
+        report = {'gestures': gestures, 'count': args.count, 'clients': args.clients,
+                  'socket': args.socket or 'fake_mpv', 'results': results}
+        if server is not None:
+            report['fake_server'] = {'delay': args.delay, 'jitter': args.jitter, 'stats': stats}
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
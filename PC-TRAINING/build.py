@@ -0,0 +1,451 @@
+"""
+Incremental Build Pipeline: train -> compat-fix / convert -> validate -> package
+
+One entry point for the PC side. Every stage runs in its own directory under
+build/ (dataset/, dataset_split.json and the trained .h5 are linked in), so the
+converters no longer overwrite each other's model_info.json, and every stage is
+cached by the content hash of its inputs (scripts, shared modules, dataset
+images, upstream models): unchanged stages are skipped. compat-fix and the
+converter variants only depend on the trained model, so they run as parallel
+processes.
+
+    build/train/            gesture_model.h5
+    build/compat/           gesture_model_jetson.h5, class_names.txt, ...
+    build/convert-<variant>/  bundles, model_info.json, analysis reports
+    build/package/          models + Jetson runtime files + manifest.json
+
+Usage:
+    python build.py                          # everything that is out of date
+    python build.py --model gesture_model.h5 # skip training, convert an existing model
+    python build.py --variants compat --jobs 1
+    python build.py --dry-run                # show which stages would run
+    python build.py --force convert-compat   # rebuild one stage regardless of the cache
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ==================== CONFIGURATION ====================
+BUILD_DIR = "build"
+CACHE_FILE = "build_cache.json"    # Stage keys and output hashes (inside BUILD_DIR)
+HASH_CACHE_FILE = "file_hashes.json"  # sha256 per file, reused while size and mtime match
+DATASET_DIR = "dataset"
+SPLIT_FILE = "dataset_split.json"
+MODEL_FILE = "gesture_model.h5"
+LOG_TAIL = 15                      # Log lines printed when a stage fails
+
+# Modules the training/conversion scripts import (part of every stage key)
+SHARED_MODULES = ["calibration.py", "model_bundle.py", "split_model.py", "model_analyzer.py",
+                  "evaluate_model.py", "dataset_index.py", "tflite_loader.py"]
+
+# Converter variants: script, outputs that must exist, outputs that may be missing
+VARIANTS = {
+    "tflite": {"script": "convert_to_tflite.py",
+               "outputs": ["gesture_model.tflite", "gesture_model.gmb", "model_info.json",
+                           "gesture_backbone.gmb", "gesture_head.npz"],
+               "optional": []},
+    "select": {"script": "create_tflite_model.py",
+               "outputs": ["gesture_model.tflite", "gesture_model.gmb", "model_info.json",
+                           "gesture_backbone.gmb", "gesture_head.npz"],
+               "optional": []},
+    "compat": {"script": "create_compatible_tflite.py",
+               "outputs": ["gesture_model_v1.tflite", "gesture_model_v1.gmb", "model_info.json"],
+               "optional": ["gesture_model_v2.tflite", "gesture_model_v2.gmb",
+                            "gesture_backbone.gmb", "gesture_head.npz"]},
+}
+
+# What goes to the Jetson: models from one variant + the runtimes and every module they import
+PACKAGE_VARIANT = "compat"
+# Package name -> variant output; the runtimes load gesture_model.gmb, so the v1 bundle is renamed
+PACKAGE_MODELS = {"gesture_model.gmb": "gesture_model_v1.gmb", "gesture_backbone.gmb": "gesture_backbone.gmb",
+                  "gesture_head.npz": "gesture_head.npz", "model_info.json": "model_info.json"}
+JETSON_RUNTIMES = ["../JETSON-NANO-PROJECT/media_control_mpv.py", "../JETSON-NANO-PROJECT/multi_stream_control.py"]
+PACKAGE_OPTIONAL = ["gesture_backbone.gmb", "gesture_head.npz", "decision_config.json"]  # Copied when present
+
+
+class BuildError(Exception):
+    """Raised when a stage fails or its outputs are missing"""
+
+
+# ==================== HASHING ====================
+class FileHasher:
+    """
+    Content hashes of files and directory trees. Hashes are cached by
+    (size, mtime), so an unchanged dataset is not re-read on every build.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.cache = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                self.cache = {}
+
+    def file(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.cache.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        self.cache[key] = [stat.st_size, stat.st_mtime, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path):
+        """sha256 of a file, of every file under a directory, or None if missing"""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path, followlinks=True):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).replace(os.sep, "/").encode("utf-8"))
+                digest.update(self.file(full).encode("ascii"))
+        return digest.hexdigest()
+
+    def save(self):
+        _write_json(self.cache_path, self.cache)
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ==================== STAGES ====================
+class Stage:
+    """
+    One cached build step. inputs maps a label to a path (file or directory);
+    the stage key is the hash of all of them plus params, and the stage is up
+    to date when the key matches the cache and the outputs are unchanged.
+    """
+
+    def __init__(self, name, inputs, outputs, run, optional=(), links=None, params=None, requires=()):
+        self.name = name
+        self.directory = os.path.join(BUILD_DIR, name)
+        self.inputs = inputs
+        self.outputs = list(outputs)
+        self.optional = list(optional)
+        self.run = run
+        self.links = links or {}  # name in stage dir -> source path
+        self.params = params or {}
+        self.requires = list(requires)  # Stages whose failure skips this one
+
+    def output_path(self, name):
+        return os.path.join(self.directory, name)
+
+    def key(self, hasher):
+        hashes = {label: hasher.path(path) for label, path in sorted(self.inputs.items())}
+        payload = json.dumps({"stage": self.name, "params": self.params, "inputs": hashes}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def output_hashes(self, hasher):
+        hashes = {}
+        for name in self.outputs + self.optional:
+            digest = hasher.path(self.output_path(name))
+            if digest is not None:
+                hashes[name] = digest
+        return hashes
+
+    def up_to_date(self, hasher, cache):
+        entry = cache.get(self.name)
+        if not entry or entry.get("key") != self.key(hasher):
+            return False
+        return self.output_hashes(hasher) == entry.get("outputs")
+
+    def prepare(self):
+        """Fresh outputs only: stale files from an earlier run must not pass as results"""
+        os.makedirs(self.directory, exist_ok=True)
+        for name in self.outputs + self.optional:
+            if os.path.isfile(self.output_path(name)):
+                os.remove(self.output_path(name))
+        for name, source in self.links.items():
+            link_input(source, self.output_path(name))
+
+    def check_outputs(self):
+        missing = [name for name in self.outputs if not os.path.exists(self.output_path(name))]
+        if missing:
+            raise BuildError(f"{self.name} did not produce {', '.join(missing)}")
+
+
+def link_input(source, target):
+    """Symlink an input into a stage directory (copy where symlinks are not allowed, e.g. Windows)"""
+    source = os.path.abspath(source)
+    if os.path.lexists(target):
+        if os.path.islink(target) and os.path.realpath(target) == os.path.realpath(source):
+            return
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        else:
+            os.remove(target)
+    if not os.path.exists(source):
+        return
+    try:
+        os.symlink(source, target, target_is_directory=os.path.isdir(source))
+    except (OSError, NotImplementedError):
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        else:
+            shutil.copy2(source, target)
+
+
+def run_script(script, env=None):
+    """Stage runner: run a PC-TRAINING script inside the stage directory, output to build.log"""
+    def run(stage):
+        log_path = stage.output_path("build.log")
+        process_env = dict(os.environ, **(env or {}))
+        with open(log_path, "w") as log:
+            code = subprocess.call([sys.executable, "-u", os.path.join(HERE, script)], cwd=stage.directory,
+                                   stdout=log, stderr=subprocess.STDOUT, env=process_env)
+        if code != 0:
+            with open(log_path, "r", errors="replace") as f:
+                tail = "".join(f.readlines()[-LOG_TAIL:])
+            raise BuildError(f"{script} exited with {code}, see {log_path}\n{tail}")
+    return run
+
+
+def validate_variant(variant_stage, classes):
+    """Stage runner: load every bundle of a variant through the runtime backends"""
+    def run(stage):
+        import numpy as np
+        from inference_backends import create_backend
+        results = {}
+        for name in variant_stage.outputs + variant_stage.optional:
+            path = variant_stage.output_path(name)
+            if not name.endswith(".gmb") or not os.path.exists(path):
+                continue
+            backend = create_backend("auto", path)
+            try:
+                if list(backend.classes) != classes:
+                    raise BuildError(f"{name} classes {backend.classes} do not match dataset {classes}")
+                batch = np.zeros((1, backend.img_size, backend.img_size, 3), dtype=np.float32)
+                probs = backend.predict(batch)
+                if probs.shape != (1, len(classes)) or not np.all(np.isfinite(probs)):
+                    raise BuildError(f"{name} returned {probs.shape} outputs for {len(classes)} classes")
+                results[name] = backend.describe()
+            finally:
+                backend.close()
+        if not results:
+            raise BuildError(f"{variant_stage.name} has no bundles to validate")
+        _write_json(stage.output_path("validation.json"), results)
+    return run
+
+
+def package(sources):
+    """Stage runner: copy models and runtime files into one directory with a manifest"""
+    def run(stage):
+        manifest = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": {}}
+        hasher = FileHasher(os.path.join(BUILD_DIR, HASH_CACHE_FILE))
+        for name, source in sources.items():
+            if not os.path.exists(source):
+                continue
+            shutil.copy2(source, stage.output_path(name))
+            manifest["files"][name] = {"source": os.path.relpath(source, HERE), "sha256": hasher.file(source)}
+            if os.path.basename(source) != name:
+                manifest["files"][name]["original_name"] = os.path.basename(source)
+        _write_json(stage.output_path("manifest.json"), manifest)
+    return run
+
+
+def runtime_files(entry_points=JETSON_RUNTIMES):
+    """
+    The runtimes plus every PC-TRAINING module they import, directly or through
+    each other, including imports inside functions (inference_client for
+    --backend server, runtime_control for --control-socket), so the package
+    cannot fall behind the code.
+    """
+    files, pending = [], list(entry_points)
+    while pending:
+        path = pending.pop(0)
+        if path in files:
+            continue
+        files.append(path)
+        with open(os.path.join(HERE, path), "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = name.split(".")[0] + ".py"
+                if os.path.isfile(os.path.join(HERE, module)):
+                    pending.append(module)
+    return files
+
+
+def dataset_classes():
+    return sorted(d for d in os.listdir(DATASET_DIR) if os.path.isdir(os.path.join(DATASET_DIR, d)))
+
+
+def build_stages(model_path, variants):
+    """Stages in phases; stages of one phase are independent and run in parallel"""
+    script_inputs = lambda script: dict({script: script}, **{m: m for m in SHARED_MODULES})
+    data_links = {DATASET_DIR: DATASET_DIR, SPLIT_FILE: SPLIT_FILE}
+    phases = []
+    upstream = []
+
+    if model_path is None:
+        train = Stage("train", dict(script_inputs("train_model.py"), dataset=DATASET_DIR, split=SPLIT_FILE),
+                      [MODEL_FILE], run_script("train_model.py"), links=data_links)
+        phases.append([train])
+        model_path = train.output_path(MODEL_FILE)
+        upstream = [train.name]
+
+    # Conversion runs on the CPU; parallel TF processes would fight over GPU memory
+    cpu_only = {"CUDA_VISIBLE_DEVICES": ""}
+    model_links = dict(data_links, **{MODEL_FILE: model_path})
+    compat = Stage("compat", dict(script_inputs("fix_model_compatibility.py"), model=model_path,
+                                  dataset=DATASET_DIR, split=SPLIT_FILE),
+                   ["gesture_model_jetson.h5", "class_names.txt"],
+                   run_script("fix_model_compatibility.py", cpu_only),
+                   optional=["gesture_model.weights.h5", "model_architecture.json"], links=model_links,
+                   requires=upstream)
+    converts = {}
+    for variant in variants:
+        spec = VARIANTS[variant]
+        converts[variant] = Stage(f"convert-{variant}",
+                                  dict(script_inputs(spec["script"]), model=model_path, dataset=DATASET_DIR,
+                                       split=SPLIT_FILE),
+                                  spec["outputs"], run_script(spec["script"], cpu_only),
+                                  optional=spec["optional"], links=model_links, requires=upstream)
+    phases.append([compat] + list(converts.values()))
+
+    classes = dataset_classes()
+    validates = []
+    for variant, stage in converts.items():
+        inputs = {f"{variant}/{name}": stage.output_path(name) for name in stage.outputs + stage.optional}
+        inputs.update({m: m for m in ("build.py", "inference_backends.py", "model_bundle.py", "split_model.py")})
+        validates.append(Stage(f"validate-{variant}", inputs, ["validation.json"],
+                               validate_variant(stage, classes), params={"classes": classes},
+                               requires=[stage.name]))
+    phases.append(validates)
+
+    if PACKAGE_VARIANT in converts:
+        sources = {name: converts[PACKAGE_VARIANT].output_path(output) for name, output in PACKAGE_MODELS.items()}
+        sources.update({os.path.basename(path): os.path.join(HERE, path) for path in runtime_files()})
+        sources["decision_config.json"] = os.path.join(HERE, "decision_config.json")
+        phases.append([Stage("package", dict(sources, validated=os.path.join(
+                                 BUILD_DIR, f"validate-{PACKAGE_VARIANT}", "validation.json")),
+                             [name for name in sources if name not in PACKAGE_OPTIONAL], package(sources),
+                             optional=PACKAGE_OPTIONAL, params={"variant": PACKAGE_VARIANT},
+                             requires=[f"validate-{PACKAGE_VARIANT}"])])
+    return phases
+
+
+# ==================== RUNNER ====================
+def run_stage(stage, hasher, cache, force):
+    """Returns 'cached', 'built' or raises BuildError"""
+    if not force and stage.up_to_date(hasher, cache):
+        return "cached", 0.0
+    key = stage.key(hasher)
+    stage.prepare()
+    start = time.time()
+    stage.run(stage)
+    stage.check_outputs()
+    seconds = time.time() - start
+    cache[stage.name] = {"key": key, "outputs": stage.output_hashes(hasher),
+                         "finished": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": round(seconds, 1)}
+    return "built", seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached train -> convert -> validate -> package pipeline")
+    parser.add_argument("--model", default=None, help="existing .h5 model (skips the train stage)")
+    parser.add_argument("--variants", default=",".join(VARIANTS),
+                        help=f"converter variants to build ({', '.join(VARIANTS)})")
+    parser.add_argument("--jobs", type=int, default=len(VARIANTS) + 1, help="parallel stage processes")
+    parser.add_argument("--force", nargs="*", default=None, metavar="STAGE",
+                        help="rebuild these stages (all if no names given)")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages are out of date")
+    args = parser.parse_args()
+
+    model_path = os.path.abspath(args.model) if args.model else None
+    os.chdir(HERE)
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown variants {unknown}, choose from {list(VARIANTS)}")
+    if not os.path.isdir(DATASET_DIR):
+        print(f"❌ ERROR: {DATASET_DIR}/ not found (run from PC-TRAINING with a collected dataset)")
+        exit(1)
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    cache_path = os.path.join(BUILD_DIR, CACHE_FILE)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    hasher = FileHasher(os.path.join(BUILD_DIR, HASH_CACHE_FILE))
+    phases = build_stages(model_path, variants)
+    forced = lambda stage: args.force is not None and (not args.force or stage.name in args.force)
+
+    print("=" * 60)
+    print("BUILD PIPELINE")
+    print("=" * 60)
+    if args.dry_run:
+        for phase in phases:
+            for stage in phase:
+                state = "forced" if forced(stage) else \
+                    "up to date" if stage.up_to_date(hasher, cache) else "out of date"
+                print(f"  {stage.name:<18} {state}")
+        print("(later stages are re-checked after their inputs are rebuilt)")
+        hasher.save()
+        return
+
+    failed, skipped = [], []
+    start = time.time()
+    for phase in phases:
+        blocked = [stage for stage in phase if set(stage.requires) & set(failed + skipped)]
+        runnable = [stage for stage in phase if stage not in blocked]
+        for stage in blocked:
+            skipped.append(stage.name)
+            print(f"  ⚠ {stage.name:<18} skipped ({', '.join(stage.requires)} did not build)")
+        if not runnable:
+            continue
+        # Stages of one phase hash, run and record independently; each script is its own process
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = [(stage, pool.submit(run_stage, stage, hasher, cache, forced(stage))) for stage in runnable]
+            for stage, future in futures:
+                try:
+                    state, seconds = future.result()
+                    print(f"  ✓ {stage.name:<18} " + ("cached" if state == "cached" else f"built in {seconds:.1f}s"))
+                except (BuildError, OSError, subprocess.SubprocessError) as e:
+                    failed.append(stage.name)
+                    print(f"  ❌ {stage.name:<18} {e}")
+        _write_json(cache_path, cache)
+        hasher.save()
+
+    print(f"\nTotal: {time.time() - start:.1f}s")
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
+        exit(1)
+    package_dir = os.path.join(BUILD_DIR, "package")
+    if os.path.isdir(package_dir):
+        print(f"✓ Jetson package: {package_dir}/ (scp {package_dir}/* jetson@192.168.1.x:~/)")
+
+
+if __name__ == "__main__":
+    main()
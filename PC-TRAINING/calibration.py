@@ -0,0 +1,251 @@
+"""
+Confidence Calibration
+
+Softmax outputs of a fine-tuned MobileNetV2 head are over-confident, so the
+runtime thresholds (90% on the Jetson, 75% on the PC) do not mean what they
+say. This fits a calibration map on the held-out split and stores it in the
+model metadata ("calibration" in the bundle / model_info.json); every
+inference backend applies it to the model output.
+
+The exported models end in softmax, so calibration works on log-probabilities:
+log p = z - logsumexp(z), and the per-sample constant cancels in the next
+softmax, so temperature scaling of log p is exactly temperature scaling of the
+logits z. Vector scaling (per-class scale + bias) is fitted on log p directly.
+
+    python calibration.py gesture_model.gmb --split dataset_split.json
+    python calibration.py gesture_model.tflite --method vector
+    python calibration.py gesture_backbone.gmb          # split model: stored in the head
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+SPLIT_FILE = "dataset_split.json"
+ECE_BINS = 15
+EPSILON = 1e-12  # Floor for probabilities that underflowed to 0 in float32
+THRESHOLDS = (50.0, 75.0, 90.0)  # Percent, reported before/after calibration
+
+
+# ==================== MATH ====================
+def log_probs(probs):
+    return np.log(np.clip(np.asarray(probs, dtype=np.float64), EPSILON, 1.0))
+
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def nll(logits, labels):
+    """Mean negative log-likelihood of the true labels"""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    log_norm = np.log(np.exp(shifted).sum(axis=1))
+    return float(np.mean(log_norm - shifted[np.arange(len(labels)), labels]))
+
+
+def expected_calibration_error(probs, labels, bins=ECE_BINS):
+    confidences = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == labels
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    ece = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidences > low) & (confidences <= high)
+        if np.any(in_bin):
+            ece += in_bin.mean() * abs(correct[in_bin].mean() - confidences[in_bin].mean())
+    return float(ece)
+
+
+def fit_temperature(probs, labels, low=0.05, high=20.0, iterations=60):
+    """Temperature minimising NLL (golden-section search over log T; NLL is unimodal in T)"""
+    z = log_probs(probs)
+    a, b = np.log(low), np.log(high)
+    ratio = (np.sqrt(5.0) - 1.0) / 2.0
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = nll(z / np.exp(c), labels), nll(z / np.exp(d), labels)
+    for _ in range(iterations):
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = nll(z / np.exp(c), labels)
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = nll(z / np.exp(d), labels)
+    return float(np.exp((a + b) / 2.0))
+
+
+def fit_vector_scaling(probs, labels, steps=500, learning_rate=0.05, l2=1e-3):
+    """Per-class scale and bias on log p by gradient descent, started from the temperature fit"""
+    z = log_probs(probs)
+    n, k = z.shape
+    scale = np.full(k, 1.0 / fit_temperature(probs, labels))
+    bias = np.zeros(k)
+    onehot = np.eye(k)[labels]
+    for _ in range(steps):
+        p = softmax(z * scale + bias)
+        error = (p - onehot) / n
+        scale -= learning_rate * ((error * z).sum(axis=0) + l2 * (scale - scale.mean()))
+        bias -= learning_rate * (error.sum(axis=0) + l2 * bias)
+    return scale.tolist(), bias.tolist()
+
+
+def apply_calibration(probs, calibration):
+    """Calibrated probabilities for raw softmax outputs (returned unchanged without calibration)"""
+    if not calibration:
+        return probs
+    method = calibration.get("method")
+    if method == "temperature":
+        z = log_probs(probs) / calibration["temperature"]
+    elif method == "vector":
+        z = log_probs(probs) * np.asarray(calibration["scale"]) + np.asarray(calibration["bias"])
+    else:
+        return probs
+    return softmax(z).astype(np.float32)
+
+
+def threshold_table(probs, labels, thresholds=THRESHOLDS):
+    """Share of frames accepted at each threshold and how many of those are correct"""
+    confidences = probs.max(axis=1) * 100
+    correct = probs.argmax(axis=1) == labels
+    table = {}
+    for threshold in thresholds:
+        accepted = confidences >= threshold
+        table[str(threshold)] = {
+            "accepted": round(float(accepted.mean()), 4),
+            "precision": round(float(correct[accepted].mean()), 4) if accepted.any() else None,
+        }
+    return table
+
+
+def fit_calibration(probs, labels, method="temperature", source=None):
+    """Fit a calibration map; returns the metadata dict stored with the model"""
+    probs = np.asarray(probs, dtype=np.float64)
+    labels = np.asarray(labels)
+    if method == "vector":
+        scale, bias = fit_vector_scaling(probs, labels)
+        calibration = {"method": "vector", "scale": scale, "bias": bias}
+    else:
+        calibration = {"method": "temperature", "temperature": fit_temperature(probs, labels)}
+    calibrated = apply_calibration(probs, calibration)
+    calibration["fit"] = {
+        "samples": int(len(labels)),
+        "source": source,
+        "nll_before": round(nll(log_probs(probs), labels), 4),
+        "nll_after": round(nll(log_probs(calibrated), labels), 4),
+        "ece_before": round(expected_calibration_error(probs, labels), 4),
+        "ece_after": round(expected_calibration_error(calibrated, labels), 4),
+        "thresholds_before": threshold_table(probs, labels),
+        "thresholds_after": threshold_table(calibrated, labels),
+    }
+    return calibration
+
+
+# ==================== DATA ====================
+def split_predictions(predict, classes, img_size, preprocessing, split_file=SPLIT_FILE,
+                      subset="val", batch_size=32):
+    """Raw probabilities and labels for a split subset, preprocessed like the runtime"""
+    from evaluate_model import load_batch, load_samples
+
+    samples = [(path, classes.index(name)) for path, name in load_samples(split_file=split_file, subset=subset)
+               if name in classes]
+    all_probs, labels = [], []
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        batch, valid = load_batch([path for path, _ in chunk], img_size, preprocessing)
+        if batch is None:
+            continue
+        all_probs.append(np.asarray(predict(batch)))
+        labels.extend(chunk[i][1] for i in valid)
+    if not labels:
+        return None, None
+    return np.concatenate(all_probs), np.asarray(labels)
+
+
+def calibrate_for_export(predict, classes, img_size, preprocessing=None, split_file=SPLIT_FILE,
+                         method="temperature"):
+    """
+    Converter hook: fit on the held-out split with the given predict function.
+    Returns the calibration dict, or None when there is no split file.
+    """
+    from model_bundle import default_preprocessing
+    if not os.path.exists(split_file):
+        print(f"⚠ {split_file} not found - skipping calibration (run dataset_index.py first)")
+        return None
+    probs, labels = split_predictions(predict, classes, img_size,
+                                      preprocessing or default_preprocessing("RGB"), split_file)
+    if probs is None:
+        print("⚠ No validation images found - skipping calibration")
+        return None
+    calibration = fit_calibration(probs, labels, method, source=f"{split_file}:val")
+    print_summary(calibration)
+    return calibration
+
+
+def print_summary(calibration):
+    fit = calibration["fit"]
+    detail = f"T = {calibration['temperature']:.3f}" if calibration["method"] == "temperature" \
+        else "per-class scale + bias"
+    print(f"✓ Calibration ({calibration['method']}, {detail}) on {fit['samples']} images")
+    print(f"  NLL {fit['nll_before']:.4f} → {fit['nll_after']:.4f} | "
+          f"ECE {fit['ece_before']:.4f} → {fit['ece_after']:.4f}")
+    for threshold, after in fit["thresholds_after"].items():
+        before = fit["thresholds_before"][threshold]
+        precision = lambda stats: f"{stats['precision'] * 100:.1f}%" if stats["precision"] is not None else "-"
+        print(f"  ≥{float(threshold):.0f}%: accepts {before['accepted'] * 100:.1f}% → "
+              f"{after['accepted'] * 100:.1f}% of frames, correct {precision(before)} → {precision(after)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit confidence calibration and store it with the model")
+    parser.add_argument("model", help=".gmb, .tflite or .h5 model")
+    parser.add_argument("--split", default=SPLIT_FILE, help="dataset_split.json from dataset_index.py")
+    parser.add_argument("--subset", default="val", choices=["train", "val"])
+    parser.add_argument("--method", default="temperature", choices=["temperature", "vector"])
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not update metadata")
+    args = parser.parse_args()
+
+    from inference_backends import create_backend
+    from model_bundle import is_bundle, update_bundle_metadata
+
+    backend = create_backend(args.backend, args.model, max_batch=32, calibrated=False)
+    print("=" * 60)
+    print(f"CALIBRATING {args.model}")
+    print("=" * 60)
+    probs, labels = split_predictions(backend.predict, backend.classes, backend.img_size,
+                                      backend.preprocessing, args.split, args.subset)
+    head = backend.heads["gesture"] if backend.name == "split" else None
+    backend.close()
+    if probs is None:
+        print("❌ ERROR: No images to calibrate on")
+        exit(1)
+    calibration = fit_calibration(probs, labels, args.method, source=f"{args.split}:{args.subset}")
+    print_summary(calibration)
+    if args.dry_run:
+        return
+
+    if head is not None:
+        # Split models keep calibration with the head, so a new head brings its own
+        from split_model import write_head
+        write_head(head.path, head.weights, head.bias, head.classes, head.activation, calibration,
+                   extra={k: v for k, v in head.metadata.items() if k != "calibration"})
+        print(f"\n✓ Calibration stored in {head.path}")
+        return
+    if is_bundle(args.model):
+        update_bundle_metadata(args.model, calibration=calibration)
+        print(f"\n✓ Calibration stored in {args.model}")
+    info_path = os.path.join(os.path.dirname(os.path.abspath(args.model)), "model_info.json")
+    if os.path.exists(info_path):
+        with open(info_path, "r") as f:
+            info = json.load(f)
+        info["calibration"] = calibration
+        with open(info_path, "w") as f:
+            json.dump(info, f, indent=2)
+        print(f"✓ Calibration stored in {info_path}")
+
+
+if __name__ == "__main__":
+    main()
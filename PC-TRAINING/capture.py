@@ -0,0 +1,344 @@
+"""
+Camera Capture Helpers
+
+open_camera() tries each camera index in turn and only returns once a first
+frame has actually been read, since format negotiation on the first read is
+the slow part of opening a USB camera.
+
+A CaptureConfig selects how frames are produced:
+- backend: OpenCV default, V4L2, or a GStreamer pipeline (built for the
+  device or passed verbatim, e.g. with nvjpegdec on the Jetson)
+- pixel format: MJPG (small USB transfers, JPEG decode) or YUYV (no decode)
+- buffer count: 1 so read() returns the newest frame instead of a queued one
+- size: the smallest mode whose center ROI still covers the model input
+  (capture_size_for), instead of decoding and flipping 640x480 for a 128 px input
+- raw: skip OpenCV's RGB conversion (V4L2 YUYV only); to_bgr() then converts
+  only the ROI that is actually classified
+
+probe_capture() measures frame age from the driver's buffer timestamps, read
+wait and how many stale frames the queue holds.
+
+Usage:
+    python capture.py --capture-backend v4l2 --pixel-format MJPG --capture-size 320x240
+    python capture.py --sweep          # every backend / pixel format combination
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+CAMERA_INDICES = (0, 1)
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+ROI_FRACTION = 300 / 480  # Center square: 300 px at 640x480, the view the models are trained on
+BUFFER_SIZE = 1           # Frames queued in the driver; 1 = always the newest
+# 4:3 modes nearly every UVC camera offers (same field of view as 640x480)
+CAPTURE_MODES = ((160, 120), (320, 240), (640, 480), (800, 600), (1280, 960))
+CAPTURE_BACKENDS = ('auto', 'v4l2', 'gstreamer')
+PIXEL_FORMATS = ('auto', 'MJPG', 'YUYV')
+PROBE_FRAMES = 30         # Frames timed by probe_capture()
+PROBE_PAUSE = 0.2         # Seconds without reading before counting queued stale frames
+MAX_FRAME_AGE = 2.0       # Seconds; larger ages mean the timestamps are not on the monotonic clock
+
+GST_CAPS = {
+    'MJPG': 'image/jpeg,width={width},height={height}{rate} ! jpegdec',
+    'YUYV': 'video/x-raw,format=YUY2,width={width},height={height}{rate}',
+    'auto': 'video/x-raw,width={width},height={height}{rate}',
+}
+GST_PIPELINE = ('v4l2src device=/dev/video{index} ! {caps} ! videoconvert ! video/x-raw,format=BGR ! '
+                'appsink drop=true max-buffers={buffers} sync=false')
+
+
+class CaptureConfig:
+    """How to open a camera; the defaults match a plain cv2.VideoCapture(index)"""
+
+    def __init__(self, backend='auto', pixel_format='auto', width=FRAME_WIDTH, height=FRAME_HEIGHT,
+                 fps=None, buffer_size=None, raw=False, pipeline=None):
+        if backend not in CAPTURE_BACKENDS:
+            raise ValueError(f"Unknown capture backend '{backend}' (expected one of {CAPTURE_BACKENDS})")
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format '{pixel_format}' (expected one of {PIXEL_FORMATS})")
+        if raw:
+            # Raw buffers are only reshaped for V4L2 YUYV
+            backend = 'v4l2' if backend == 'auto' else backend
+            pixel_format = 'YUYV' if pixel_format == 'auto' else pixel_format
+            if backend != 'v4l2' or pixel_format != 'YUYV' or pipeline:
+                raise ValueError("Raw frames need the v4l2 backend with YUYV")
+        self.backend = 'gstreamer' if pipeline else backend
+        self.pixel_format = pixel_format
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.raw = raw
+        self.pipeline = pipeline
+
+    def gstreamer_pipeline(self, index):
+        if self.pipeline:
+            return self.pipeline
+        rate = f",framerate={self.fps}/1" if self.fps else ""
+        caps = GST_CAPS[self.pixel_format].format(width=self.width, height=self.height, rate=rate)
+        return GST_PIPELINE.format(index=index, caps=caps, buffers=self.buffer_size or BUFFER_SIZE)
+
+
+def fourcc_string(value):
+    value = int(value)
+    return ''.join(chr((value >> 8 * i) & 0xFF) for i in range(4)).strip('\0') or '?'
+
+
+class CameraCapture:
+    """cv2.VideoCapture plus the mode that was actually negotiated"""
+
+    def __init__(self, cap, index, config):
+        self.cap = cap
+        self.index = index
+        self.config = config
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.pixel_format = fourcc_string(cap.get(cv2.CAP_PROP_FOURCC)) if config.backend != 'gstreamer' \
+            else config.pixel_format
+        buffers = cap.get(cv2.CAP_PROP_BUFFERSIZE)
+        self.buffer_size = int(buffers) if buffers > 0 else config.buffer_size
+        try:
+            self.backend_name = cap.getBackendName()
+        except (AttributeError, cv2.error):
+            self.backend_name = config.backend
+
+    def read(self, image=None):
+        ret, frame = self.cap.read() if image is None else self.cap.read(image)
+        if ret and self.config.raw and frame.ndim != 3:
+            # Raw V4L2 buffers come back as one row of bytes: YUYV is 2 bytes per pixel
+            if frame.size != self.height * self.width * 2:
+                return False, None  # Camera ignored YUYV (compressed buffer)
+            frame = frame.reshape(self.height, self.width, 2)
+        return ret, frame
+
+    def describe(self):
+        fps = f"@{self.fps:.0f}fps" if self.fps else ""
+        buffers = f", {self.buffer_size} buffer(s)" if self.buffer_size else ""
+        raw = ", raw YUYV" if self.config.raw else ""
+        return f"{self.backend_name} {self.pixel_format} {self.width}x{self.height}{fps}{buffers}{raw}"
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def _open(index, config):
+    if config.backend == 'gstreamer':
+        return cv2.VideoCapture(config.gstreamer_pipeline(index), cv2.CAP_GSTREAMER)
+    cap = cv2.VideoCapture(index, cv2.CAP_V4L2) if config.backend == 'v4l2' else cv2.VideoCapture(index)
+    if not cap.isOpened():
+        return cap
+    # FOURCC before the size: the driver picks the mode list per pixel format
+    if config.pixel_format != 'auto':
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*config.pixel_format))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.height)
+    if config.fps:
+        cap.set(cv2.CAP_PROP_FPS, config.fps)
+    if config.buffer_size:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, config.buffer_size)
+    if config.raw:
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    return cap
+
+
+def open_camera(indices=CAMERA_INDICES, width=FRAME_WIDTH, height=FRAME_HEIGHT,
+                retries=3, retry_delay=0.5, config=None):
+    """
+    Open the first working camera and read one frame from it.
+    Returns (cap, index, first_frame) or (None, None, None) if no camera works;
+    cap is a CameraCapture (config overrides width/height).
+    """
+    config = config or CaptureConfig(width=width, height=height)
+    for attempt in range(retries):
+        for index in indices:
+            cap = _open(index, config)
+            if not cap.isOpened():
+                cap.release()
+                continue
+            cap = CameraCapture(cap, index, config)
+            ret, frame = cap.read()
+            if ret:
+                return cap, index, frame
+            cap.release()
+        if attempt < retries - 1:
+            time.sleep(retry_delay)
+    return None, None, None
+
+
+def capture_size_for(img_size, roi_fraction=ROI_FRACTION, modes=CAPTURE_MODES):
+    """Smallest mode whose center ROI is at least img_size pixels (largest mode if none is)"""
+    for width, height in sorted(modes, key=lambda mode: mode[0] * mode[1]):
+        if int(round(min(width, height) * roi_fraction)) >= img_size:
+            return width, height
+    return max(modes, key=lambda mode: mode[0] * mode[1])
+
+
+def roi_box(frame_shape, roi_fraction=ROI_FRACTION):
+    """(x, y, size) of the center square ROI for a frame of this shape"""
+    h, w = frame_shape[:2]
+    size = min(int(round(min(h, w) * roi_fraction)), h, w)
+    return (w - size) // 2, (h - size) // 2, size
+
+
+def is_raw(frame):
+    return frame.ndim == 3 and frame.shape[2] == 2
+
+
+def to_bgr(frame, region=None, copy=False):
+    """
+    BGR pixels of a frame, or of region (x, y, w, h) of it. Raw YUYV frames are
+    converted only inside the region (x and w rounded to whole pixel pairs);
+    BGR frames are returned as a view unless copy=True.
+    """
+    if region is not None:
+        x, y, w, h = region
+        if is_raw(frame):
+            x -= x % 2
+            w += w % 2
+        frame = frame[y:y + h, x:x + w]
+    if is_raw(frame):
+        return cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_YUV2BGR_YUYV)
+    return frame.copy() if copy else frame
+
+
+# ==================== Latency probe ====================
+def probe_capture(cap, frames=PROBE_FRAMES, pause=PROBE_PAUSE):
+    """
+    Time `frames` reads. Returns a dict with the measured fps, read wait, frame
+    age (driver timestamp to read() return; None if the backend has no usable
+    timestamps), stale frames still queued after a pause, and the last frame.
+    """
+    waits, ages, frame = [], [], None
+    start = time.monotonic()
+    for _ in range(frames):
+        t0 = time.monotonic()
+        ret, frame = cap.read()
+        t1 = time.monotonic()
+        if not ret:
+            break
+        waits.append(t1 - t0)
+        stamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if 0.0 <= t1 - stamp <= MAX_FRAME_AGE:
+            ages.append(t1 - stamp)
+    elapsed = time.monotonic() - start
+    interval = elapsed / max(len(waits), 1)
+
+    # After a pause, queued frames are returned immediately: each one is a frame of extra latency
+    stale = 0
+    if pause and waits:
+        time.sleep(pause)
+        for _ in range(8):
+            t0 = time.monotonic()
+            ret, frame = cap.read()
+            if not ret or time.monotonic() - t0 > interval / 2:
+                break
+            stale += 1
+
+    def ms(values, q):
+        return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+    return {
+        'frames': len(waits),
+        'fps': round(len(waits) / elapsed, 1) if elapsed > 0 else 0.0,
+        'read_ms_p50': ms(waits, 50),
+        'age_ms_p50': ms(ages if len(ages) == len(waits) else [], 50),
+        'age_ms_p95': ms(ages if len(ages) == len(waits) else [], 95),
+        'stale_frames': stale,
+        'frame': frame,
+    }
+
+
+def print_probe(probe, indent="  "):
+    if probe['age_ms_p50'] is not None:
+        age = f"capture→frame {probe['age_ms_p50']:.1f}ms (p95 {probe['age_ms_p95']:.1f}ms)"
+    else:
+        age = "capture→frame n/a (no driver timestamps)"
+    print(f"{indent}{age} | read wait {probe['read_ms_p50'] or 0:.1f}ms | {probe['fps']:.1f} fps | "
+          f"{probe['stale_frames']} stale frame(s) queued")
+    if probe['stale_frames'] > 1:
+        print(f"{indent}⚠ The driver queues old frames; use --capture-buffers 1 or the gstreamer backend")
+
+
+# ==================== Runtime arguments ====================
+def parse_size(text):
+    if text == 'auto':
+        return None
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT or 'auto', got {text!r}")
+    return width, height
+
+
+def add_capture_arguments(parser, raw=True):
+    """--capture-* flags shared by the runtime scripts"""
+    group = parser.add_argument_group('camera capture')
+    group.add_argument('--capture-backend', choices=CAPTURE_BACKENDS, default='auto',
+                       help='OpenCV default, V4L2, or a GStreamer pipeline built for the device')
+    group.add_argument('--gst-pipeline', default=None, metavar='PIPELINE',
+                       help='custom GStreamer pipeline ending in appsink (implies --capture-backend gstreamer)')
+    group.add_argument('--pixel-format', choices=PIXEL_FORMATS, default='auto', help='camera pixel format')
+    group.add_argument('--capture-size', type=parse_size, default=None, metavar='WxH',
+                       help="capture resolution (default: smallest mode whose ROI covers the model input)")
+    group.add_argument('--capture-fps', type=int, default=None, help='requested camera frame rate')
+    group.add_argument('--capture-buffers', type=int, default=BUFFER_SIZE,
+                       help='frames queued in the driver (0 = backend default)')
+    if raw:
+        group.add_argument('--raw-capture', action='store_true',
+                           help='skip OpenCV RGB conversion and convert only the ROI (v4l2 + YUYV)')
+    # Opt-in: probing reads frames before the first one is classified, i.e. delays the first action
+    group.add_argument('--capture-probe', nargs='?', type=int, const=PROBE_FRAMES, default=0, metavar='N',
+                       help=f'time N frames at startup for a capture latency report (default N: {PROBE_FRAMES})')
+
+
+def capture_config_from_args(args, img_size, roi_fraction=ROI_FRACTION):
+    """CaptureConfig for the flags; the size follows the model input unless --capture-size is given"""
+    width, height = args.capture_size or capture_size_for(img_size, roi_fraction)
+    return CaptureConfig(args.capture_backend, args.pixel_format, width, height, args.capture_fps,
+                         args.capture_buffers or None, getattr(args, 'raw_capture', False), args.gst_pipeline)
+
+
+# ==================== CLI ====================
+def main():
+    parser = argparse.ArgumentParser(description="Open a camera with a capture config and report its latency")
+    parser.add_argument('--camera', type=int, default=None, help='camera index (default: first working one)')
+    parser.add_argument('--img-size', type=int, default=128, help='model input size used for the automatic size')
+    parser.add_argument('--sweep', action='store_true', help='try every backend / pixel format combination')
+    add_capture_arguments(parser)
+    parser.set_defaults(capture_probe=120)
+    args = parser.parse_args()
+    indices = [args.camera] if args.camera is not None else CAMERA_INDICES
+
+    if args.sweep:
+        combos = [(backend, fmt) for backend in ('v4l2', 'gstreamer') for fmt in ('MJPG', 'YUYV')]
+        combos.append(('auto', 'auto'))
+    else:
+        combos = [(args.capture_backend, args.pixel_format)]
+
+    print("=" * 60)
+    print("CAPTURE MODES")
+    print("=" * 60)
+    for backend, fmt in combos:
+        args.capture_backend, args.pixel_format = backend, fmt
+        try:
+            config = capture_config_from_args(args, args.img_size)
+        except ValueError as e:
+            print(f"❌ {backend}/{fmt}: {e}")
+            continue
+        cap, index, frame = open_camera(indices, config=config, retries=1)
+        if cap is None:
+            print(f"⚠ {backend}/{fmt}: cannot open camera (tried {list(indices)})")
+            continue
+        x, y, size = roi_box(frame.shape)
+        print(f"✓ Camera {index}: {cap.describe()} | ROI {size}px for a {args.img_size}px input")
+        if args.capture_probe:
+            print_probe(probe_capture(cap, args.capture_probe))
+        cap.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,36 @@
 import cv2
+import json
 import os
+import time
+from dataset_writer import AsyncImageWriter, QualityFilter
 
 # Configuration
 gesture_name = "forward"  # Change this for each gesture: forward, play, reverse, stop, volume_up
-save_path = f"dataset/{gesture_name}"
+                          # or a motion gesture: swipe_left, swipe_right, none (recorded as clips)
+                          # or "background" (no hand, for the train_cascade.py stage-1 model)
+CLIP_GESTURES = ["swipe_left", "swipe_right", "none"]
+BACKGROUND_NAME = "background"
+clip_mode = gesture_name in CLIP_GESTURES
+if clip_mode:
+    save_path = f"clips/{gesture_name}"
+elif gesture_name == BACKGROUND_NAME:
+    save_path = BACKGROUND_NAME  # Kept out of dataset/ so the classifier's classes do not change
+else:
+    save_path = f"dataset/{gesture_name}"
 os.makedirs(save_path, exist_ok=True)
 
+# Burst capture settings
+BURST_RATE = 5.0          # Images per second while bursting
+BURST_DURATION = 10.0     # Seconds an 'a' auto-capture burst runs (0 = until toggled off)
+KEY_HOLD_TIMEOUT = 0.6    # Seconds without a 'b' key repeat before a held burst stops
+BLUR_THRESHOLD = 60.0     # Drop burst frames with Laplacian variance below this
+DUPLICATE_THRESHOLD = 4.0 # Drop burst frames this close to the previous kept frame
+WRITE_QUEUE_SIZE = 64     # Frames buffered for the background writer
+
+# Clip capture settings (motion gestures for train_temporal.py)
+CLIP_DURATION = 1.5       # Seconds recorded per 'c' press (every camera frame, no quality filter)
+CLIP_TARGET = 40          # Clips per motion gesture
+
 # Check existing data for all gestures
 all_gestures = ["forward", "play", "reverse", "stop", "volume_up"]
 gesture_counts = {}
@@ -41,6 +66,14 @@ for gesture in all_gestures:
     
     print(f"{color}{gesture:12} [{bar}] {count:3}/{TARGET_IMAGES} {status}{reset}")
 
+print("-"*60)
+background_count = len(os.listdir(BACKGROUND_NAME)) if os.path.exists(BACKGROUND_NAME) else 0
+print(f"{BACKGROUND_NAME:12} (no hand) {background_count} images")
+for gesture in CLIP_GESTURES:
+    clip_path = f"clips/{gesture}"
+    clips = len(os.listdir(clip_path)) if os.path.exists(clip_path) else 0
+    status = "✓ COMPLETE" if clips >= CLIP_TARGET else f"{clips}/{CLIP_TARGET} clips"
+    print(f"{gesture:12} (motion) {status}")
 print("="*60)
 
 # Try external webcam (usually index 1)
@@ -56,15 +89,25 @@ if not cap.isOpened():
 
 print(f"✓ Camera opened successfully")
 
-count = gesture_counts[gesture_name]
+writer = AsyncImageWriter(max_queue=WRITE_QUEUE_SIZE)
+quality_filter = QualityFilter(BLUR_THRESHOLD, DUPLICATE_THRESHOLD)
+
+count = gesture_counts.get(gesture_name, len(os.listdir(save_path)))
+target = CLIP_TARGET if clip_mode else TARGET_IMAGES
 print("\n" + "="*60)
 print(f"COLLECTING: {gesture_name.upper()}")
 print("="*60)
-print(f"Current count: {count}/{TARGET_IMAGES}")
-print(f"Target: {TARGET_IMAGES} images")
+print(f"Current count: {count}/{target}")
+print(f"Target: {target} {'clips' if clip_mode else 'images'}")
 print("\nInstructions:")
 print("  - Place your hand inside the GREEN box")
+if clip_mode:
+    print(f"  - Press 'c', then perform the motion: records a {CLIP_DURATION:.1f}s clip")
+    print("  - For 'none', record idle hands, static poses and people walking by")
 print("  - Press 's' to save image")
+print(f"  - Press 'a' to toggle auto-capture ({BURST_RATE:.0f} img/s"
+      + (f" for {BURST_DURATION:.0f}s)" if BURST_DURATION > 0 else ")"))
+print("  - Hold 'b' to burst-capture while the key is held")
 print("  - Press 'q' to quit and switch gesture")
 print("\nTips for BEST accuracy:")
 print("  - Vary hand angles (left, right, tilted)")
@@ -74,6 +117,51 @@ print("  - Slightly different hand positions in box")
 print("  - Hold gesture naturally as you would during use")
 print("="*60 + "\n")
 
+
+def save_roi(roi):
+    """Queue the ROI for the background writer; returns True if accepted"""
+    global count
+    img_path = os.path.join(save_path, f"{gesture_name}_{count}.jpg")
+    if not writer.submit(img_path, roi):
+        return False
+    count += 1
+
+    # Show achievement messages
+    if count == TARGET_IMAGES:
+        print(f"\n{'='*60}")
+        print(f"🎉 CONGRATULATIONS! {gesture_name.upper()} collection COMPLETE!")
+        print(f"{'='*60}\n")
+    elif count == TARGET_IMAGES // 2:
+        print(f"\n{'='*60}")
+        print(f"✓ HALFWAY THERE! {count} images collected for {gesture_name}")
+        print(f"{'='*60}\n")
+    return True
+
+
+def save_clip(frames):
+    """Queue a recorded clip (frames + timestamps) under clips/<gesture>/<gesture>_<n>/"""
+    global count
+    clip_dir = os.path.join(save_path, f"{gesture_name}_{count}")
+    os.makedirs(clip_dir, exist_ok=True)
+    start = frames[0][1]
+    names, timestamps = [], []
+    for i, (roi, timestamp) in enumerate(frames):
+        name = f"frame_{i:03d}.jpg"
+        if writer.submit(os.path.join(clip_dir, name), roi):
+            names.append(name)
+            timestamps.append(round(timestamp - start, 4))
+    with open(os.path.join(clip_dir, "clip.json"), "w") as f:
+        json.dump({"gesture": gesture_name, "frames": names, "timestamps": timestamps}, f)
+    count += 1
+    return len(names), len(frames)
+
+
+auto_capture_until = None   # End time of an 'a' burst (float('inf') = until toggled off)
+last_hold_key_time = 0      # Last time a 'b' key (repeat) event was seen
+last_burst_capture = 0
+clip_frames = None          # (roi, timestamp) of the clip being recorded
+clip_start = 0
+
 while True:
     ret, frame = cap.read()
     if not ret:
@@ -85,18 +173,18 @@ while True:
     # Draw ROI (Region of Interest)
     cv2.rectangle(frame, (100, 100), (400, 400), (0, 255, 0), 2)
 
-    # Extract ROI
-    roi = frame[100:400, 100:400]
+    # Extract ROI (copied so the overlay text drawn below never ends up on disk)
+    roi = frame[100:400, 100:400].copy()
 
     # Calculate progress
-    progress_pct = (count / TARGET_IMAGES) * 100
-    remaining = TARGET_IMAGES - count
+    progress_pct = (count / target) * 100
+    remaining = target - count
     
     # Status color
-    if count >= TARGET_IMAGES:
+    if count >= target:
         status_color = (0, 255, 0)  # Green
         status_text = "COMPLETE!"
-    elif count >= TARGET_IMAGES * 0.5:
+    elif count >= target * 0.5:
         status_color = (0, 255, 255)  # Yellow
         status_text = f"HALFWAY - {remaining} more"
     else:
@@ -106,7 +194,7 @@ while True:
     # Display instructions
     cv2.putText(frame, f"Gesture: {gesture_name.upper()}", (10, 30),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-    cv2.putText(frame, f"Progress: {count}/{TARGET_IMAGES} ({progress_pct:.1f}%)", (10, 65),
+    cv2.putText(frame, f"Progress: {count}/{target} ({progress_pct:.1f}%)", (10, 65),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
     cv2.putText(frame, status_text, (10, 95),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
@@ -116,33 +204,75 @@ while True:
     bar_height = 20
     bar_x, bar_y = 10, 110
     cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (100, 100, 100), -1)
-    filled_width = int((count / TARGET_IMAGES) * bar_width)
+    filled_width = int((count / target) * bar_width)
     cv2.rectangle(frame, (bar_x, bar_y), (bar_x + filled_width, bar_y + bar_height), status_color, -1)
     
-    cv2.putText(frame, "Press 's' to save | 'q' to quit", (10, 150),
+    now = time.time()
+    if auto_capture_until is not None and now >= auto_capture_until:
+        auto_capture_until = None
+        print(f"⏹ Auto-capture finished | Total: {count}/{target}")
+    bursting = auto_capture_until is not None or (now - last_hold_key_time) < KEY_HOLD_TIMEOUT
+
+    if bursting:
+        cv2.putText(frame, "● BURST", (500, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+    if clip_frames is not None:
+        cv2.putText(frame, "● CLIP", (500, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+    hint = "'c' record clip | 'q' quit" if clip_mode else "'s' save | 'a' auto | hold 'b' burst | 'q' quit"
+    cv2.putText(frame, hint, (10, 150),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
     cv2.imshow("Data Collection", frame)
     cv2.imshow("ROI", roi)
 
+    # Clip capture: every frame for CLIP_DURATION, written once the clip ends
+    if clip_frames is not None:
+        clip_frames.append((roi, now))
+        if now - clip_start >= CLIP_DURATION:
+            saved, recorded = save_clip(clip_frames)
+            clip_frames = None
+            print(f"✓ Clip: {gesture_name}_{count-1} ({saved}/{recorded} frames) | Total: {count}/{CLIP_TARGET}")
+
+    # Burst capture: rate-limited, filtered, written in the background
+    if bursting and not clip_mode and now - last_burst_capture >= 1.0 / BURST_RATE:
+        last_burst_capture = now
+        accepted, reason = quality_filter.check(roi)
+        if accepted and save_roi(roi):
+            print(f"✓ Burst: {gesture_name}_{count-1}.jpg | Total: {count}/{target}")
+
     key = cv2.waitKey(1) & 0xFF
     
-    if key == ord('s'):
-        # Save image
-        img_path = os.path.join(save_path, f"{gesture_name}_{count}.jpg")
-        cv2.imwrite(img_path, roi)
-        count += 1
-        print(f"✓ Saved: {gesture_name}_{count-1}.jpg | Total: {count}/{TARGET_IMAGES}")
-        
-        # Show achievement messages
-        if count == TARGET_IMAGES:
-            print(f"\n{'='*60}")
-            print(f"🎉 CONGRATULATIONS! {gesture_name.upper()} collection COMPLETE!")
-            print(f"{'='*60}\n")
-        elif count == TARGET_IMAGES // 2:
-            print(f"\n{'='*60}")
-            print(f"✓ HALFWAY THERE! {count} images collected for {gesture_name}")
-            print(f"{'='*60}\n")
+    if clip_mode and key in (ord('s'), ord('a'), ord('b')):
+        print("⚠ Motion gestures are recorded as clips: press 'c'")
+
+    elif key == ord('c'):
+        if not clip_mode:
+            print(f"⚠ Clips are for motion gestures: set gesture_name to one of {CLIP_GESTURES}")
+        elif clip_frames is None:
+            clip_frames, clip_start = [], now
+            print("● Recording clip...")
+
+    elif key == ord('s'):
+        # Save image (manual saves skip the quality filter)
+        if save_roi(roi):
+            print(f"✓ Saved: {gesture_name}_{count-1}.jpg | Total: {count}/{target}")
+        else:
+            print("⚠ Writer busy, frame dropped")
+
+    elif key == ord('a'):
+        if auto_capture_until is None:
+            quality_filter.reset()
+            auto_capture_until = now + BURST_DURATION if BURST_DURATION > 0 else float('inf')
+            print("▶ Auto-capture started")
+        else:
+            auto_capture_until = None
+            print(f"⏹ Auto-capture stopped | Total: {count}/{target}")
+
+    elif key == ord('b'):
+        if now - last_hold_key_time >= KEY_HOLD_TIMEOUT:
+            quality_filter.reset()
+        last_hold_key_time = now
     
     elif key == ord('q'):
         # Show completion summary
@@ -150,6 +280,8 @@ while True:
         print(f"SESSION SUMMARY - {gesture_name.upper()}")
         print(f"{'='*60}")
         print(f"Total collected: {count}/{TARGET_IMAGES}")
+        print(f"Rejected (blurry/duplicate): "
+              f"{quality_filter.rejected['blurry']}/{quality_filter.rejected['duplicate']}")
         
         if count >= TARGET_IMAGES:
             print(f"Status: ✓ COMPLETE!")
@@ -159,6 +291,11 @@ while True:
         
         print(f"{'='*60}\n")
         
+        # Flush pending writes before counting files on disk
+        writer.close()
+        if writer.dropped or writer.failed:
+            print(f"⚠ Writer dropped {writer.dropped} and failed {writer.failed} frame(s)")
+
         # Show overall progress
         print("OVERALL PROGRESS:")
         for gesture in all_gestures:
@@ -174,5 +311,6 @@ while True:
         print()
         break
 
+writer.close()
 cap.release()
 cv2.destroyAllWindows()
@@ -1,15 +1,30 @@
 import tensorflow as tf
 import os
+from calibration import calibrate_for_export
+from model_analyzer import analyze_exports
+from model_bundle import write_bundle, write_model_info
+from split_model import export_split
+
+IMG_SIZE = 128
 
 print("Converting model to TensorFlow Lite...")
 
 # Load trained model
 model = tf.keras.models.load_model("gesture_model.h5")
+gesture_classes = sorted([d for d in os.listdir("dataset") if os.path.isdir(os.path.join("dataset", d))])
+
+# Fit confidence calibration on the held-out split (needs dataset_split.json)
+print("\nCalibrating confidences on the validation split...")
+calibration = calibrate_for_export(lambda batch: model(batch, training=False).numpy(),
+                                   gesture_classes, IMG_SIZE)
 
 # Convert to TensorFlow Lite
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-tflite_model = converter.convert()
+def convert(keras_model):
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
+
+tflite_model = convert(model)
 
 # Save TFLite model
 with open("gesture_model.tflite", "wb") as f:
@@ -27,15 +42,15 @@ print(f"  H5 Model:     {h5_size:.2f} MB")
 print(f"  TFLite Model: {tflite_size:.2f} MB")
 print(f"  Size Reduction: {((h5_size - tflite_size) / h5_size * 100):.1f}%")
 
-# Save model info for Jetson compatibility
-import json
-gesture_classes = sorted([d for d in os.listdir("dataset") if os.path.isdir(os.path.join("dataset", d))])
-model_info = {
-    "class_names": gesture_classes,
-    "input_shape": [128, 128, 3],
-    "model_version": "v1.0"
-}
-
-with open("model_info.json", "w") as f:
-    json.dump(model_info, f, indent=2)
+# Save model info and self-describing bundle
+write_model_info("model_info.json", gesture_classes, IMG_SIZE, calibration=calibration)
 print(f"\n✓ Model info saved: model_info.json")
+write_bundle("gesture_model.gmb", tflite_model, gesture_classes, IMG_SIZE, calibration=calibration)
+print(f"✓ Model bundle saved: gesture_model.gmb")
+
+# Backbone (pooled embeddings) + NumPy head for --backend split
+export_split(model, convert, gesture_classes, IMG_SIZE, calibration)
+print(f"✓ Split model saved: gesture_backbone.gmb + gesture_head.npz")
+
+# Ops, FLOPs, arena and per-op latency, compared with the previous build
+analyze_exports(["gesture_model.tflite", "gesture_backbone.gmb"])
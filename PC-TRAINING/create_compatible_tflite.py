@@ -1,7 +1,12 @@
 import tensorflow as tf
 import numpy as np
-import json
 import os
+from calibration import calibrate_for_export
+from model_analyzer import analyze_exports
+from model_bundle import write_bundle, write_model_info
+from split_model import export_split
+
+IMG_SIZE = 128
 
 print("="*60)
 print("Creating TFLite Model - Maximum Compatibility Mode")
@@ -16,6 +21,11 @@ print("✓ Model loaded successfully")
 gesture_classes = sorted([d for d in os.listdir("dataset") if os.path.isdir(os.path.join("dataset", d))])
 print(f"✓ Found {len(gesture_classes)} classes: {gesture_classes}")
 
+# Fit confidence calibration on the held-out split (needs dataset_split.json)
+print("\nCalibrating confidences on the validation split...")
+calibration = calibrate_for_export(lambda batch: model(batch, training=False).numpy(),
+                                   gesture_classes, IMG_SIZE)
+
 # Try multiple conversion strategies
 print("\n" + "="*60)
 print("Trying Multiple Conversion Strategies")
@@ -31,6 +41,8 @@ try:
     
     with open("gesture_model_v1.tflite", "wb") as f:
         f.write(tflite_model_v1)
+    write_bundle("gesture_model_v1.gmb", tflite_model_v1, gesture_classes, IMG_SIZE,
+                 calibration=calibration, model_version="v1.0")
     
     v1_size = os.path.getsize("gesture_model_v1.tflite") / (1024 * 1024)
     print(f"  ✓ Created: gesture_model_v1.tflite ({v1_size:.2f} MB)")
@@ -51,6 +63,8 @@ try:
     
     with open("gesture_model_v2.tflite", "wb") as f:
         f.write(tflite_model_v2)
+    write_bundle("gesture_model_v2.gmb", tflite_model_v2, gesture_classes, IMG_SIZE,
+                 calibration=calibration, model_version="v2.0")
     
     v2_size = os.path.getsize("gesture_model_v2.tflite") / (1024 * 1024)
     print(f"  ✓ Created: gesture_model_v2.tflite ({v2_size:.2f} MB)")
@@ -58,6 +72,22 @@ try:
 except Exception as e:
     print(f"  ✗ Failed: {e}")
 
+# Split export: backbone (pooled embeddings) + NumPy head, strategy 1 settings
+print("\n[+] Split backbone/head (for --backend split)...")
+try:
+    def convert_builtins(keras_model):
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+        return converter.convert()
+
+    export_split(model, convert_builtins, gesture_classes, IMG_SIZE, calibration, model_version="v1.0")
+    print("  ✓ Created: gesture_backbone.gmb + gesture_head.npz")
+except Exception as e:
+    print(f"  ✗ Failed: {e}")
+
+# Ops (Flex ops in v2), FLOPs, arena and per-op latency, compared with the previous build
+analyze_exports(["gesture_model_v1.tflite", "gesture_model_v2.tflite", "gesture_backbone.gmb"])
+
 # Test both models
 print("\n" + "="*60)
 print("Testing Models")
@@ -75,7 +105,7 @@ for version in ["v1", "v2"]:
             output_details = interpreter.get_output_details()
             
             # Run test inference
-            test_input = np.random.rand(1, 128, 128, 3).astype(np.float32)
+            test_input = np.random.rand(1, IMG_SIZE, IMG_SIZE, 3).astype(np.float32)
             interpreter.set_tensor(input_details[0]['index'], test_input)
             interpreter.invoke()
             test_output = interpreter.get_tensor(output_details[0]['index'])
@@ -86,15 +116,9 @@ for version in ["v1", "v2"]:
             print(f"  ✗ Test failed: {e}")
 
 # Save model info
-model_info = {
-    "class_names": gesture_classes,
-    "input_shape": [128, 128, 3],
-    "model_version": "v1.0"
-}
-
-with open("model_info.json", "w") as f:
-    json.dump(model_info, f, indent=2)
+write_model_info("model_info.json", gesture_classes, IMG_SIZE, calibration=calibration)
 print("\n✓ Model info saved: model_info.json")
+print("✓ Bundles saved: gesture_model_v1.gmb / gesture_model_v2.gmb (model + metadata)")
 
 # Size comparison
 h5_size = os.path.getsize("gesture_model.h5") / (1024 * 1024)
@@ -115,15 +139,15 @@ print("\n" + "="*60)
 print("TRANSFER INSTRUCTIONS")
 print("="*60)
 print("\n📦 RECOMMENDED: Transfer these files to Jetson Nano:")
-print("  1. gesture_model_v1.tflite  (RECOMMENDED - most compatible)")
-print("  2. model_info.json")
-print("  3. media_control_mpv.py")
+print("  1. gesture_model_v1.gmb  (RECOMMENDED - model + metadata, most compatible)")
+print("  2. media_control_mpv.py + model_bundle.py")
+print("\n📦 OPTIONAL: Shared backbone + swappable heads:")
+print("  gesture_backbone.gmb + gesture_head.npz + split_model.py  (--backend split)")
 print("\n📦 ALTERNATIVE: If v1 doesn't work, try:")
-print("  1. gesture_model_v2.tflite  (needs SELECT_TF_OPS support)")
-print("  2. model_info.json")
-print("  3. media_control_mpv.py")
+print("  1. gesture_model_v2.gmb  (needs SELECT_TF_OPS support)")
+print("  2. media_control_mpv.py + model_bundle.py")
 print("\n🚀 On Jetson Nano:")
 print("  # Rename v1 to standard name:")
-print("  cp gesture_model_v1.tflite gesture_model.tflite")
+print("  cp gesture_model_v1.gmb gesture_model.gmb")
 print("  python3 media_control_mpv.py")
 print("="*60)
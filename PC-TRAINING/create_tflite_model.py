@@ -1,7 +1,12 @@
 import tensorflow as tf
 import numpy as np
-import json
 import os
+from calibration import calibrate_for_export
+from model_analyzer import analyze_exports
+from model_bundle import write_bundle, write_model_info
+from split_model import export_split
+
+IMG_SIZE = 128
 
 print("="*60)
 print("Creating TensorFlow Lite model for Jetson Nano")
@@ -16,20 +21,27 @@ print("✓ Model loaded successfully")
 gesture_classes = sorted([d for d in os.listdir("dataset") if os.path.isdir(os.path.join("dataset", d))])
 print(f"✓ Found {len(gesture_classes)} classes: {gesture_classes}")
 
+# Fit confidence calibration on the held-out split (needs dataset_split.json)
+print("\nCalibrating confidences on the validation split...")
+calibration = calibrate_for_export(lambda batch: model(batch, training=False).numpy(),
+                                   gesture_classes, IMG_SIZE)
+
 # Convert to TensorFlow Lite with compatibility for TF 2.3.1
 print("\nConverting to TensorFlow Lite (compatible mode)...")
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
+def convert(keras_model):
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
 
-# Enable compatibility with older TensorFlow versions
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-converter.target_spec.supported_ops = [
-    tf.lite.OpsSet.TFLITE_BUILTINS,  # Enable TensorFlow Lite ops
-    tf.lite.OpsSet.SELECT_TF_OPS      # Enable TensorFlow ops (fallback)
-]
-converter._experimental_lower_tensor_list_ops = False
+    # Enable compatibility with older TensorFlow versions
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS,  # Enable TensorFlow Lite ops
+        tf.lite.OpsSet.SELECT_TF_OPS      # Enable TensorFlow ops (fallback)
+    ]
+    converter._experimental_lower_tensor_list_ops = False
+    return converter.convert()
 
 print("  Targeting TensorFlow 2.3.1 compatibility...")
-tflite_model = converter.convert()
+tflite_model = convert(model)
 
 # Save TFLite model
 tflite_filename = "gesture_model.tflite"
@@ -58,31 +70,38 @@ print(f"  Input dtype: {input_details[0]['dtype']}")
 print(f"  Output shape: {output_details[0]['shape']}")
 
 # Run test inference
-test_input = np.random.rand(1, 128, 128, 3).astype(np.float32)
+test_input = np.random.rand(1, IMG_SIZE, IMG_SIZE, 3).astype(np.float32)
 interpreter.set_tensor(input_details[0]['index'], test_input)
 interpreter.invoke()
 test_output = interpreter.get_tensor(output_details[0]['index'])
 print(f"✓ Test inference successful - Output shape: {test_output.shape}")
 
-# Save model info (Jetson-compatible format)
-model_info = {
-    "class_names": gesture_classes,
-    "input_shape": [128, 128, 3],
-    "model_version": "v1.0"
-}
-
+# Save model info (Jetson-compatible format) and self-describing bundle
 info_filename = "model_info.json"
-with open(info_filename, "w") as f:
-    json.dump(model_info, f, indent=2)
+write_model_info(info_filename, gesture_classes, IMG_SIZE, calibration=calibration)
 print(f"✓ Model info saved: {info_filename}")
 
+bundle_filename = "gesture_model.gmb"
+write_bundle(bundle_filename, tflite_model, gesture_classes, IMG_SIZE, calibration=calibration)
+print(f"✓ Model bundle saved: {bundle_filename}")
+
+# Backbone (pooled embeddings) + NumPy head for --backend split
+export_split(model, convert, gesture_classes, IMG_SIZE, calibration)
+print("✓ Split model saved: gesture_backbone.gmb + gesture_head.npz")
+
+# Ops (Flex ops from SELECT_TF_OPS), FLOPs, arena and per-op latency, compared with the previous build
+analyze_exports([tflite_filename, "gesture_backbone.gmb"])
+
 print("\n" + "="*60)
 print("TFLITE CONVERSION COMPLETE!")
 print("="*60)
 print("\nFiles created:")
 print(f"  1. {tflite_filename} ({tflite_size:.2f} MB)")
 print(f"  2. {info_filename}")
+print(f"  3. {bundle_filename} (model + metadata in one file)")
+print("  4. gesture_backbone.gmb + gesture_head.npz (optional, for --backend split)")
+print(f"  Analysis: {tflite_filename}.analysis.json (stays on the PC)")
 print("\nTransfer these files to Jetson Nano along with:")
-print("  3. media_control_mpv.py")
+print("  5. media_control_mpv.py + model_bundle.py")
 print("\nThen run: python3 media_control_mpv.py")
 print("="*60)
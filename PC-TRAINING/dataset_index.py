@@ -0,0 +1,296 @@
+"""
+Perceptual-Hash Dataset Index
+
+Hashes every image in dataset/ (in parallel, cached by file mtime), clusters
+near-duplicates and writes a group-aware train/val split. Consecutive frames
+from the same capture session hash almost identically, so splitting by file
+order (validation_split=0.2) leaks them into validation and inflates accuracy.
+Here every near-duplicate cluster lands entirely in train or entirely in val.
+
+Usage:
+    python dataset_index.py                      # index + write dataset_split.json
+    python dataset_index.py --check-split old.json   # report train/val leaks in a split
+"""
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+# ==================== CONFIGURATION ====================
+DATASET_DIR = "dataset"
+CACHE_FILE = "dataset_index.json"
+SPLIT_FILE = "dataset_split.json"
+VAL_FRACTION = 0.2
+HAMMING_THRESHOLD = 6      # Max differing bits (of 64) for two images to be near-duplicates
+SPLIT_SEED = 42
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+BLOCK_SIZE = 1024          # Rows per block when computing pairwise distances
+
+
+def phash(path):
+    """64-bit DCT perceptual hash of an image, returned as a 16-char hex string"""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(small)[:8, :8]
+    bits = (low_freq > np.median(low_freq)).flatten()
+    return np.packbits(bits).tobytes().hex()
+
+
+def _hash_job(job):
+    path, mtime = job
+    return path, mtime, phash(path)
+
+
+def list_images(dataset_dir=DATASET_DIR):
+    """Return [(relative_path, class_name)] for every image, sorted"""
+    images = []
+    classes = sorted(d for d in os.listdir(dataset_dir)
+                     if os.path.isdir(os.path.join(dataset_dir, d)))
+    for class_name in classes:
+        class_dir = os.path.join(dataset_dir, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(class_dir, filename), class_name))
+    return images, classes
+
+
+def build_index(dataset_dir=DATASET_DIR, cache_file=CACHE_FILE, workers=None):
+    """
+    Hash every image, reusing cached hashes whose file mtime is unchanged.
+    Returns {path: {"class": ..., "mtime": ..., "hash": ...}}.
+    """
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file, 'r') as f:
+            cache = json.load(f).get("images", {})
+
+    images, _ = list_images(dataset_dir)
+    index = {}
+    jobs = []
+    for path, class_name in images:
+        mtime = os.path.getmtime(path)
+        cached = cache.get(path)
+        if cached and cached.get("mtime") == mtime and cached.get("hash"):
+            index[path] = {"class": class_name, "mtime": mtime, "hash": cached["hash"]}
+        else:
+            index[path] = {"class": class_name, "mtime": mtime, "hash": None}
+            jobs.append((path, mtime))
+
+    print(f"✓ {len(images)} images ({len(images) - len(jobs)} cached, {len(jobs)} to hash)")
+    if jobs:
+        start = time.time()
+        with Pool(workers or os.cpu_count()) as pool:
+            for path, mtime, image_hash in pool.imap_unordered(_hash_job, jobs, chunksize=32):
+                index[path]["hash"] = image_hash
+        print(f"✓ Hashed {len(jobs)} images in {time.time() - start:.1f}s")
+
+    unreadable = [p for p, entry in index.items() if entry["hash"] is None]
+    for path in unreadable:
+        print(f"⚠ Could not read {path}")
+        del index[path]
+
+    with open(cache_file, 'w') as f:
+        json.dump({"dataset": dataset_dir, "images": index}, f)
+    return index
+
+
+def hashes_to_bits(hex_hashes):
+    """Convert hex hashes to an (N, 64) float32 bit matrix"""
+    raw = np.frombuffer(b"".join(bytes.fromhex(h) for h in hex_hashes), dtype=np.uint8)
+    return np.unpackbits(raw.reshape(-1, 8), axis=1).astype(np.float32)
+
+
+def near_duplicate_pairs(bits_a, bits_b, threshold=HAMMING_THRESHOLD, same_set=False):
+    """
+    Yield (i, j) index pairs whose Hamming distance is <= threshold.
+    Distances are computed blockwise as matrix products to bound memory.
+    """
+    ones_b = bits_b.sum(axis=1)
+    for start in range(0, len(bits_a), BLOCK_SIZE):
+        block = bits_a[start:start + BLOCK_SIZE]
+        # hamming = |a| + |b| - 2 * (a . b)
+        distances = block.sum(axis=1)[:, None] + ones_b[None, :] - 2.0 * (block @ bits_b.T)
+        rows, cols = np.nonzero(distances <= threshold)
+        for row, col in zip(rows, cols):
+            i = start + row
+            if same_set and col <= i:
+                continue
+            yield i, col
+
+
+def cluster_duplicates(index, threshold=HAMMING_THRESHOLD):
+    """Union-find over near-duplicate pairs; returns a list of path groups"""
+    paths = sorted(index)
+    bits = hashes_to_bits([index[p]["hash"] for p in paths])
+    parent = list(range(len(paths)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in near_duplicate_pairs(bits, bits, threshold, same_set=True):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    groups = {}
+    for i, path in enumerate(paths):
+        groups.setdefault(find(i), []).append(path)
+    return list(groups.values())
+
+
+def group_split(index, groups, val_fraction=VAL_FRACTION, seed=SPLIT_SEED):
+    """
+    Assign whole duplicate groups to train or val, stratified by each
+    group's majority class, so no near-duplicate pair straddles the split.
+    """
+    rng = random.Random(seed)
+    by_class = {}
+    for group in groups:
+        classes = [index[p]["class"] for p in group]
+        majority = max(set(classes), key=classes.count)
+        by_class.setdefault(majority, []).append(group)
+
+    train, val = [], []
+    for class_name in sorted(by_class):
+        class_groups = by_class[class_name]
+        rng.shuffle(class_groups)
+        total = sum(len(g) for g in class_groups)
+        target = int(round(total * val_fraction))
+        val_count = 0
+        for group in class_groups:
+            if val_count < target and val_count + len(group) <= target + len(group) // 2:
+                val.extend(group)
+                val_count += len(group)
+            else:
+                train.extend(group)
+    return sorted(train), sorted(val)
+
+
+def load_split(split_file=SPLIT_FILE, dataset_dir=DATASET_DIR, check=True):
+    """
+    Load a split written by this tool.
+    Returns (classes, [(path, class)] train, [(path, class)] val).
+    With check, the split is compared with dataset_dir: images deleted since
+    it was written are dropped (tf.data would fail on them mid-fit) and
+    images or class folders added since are reported, because training on
+    this split leaves them out.
+    """
+    with open(split_file, 'r') as f:
+        split = json.load(f)
+    labels = split["labels"]
+    train = [(p, labels[p]) for p in split["train"]]
+    val = [(p, labels[p]) for p in split["val"]]
+    if check and os.path.isdir(dataset_dir):
+        train, val = check_split_files(split_file, split["classes"], train, val, dataset_dir)
+    return split["classes"], train, val
+
+
+def check_split_files(split_file, classes, train, val, dataset_dir=DATASET_DIR):
+    """Drop split entries whose file is gone and warn about images the split does not cover"""
+    images, folders = list_images(dataset_dir)
+    on_disk = set(path for path, _ in images)
+    listed = set(path for path, _ in train + val)
+    missing = listed - on_disk
+    if missing:
+        print(f"⚠ {len(missing)} images in {split_file} no longer exist; they are skipped")
+        train = [item for item in train if item[0] not in missing]
+        val = [item for item in val if item[0] not in missing]
+    added = {}
+    for path, class_name in images:
+        if path not in listed:
+            added[class_name] = added.get(class_name, 0) + 1
+    if added:
+        print(f"⚠ {sum(added.values())} images in {dataset_dir}/ are not in {split_file} and are left out "
+              f"({', '.join(f'{name}: {count}' for name, count in sorted(added.items()))}); "
+              f"re-run dataset_index.py to include them")
+    unknown = [name for name in folders if name not in classes]
+    if unknown:
+        print(f"⚠ Class folders {unknown} are not in {split_file} (its classes: {classes})")
+    return train, val
+
+
+def check_split(index, split_file, threshold=HAMMING_THRESHOLD):
+    """Report near-duplicate pairs that straddle train and val in a split file"""
+    _, train, val = load_split(split_file, check=False)
+    train = [p for p, _ in train if p in index]
+    val = [p for p, _ in val if p in index]
+    if not train or not val:
+        print("⚠ Split has an empty side, nothing to compare")
+        return []
+    train_bits = hashes_to_bits([index[p]["hash"] for p in train])
+    val_bits = hashes_to_bits([index[p]["hash"] for p in val])
+    leaks = [(val[i], train[j]) for i, j in near_duplicate_pairs(val_bits, train_bits, threshold)]
+    leaked_val = len(set(v for v, _ in leaks))
+    print(f"{'⚠' if leaks else '✓'} {leaked_val}/{len(val)} validation images have a "
+          f"near-duplicate in train ({len(leaks)} pairs)")
+    return leaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual-hash dataset index and group-aware split")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--output", default=SPLIT_FILE)
+    parser.add_argument("--val-fraction", type=float, default=VAL_FRACTION)
+    parser.add_argument("--threshold", type=int, default=HAMMING_THRESHOLD,
+                        help="max Hamming distance for near-duplicates")
+    parser.add_argument("--seed", type=int, default=SPLIT_SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--check-split", metavar="SPLIT_JSON",
+                        help="only report train/val leaks in an existing split")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("DATASET INDEX")
+    print("=" * 60)
+    index = build_index(args.dataset, workers=args.workers)
+
+    if args.check_split:
+        check_split(index, args.check_split, args.threshold)
+        return
+
+    groups = cluster_duplicates(index, args.threshold)
+    duplicate_groups = [g for g in groups if len(g) > 1]
+    cross_class = [g for g in duplicate_groups if len(set(index[p]["class"] for p in g)) > 1]
+    print(f"✓ {len(groups)} groups, {len(duplicate_groups)} with near-duplicates "
+          f"({sum(len(g) for g in duplicate_groups)} images)")
+    if cross_class:
+        print(f"⚠ {len(cross_class)} duplicate group(s) span several classes (label noise?):")
+        for group in cross_class[:10]:
+            print("   " + ", ".join(group))
+
+    train, val = group_split(index, groups, args.val_fraction, args.seed)
+    _, classes = list_images(args.dataset)
+    split = {
+        "classes": classes,
+        "val_fraction": args.val_fraction,
+        "hamming_threshold": args.threshold,
+        "seed": args.seed,
+        "labels": {p: index[p]["class"] for p in index},
+        "train": train,
+        "val": val,
+        "groups": duplicate_groups,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(split, f, indent=1)
+
+    print("\nPer-class split:")
+    for class_name in classes:
+        n_train = sum(1 for p in train if index[p]["class"] == class_name)
+        n_val = sum(1 for p in val if index[p]["class"] == class_name)
+        print(f"  {class_name:12} train {n_train:4}  val {n_val:4}")
+    print(f"\n✓ Split saved: {args.output} (train {len(train)}, val {len(val)})")
+    print("  train_model.py uses it automatically when present")
+
+
+if __name__ == "__main__":
+    main()
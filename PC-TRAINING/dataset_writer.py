@@ -0,0 +1,122 @@
+"""
+Background Image Writer for Dataset Collection
+
+JPEG encoding and disk writes run on a worker thread fed by a bounded queue,
+so the camera preview never blocks on cv2.imwrite. Frames are dropped (and
+counted) when the queue is full instead of stalling the caller.
+
+Also provides the quality checks used by burst capture to reject blurry
+and near-identical frames before they reach disk.
+"""
+import cv2
+import numpy as np
+import os
+import queue
+import threading
+
+# Default quality filter settings
+BLUR_THRESHOLD = 60.0       # Minimum Laplacian variance (lower = blurrier)
+DUPLICATE_THRESHOLD = 4.0   # Minimum mean abs difference vs last kept frame (0-255)
+SIGNATURE_SIZE = 32         # Frames are compared as SIGNATURE_SIZE x SIGNATURE_SIZE grayscale
+
+
+def blur_score(image):
+    """Return the variance of the Laplacian (higher means sharper)"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def frame_signature(image):
+    """Small grayscale thumbnail used for near-duplicate detection"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    thumb = cv2.resize(gray, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+    return thumb.astype(np.float32)
+
+
+class QualityFilter:
+    """
+    Reject blurry frames and frames nearly identical to the last accepted one.
+    check() returns (accepted, reason) where reason is None, 'blurry' or 'duplicate'.
+    """
+
+    def __init__(self, blur_threshold=BLUR_THRESHOLD, duplicate_threshold=DUPLICATE_THRESHOLD):
+        self.blur_threshold = blur_threshold
+        self.duplicate_threshold = duplicate_threshold
+        self.last_signature = None
+        self.rejected = {'blurry': 0, 'duplicate': 0}
+
+    def check(self, image):
+        if self.blur_threshold > 0 and blur_score(image) < self.blur_threshold:
+            self.rejected['blurry'] += 1
+            return False, 'blurry'
+
+        signature = frame_signature(image)
+        if self.last_signature is not None and self.duplicate_threshold > 0:
+            difference = np.mean(np.abs(signature - self.last_signature))
+            if difference < self.duplicate_threshold:
+                self.rejected['duplicate'] += 1
+                return False, 'duplicate'
+
+        self.last_signature = signature
+        return True, None
+
+    def reset(self):
+        """Forget the last accepted frame (e.g. when a new burst starts)"""
+        self.last_signature = None
+
+
+class AsyncImageWriter:
+    """Write images to disk from a background thread with a bounded queue"""
+
+    def __init__(self, max_queue=64, jpeg_quality=95):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.jpeg_quality = jpeg_quality
+        self.written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name="dataset-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, path, image):
+        """
+        Queue an image for writing. Never blocks: returns False and counts
+        the frame as dropped if the writer is falling behind.
+        """
+        try:
+            self.queue.put_nowait((path, image))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _run(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            path, image = item
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if cv2.imwrite(path, image, params):
+                    self.written += 1
+                    self.bytes_written += os.path.getsize(path)
+                else:
+                    self.failed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠ Could not write {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def close(self, timeout=10.0):
+        """Flush pending writes and stop the worker thread"""
+        if not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
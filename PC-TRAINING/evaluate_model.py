@@ -0,0 +1,250 @@
+"""
+Offline Model Evaluation
+
+Runs a model through any inference backend (see inference_backends.py) over
+a labelled image directory (one folder per class) or a dataset_split.json
+subset, using a pool of worker processes that each hold their own backend and
+run it on whole batches.
+
+Reports confusion matrix, per-class precision/recall/F1, expected calibration
+error and throughput as JSON. Confidences are calibrated when the model
+carries a calibration (calibration.py); --raw evaluates the raw softmax.
+
+Usage:
+    python evaluate_model.py gesture_model.tflite --data dataset
+    python evaluate_model.py gesture_model.h5 --split dataset_split.json --subset val
+    python evaluate_model.py gesture_model.onnx --backend opencv
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from inference_backends import BACKENDS, DEFAULT_SOCKET, create_backend, default_model, detect_backend
+from model_bundle import load_model_metadata, preprocess_roi
+
+# ==================== CONFIGURATION ====================
+BATCH_SIZE = 32
+ECE_BINS = 15
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Per-worker state (set by init_worker in each process)
+_model = None
+
+
+# ==================== WORKER ====================
+def init_worker(backend, model_path, batch_size, threads, socket_path, calibrated=True):
+    """Pool initializer: load one backend per worker process"""
+    global _model
+    _model = create_backend(backend, model_path, max_batch=batch_size, threads=threads,
+                            socket_path=socket_path, calibrated=calibrated)
+
+
+def load_batch(paths, img_size, preprocessing):
+    """Read and preprocess images exactly like the runtime ROI pipeline"""
+    images = []
+    valid = []
+    for i, path in enumerate(paths):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        images.append(preprocess_roi(image, img_size, preprocessing))
+        valid.append(i)
+    if not images:
+        return None, valid
+    return np.concatenate(images), valid
+
+
+def evaluate_chunk(job):
+    """Worker task: load, preprocess and classify one chunk of images"""
+    paths, labels, img_size, preprocessing = job
+    batch, valid = load_batch(paths, img_size, preprocessing)
+    if not valid:
+        return np.zeros((0, 0), dtype=np.float32), [], 0.0, len(paths)
+    start = time.perf_counter()
+    probs = _model.predict(batch)
+    elapsed = time.perf_counter() - start
+    return probs, [labels[i] for i in valid], elapsed, len(paths) - len(valid)
+
+
+# ==================== DATA ====================
+def load_samples(data_dir=None, split_file=None, subset='val'):
+    """Return [(path, class_name)] from a class-per-folder directory or a split file"""
+    if split_file:
+        from dataset_index import load_split
+        _, train, val = load_split(split_file)
+        return {'train': train, 'val': val, 'all': train + val}[subset]
+
+    samples = []
+    for class_name in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(class_dir, filename), class_name))
+    return samples
+
+
+# ==================== METRICS ====================
+def compute_metrics(probs, labels, classes, bins=ECE_BINS):
+    """Confusion matrix, per-class precision/recall/F1, accuracy and ECE"""
+    num_classes = len(classes)
+    predictions = np.argmax(probs, axis=1)
+    confidences = probs[np.arange(len(probs)), predictions]
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+    np.add.at(confusion, (labels, predictions), 1)
+
+    per_class = {}
+    for i, name in enumerate(classes):
+        tp = confusion[i, i]
+        predicted = confusion[:, i].sum()
+        actual = confusion[i, :].sum()
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[name] = {
+            "precision": round(float(precision), 4),
+            "recall": round(float(recall), 4),
+            "f1": round(float(f1), 4),
+            "support": int(actual),
+        }
+
+    # Expected calibration error over top-1 confidence
+    correct = predictions == labels
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    ece = 0.0
+    reliability = []
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidences > low) & (confidences <= high)
+        if not np.any(in_bin):
+            continue
+        accuracy = correct[in_bin].mean()
+        confidence = confidences[in_bin].mean()
+        ece += in_bin.mean() * abs(accuracy - confidence)
+        reliability.append({
+            "bin": [round(float(low), 3), round(float(high), 3)],
+            "count": int(in_bin.sum()),
+            "accuracy": round(float(accuracy), 4),
+            "confidence": round(float(confidence), 4),
+        })
+
+    return {
+        "accuracy": round(float(correct.mean()), 4),
+        "ece": round(float(ece), 4),
+        "confusion_matrix": confusion.tolist(),
+        "per_class": per_class,
+        "reliability": reliability,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel offline evaluation of a gesture model")
+    parser.add_argument("model", nargs="?", default=None,
+                        help=".gmb/.tflite, .h5, .onnx or .pb model (default depends on --backend)")
+    parser.add_argument("--backend", default="auto", choices=BACKENDS,
+                        help="inference backend (auto picks from the model extension)")
+    parser.add_argument("--server-socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--data", default="dataset", help="labelled directory (one folder per class)")
+    parser.add_argument("--split", help="dataset_split.json from dataset_index.py")
+    parser.add_argument("--subset", default="val", choices=["train", "val", "all"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads", type=int, default=1, help="interpreter threads per worker")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--color-order", choices=["BGR", "RGB"],
+                        help="override the color order from the model metadata")
+    parser.add_argument("--raw", action="store_true",
+                        help="ignore the calibration stored with the model")
+    parser.add_argument("--output", default="evaluation.json")
+    args = parser.parse_args()
+
+    if args.backend == "auto":
+        args.backend = detect_backend(args.model)
+    if args.model is None:
+        args.model = default_model(args.backend) or "gesture_model.h5"
+
+    samples = load_samples(args.data, args.split, args.subset)
+    metadata = load_model_metadata(args.model, args.data)
+    classes = metadata["classes"]
+    preprocessing = dict(metadata["preprocessing"])
+    if args.color_order:
+        preprocessing["color_order"] = args.color_order
+    known = [(p, classes.index(c)) for p, c in samples if c in classes]
+    skipped = len(samples) - len(known)
+    if skipped:
+        print(f"⚠ Skipping {skipped} images whose class is not in the model")
+    if not known:
+        print("❌ ERROR: No labelled images to evaluate")
+        exit(1)
+
+    print("=" * 60)
+    print(f"EVALUATING {args.model} ({args.backend} backend)")
+    print("=" * 60)
+    print(f"Images: {len(known)} | Classes: {classes} (from {metadata['source']})")
+    calibrated = bool(metadata.get("calibration")) and not args.raw
+    print(f"Confidence: {'calibrated (' + metadata['calibration']['method'] + ')' if calibrated else 'raw'}")
+    print(f"Workers: {args.workers} x {args.threads} thread(s) | Batch: {args.batch_size}")
+
+    jobs = []
+    for start in range(0, len(known), args.batch_size):
+        chunk = known[start:start + args.batch_size]
+        jobs.append(([p for p, _ in chunk], [label for _, label in chunk],
+                     metadata["img_size"], preprocessing))
+
+    all_probs, all_labels = [], []
+    invoke_time = 0.0
+    unreadable = 0
+    start_time = time.perf_counter()
+    with Pool(args.workers, initializer=init_worker,
+              initargs=(args.backend, args.model, args.batch_size, args.threads,
+                        args.server_socket, not args.raw)) as pool:
+        for probs, labels, elapsed, failed in pool.imap_unordered(evaluate_chunk, jobs):
+            if labels:
+                all_probs.append(probs)
+                all_labels.extend(labels)
+            invoke_time += elapsed
+            unreadable += failed
+    wall_time = time.perf_counter() - start_time
+
+    if not all_probs:
+        print(f"❌ ERROR: No readable images ({unreadable} unreadable)")
+        exit(1)
+    probs = np.concatenate(all_probs)
+    labels = np.asarray(all_labels)
+    report = compute_metrics(probs, labels, classes)
+    report.update({
+        "model": args.model,
+        "backend": args.backend,
+        "classes": classes,
+        "images": int(len(labels)),
+        "unreadable": unreadable,
+        "preprocessing": preprocessing,
+        "calibrated": calibrated,
+        "throughput": {
+            "workers": args.workers,
+            "threads_per_worker": args.threads,
+            "batch_size": args.batch_size,
+            "wall_seconds": round(wall_time, 3),
+            "images_per_second": round(len(labels) / wall_time, 1),
+            "invoke_ms_per_image": round(invoke_time / len(labels) * 1000, 3),
+        },
+    })
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nAccuracy: {report['accuracy'] * 100:.2f}% | ECE: {report['ece']:.4f}")
+    for name, stats in report["per_class"].items():
+        print(f"  {name:12} P {stats['precision']:.3f}  R {stats['recall']:.3f}  "
+              f"F1 {stats['f1']:.3f}  (n={stats['support']})")
+    print(f"Throughput: {report['throughput']['images_per_second']} img/s "
+          f"({report['throughput']['invoke_ms_per_image']} ms/img invoke)")
+    print(f"\n✓ Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
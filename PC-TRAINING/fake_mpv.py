@@ -0,0 +1,435 @@
+"""
+Fake MPV IPC Server
+
+Local stand-in for `mpv --input-ipc-server` so the real actuation path
+(socket connect, JSON framing, reply/event handling in mpv_ipc.py) runs on a
+PC without MPV. Speaks the MPV JSON protocol:
+
+    {"command": ["seek", "10"], "request_id": 7}
+    -> {"error": "success", "data": null, "request_id": 7}
+    -> {"event": "seek"}  /  {"event": "property-change", "id": 1, "name": "time-pos", "data": 12.3}
+
+Supported commands: get_property, set_property, cycle, add, seek,
+observe_property, unobserve_property, client_name, get_version, quit.
+Playback position advances in real time while unpaused, and observed
+time-pos changes are pushed every --event-interval seconds so clients see
+unsolicited events between replies, like with the real player.
+
+Response delay and faults are configurable:
+    --delay / --jitter   seconds added before every reply
+    --error-rate         reply with an error instead of running the command
+    --drop-rate          run nothing and never reply (client times out)
+    --disconnect-rate    close the connection instead of replying
+    --garbage-rate       reply with a truncated JSON line
+
+Usage:
+    python fake_mpv.py --socket /tmp/mpv-socket
+    python fake_mpv.py --socket /tmp/mpv-socket --delay 0.005 --jitter 0.002 --error-rate 0.02
+    python ../JETSON-NANO-PROJECT/media_control_mpv.py --mpv-socket /tmp/mpv-socket
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import socketserver
+import threading
+import time
+
+from mpv_ipc import DEFAULT_SOCKET
+
+MPV_VERSION = 0x00220000       # Reported by get_version (0.34)
+DURATION = 600.0                # Seconds of the fake file
+MAX_VOLUME = 130.0              # mpv's default --volume-max
+EVENT_INTERVAL = 0.05           # Seconds between pushed time-pos changes (0 = off)
+FAULTS = ('error', 'drop', 'disconnect', 'garbage')
+
+INITIAL_PROPERTIES = {
+    'pause': False,
+    'mute': False,
+    'volume': 100.0,
+    'speed': 1.0,
+    'duration': DURATION,
+    'filename': 'fake.mp4',
+    'media-title': 'fake.mp4',
+    'idle-active': False,
+}
+
+
+class CommandError(Exception):
+    """Command rejected by the fake player; the message is sent as the reply's "error" """
+    pass
+
+
+class FaultInjector:
+    """Picks the per-command delay and fault from the configured rates"""
+
+    def __init__(self, delay=0.0, jitter=0.0, error_rate=0.0, drop_rate=0.0,
+                 disconnect_rate=0.0, garbage_rate=0.0, seed=None):
+        self.delay = delay
+        self.jitter = jitter
+        self.rates = [('error', error_rate), ('drop', drop_rate),
+                      ('disconnect', disconnect_rate), ('garbage', garbage_rate)]
+        if sum(rate for _, rate in self.rates) > 1.0:
+            raise ValueError("Fault rates must sum to at most 1.0")
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def pick(self):
+        """(delay seconds, fault name or None) for the next command"""
+        with self.lock:
+            delay = self.delay + (self.random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+            roll = self.random.random()
+        for fault, rate in self.rates:
+            if roll < rate:
+                return delay, fault
+            roll -= rate
+        return delay, None
+
+
+class FakePlayer:
+    """Player state shared by all connections"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.properties = dict(INITIAL_PROPERTIES)
+        self.position = 0.0
+        self.position_time = time.time()
+
+    def _time_pos(self, now):
+        if self.properties['pause']:
+            return self.position
+        elapsed = (now - self.position_time) * self.properties['speed']
+        return (self.position + elapsed) % DURATION
+
+    def _set_position(self, value, now):
+        self.position = min(max(float(value), 0.0), DURATION)
+        self.position_time = now
+
+    def get(self, name):
+        with self.lock:
+            return self._get(name, time.time())
+
+    def _get(self, name, now):
+        if name in ('time-pos', 'playback-time'):
+            return round(self._time_pos(now), 3)
+        if name == 'percent-pos':
+            return round(100.0 * self._time_pos(now) / DURATION, 3)
+        if name not in self.properties:
+            raise CommandError('property unavailable')
+        return self.properties[name]
+
+    def _set(self, name, value, now):
+        """Set one property; returns the events caused by the change"""
+        if name in ('time-pos', 'playback-time'):
+            self._set_position(value, now)
+            return [{'event': 'seek'}, {'event': 'playback-restart'}]
+        if name not in self.properties or name in ('duration', 'filename', 'media-title'):
+            raise CommandError('property unavailable')
+        current = self.properties[name]
+        if isinstance(current, bool):
+            if isinstance(value, str):
+                value = value == 'yes'
+            value = bool(value)
+        elif isinstance(current, float):
+            value = float(value)
+            if name == 'volume':
+                value = min(max(value, 0.0), MAX_VOLUME)
+        if name == 'pause' and value != current:
+            self.position = self._time_pos(now)
+            self.position_time = now
+        self.properties[name] = value
+        if name == 'pause' and value != current:
+            return [{'event': 'pause' if value else 'unpause'}]
+        return []
+
+    def execute(self, args):
+        """Run one command; returns (data, events, changed property names)"""
+        if not isinstance(args, list) or not args:
+            raise CommandError('invalid parameter')
+        name, params = str(args[0]), [str(p) if not isinstance(p, (bool, int, float)) else p
+                                      for p in args[1:]]
+        now = time.time()
+        try:
+            with self.lock:
+                if name == 'get_property':
+                    return self._get(params[0], now), [], ()
+                if name == 'set_property':
+                    return None, self._set(params[0], params[1], now), (params[0],)
+                if name == 'cycle':
+                    current = self._get(params[0], now)
+                    if not isinstance(current, bool):
+                        raise CommandError('invalid parameter')
+                    return None, self._set(params[0], not current, now), (params[0],)
+                if name == 'add':
+                    step = float(params[1]) if len(params) > 1 else 1.0
+                    value = self._get(params[0], now) + step
+                    return None, self._set(params[0], value, now), (params[0],)
+                if name == 'seek':
+                    mode = params[1] if len(params) > 1 else 'relative'
+                    target = float(params[0])
+                    if mode.startswith('relative'):
+                        target += self._time_pos(now)
+                    elif mode.startswith('absolute-percent'):
+                        target = DURATION * target / 100.0
+                    return None, self._set('time-pos', target, now), ('time-pos',)
+        except (IndexError, ValueError, TypeError):
+            raise CommandError('invalid parameter')
+        if name == 'client_name':
+            return 'fake_mpv', [], ()
+        if name == 'get_version':
+            return MPV_VERSION, [], ()
+        raise CommandError('invalid parameter')
+
+
+class FakeMPVHandler(socketserver.StreamRequestHandler):
+    """One IPC client connection"""
+
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.observed = {}  # observe id -> property name
+        self.last_values = {}  # observe id -> last value sent (MPV only reports changes)
+        self.server.register(self)
+
+    def finish(self):
+        self.server.unregister(self)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def send(self, message):
+        """Write one JSON line; False once the client is gone"""
+        data = (message if isinstance(message, bytes) else
+                (json.dumps(message) + '\n').encode('utf-8'))
+        with self.write_lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+                return True
+            except OSError:
+                return False
+
+    def property_changed(self, name, value):
+        for observe_id, observed in list(self.observed.items()):
+            if observed == name and self.last_values.get(observe_id, self) != value:
+                self.last_values[observe_id] = value
+                self.send({'event': 'property-change', 'id': observe_id, 'name': name, 'data': value})
+
+    def handle(self):
+        try:
+            self._serve()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away mid-request
+
+    def _serve(self):
+        server = self.server
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                args = request['command']
+                request_id = request.get('request_id', 0)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.send({'error': 'invalid parameter'})
+                continue
+            delay, fault = server.faults.pick()
+            server.count(args[0] if isinstance(args, list) and args else '?', fault)
+            if delay > 0:
+                time.sleep(delay)
+            if fault == 'drop':
+                continue
+            if fault == 'disconnect':
+                return
+            if fault == 'garbage':
+                self.send(b'{"error": "succ\n')
+                continue
+            if fault == 'error':
+                self.send({'error': 'error running command', 'request_id': request_id})
+                continue
+            if args and args[0] == 'quit':
+                self.send({'error': 'success', 'data': None, 'request_id': request_id})
+                server.broadcast({'event': 'shutdown'})
+                server.stopped.set()
+                threading.Thread(target=server.shutdown, daemon=True).start()
+                return
+            if args and args[0] in ('observe_property', 'unobserve_property'):
+                self._observe(args, request_id)
+                continue
+            try:
+                data, events, changed = server.player.execute(args)
+            except CommandError as e:
+                self.send({'error': str(e), 'request_id': request_id})
+                continue
+            self.send({'error': 'success', 'data': data, 'request_id': request_id})
+            for event in events:
+                server.broadcast(event)
+            for name in changed:
+                server.property_changed('time-pos' if name == 'playback-time' else name)
+
+    def _observe(self, args, request_id):
+        try:
+            observe_id = int(args[1])
+            if args[0] == 'observe_property':
+                name = str(args[2])
+                value = self.server.player.get(name)
+        except (IndexError, ValueError, TypeError):
+            self.send({'error': 'invalid parameter', 'request_id': request_id})
+            return
+        except CommandError:
+            value = None  # mpv accepts unknown properties and reports them as unavailable
+        if args[0] == 'unobserve_property':
+            self.observed.pop(observe_id, None)
+            self.last_values.pop(observe_id, None)
+            self.send({'error': 'success', 'request_id': request_id})
+            return
+        self.observed[observe_id] = name
+        self.last_values[observe_id] = value
+        self.send({'error': 'success', 'request_id': request_id})
+        self.send({'event': 'property-change', 'id': observe_id, 'name': name, 'data': value})
+
+
+class FakeMPVServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded fake MPV listening on a Unix socket; start() serves in the background"""
+    daemon_threads = True
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, faults=None, event_interval=EVENT_INTERVAL):
+        if os.path.exists(socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+                raise OSError(f"{socket_path} is in use by a running player")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(socket_path)  # Stale socket from a crashed player
+            finally:
+                probe.close()
+        self.socket_path = socket_path
+        self.faults = faults or FaultInjector()
+        self.player = FakePlayer()
+        self.event_interval = event_interval
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+        self.commands = {}
+        self.faults_injected = {fault: 0 for fault in FAULTS}
+        self.stats_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = []
+        super().__init__(socket_path, FakeMPVHandler)
+
+    def register(self, client):
+        with self.clients_lock:
+            self.clients.add(client)
+
+    def unregister(self, client):
+        with self.clients_lock:
+            self.clients.discard(client)
+
+    def count(self, command, fault):
+        with self.stats_lock:
+            self.commands[command] = self.commands.get(command, 0) + 1
+            if fault:
+                self.faults_injected[fault] += 1
+
+    def broadcast(self, event):
+        """Send an event to every connected client (MPV sends events to all clients)"""
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.send(event)
+
+    def property_changed(self, name):
+        value = self.player.get(name)
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.property_changed(name, value)
+
+    def _push_events(self):
+        while not self.stopped.wait(self.event_interval):
+            self.property_changed('time-pos')
+
+    def start(self):
+        """Serve in background threads; returns self"""
+        self.threads = [threading.Thread(target=self.serve_forever, name='fake-mpv', daemon=True)]
+        if self.event_interval > 0:
+            self.threads.append(threading.Thread(target=self._push_events, name='fake-mpv-events',
+                                                 daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.shutdown()
+        self.server_close()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self.stats_lock:
+            return {'commands': dict(self.commands), 'total': sum(self.commands.values()),
+                    'faults': dict(self.faults_injected)}
+
+
+def add_fault_arguments(parser):
+    """Delay / fault flags shared by fake_mpv.py and actuation_benchmark.py"""
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds before every reply')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random delay up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of commands answered with an error')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='fraction of commands never answered')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0,
+                        help='fraction of commands that close the connection')
+    parser.add_argument('--garbage-rate', type=float, default=0.0,
+                        help='fraction of commands answered with malformed JSON')
+    parser.add_argument('--seed', type=int, default=None, help='fault random seed')
+
+
+def faults_from_args(args):
+    return FaultInjector(args.delay, args.jitter, args.error_rate, args.drop_rate,
+                         args.disconnect_rate, args.garbage_rate, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake MPV JSON IPC server")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket to listen on')
+    parser.add_argument('--event-interval', type=float, default=EVENT_INTERVAL,
+                        help='seconds between pushed time-pos changes (0 = off)')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeMPVServer(args.socket, faults_from_args(args), args.event_interval).start()
+    print("=" * 60)
+    print("FAKE MPV IPC SERVER")
+    print("=" * 60)
+    print(f"✓ Listening on {args.socket}")
+    print(f"  Delay: {args.delay * 1000:.1f}ms (+{args.jitter * 1000:.1f}ms jitter)")
+    print(f"  Faults: error {args.error_rate:.1%}, drop {args.drop_rate:.1%}, "
+          f"disconnect {args.disconnect_rate:.1%}, garbage {args.garbage_rate:.1%}")
+    print("Press Ctrl+C to stop")
+    try:
+        while not server.stopped.wait(5.0):
+            stats = server.stats()
+            if stats['total']:
+                print(f"  {stats['total']} commands, faults {stats['faults']}, "
+                      f"pause={server.player.get('pause')} volume={server.player.get('volume'):.0f} "
+                      f"time-pos={server.player.get('time-pos'):.1f}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n✓ Stopped after {server.stats()['total']} commands")
+
+
+if __name__ == '__main__':
+    main()
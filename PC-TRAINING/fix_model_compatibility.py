@@ -20,21 +20,61 @@ print(f"\nCurrent TensorFlow version: {tf.__version__}")
 # Configuration
 IMG_SIZE = 128
 BATCH_SIZE = 8
+SPLIT_FILE = "dataset_split.json"  # Group-aware split written by dataset_index.py
 
-# Load the dataset to get number of classes
+
+def load_image(path, label):
+    """Decode and scale one image the same way ImageDataGenerator does"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, (IMG_SIZE, IMG_SIZE), method='nearest')
+    return tf.cast(image, tf.float32) / 255.0, tf.one_hot(label, num_classes)
+
+
+def make_dataset(items, shuffle):
+    """Build a batched tf.data pipeline from [(path, class_name)]"""
+    paths = [path for path, _ in items]
+    labels = [class_names.index(class_name) for _, class_name in items]
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), seed=42, reshuffle_each_iteration=True)
+    dataset = dataset.map(load_image, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    return dataset.batch(BATCH_SIZE).prefetch(tf.data.experimental.AUTOTUNE)
+
+
+# Load the dataset to get number of classes (and data, if training from scratch is needed)
 print("\nLoading dataset to determine classes...")
-train_datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
-
-train_generator = train_datagen.flow_from_directory(
-    "dataset",
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='training'
-)
+if os.path.exists(SPLIT_FILE):
+    # Same group-aware split as train_model.py: near-duplicates never straddle train/val
+    from dataset_index import load_split
+    class_names, train_items, val_items = load_split(SPLIT_FILE)
+    num_classes = len(class_names)
+    print(f"Using group-aware split from {SPLIT_FILE}: "
+          f"{len(train_items)} train / {len(val_items)} val images")
+    train_generator = make_dataset(train_items, shuffle=True)
+    val_generator = make_dataset(val_items, shuffle=False)
+else:
+    print(f"⚠ {SPLIT_FILE} not found - splitting by file order "
+          f"(run dataset_index.py to avoid near-duplicate leakage)")
+    train_datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
+
+    train_generator = train_datagen.flow_from_directory(
+        "dataset",
+        target_size=(IMG_SIZE, IMG_SIZE),
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='training'
+    )
 
-num_classes = len(train_generator.class_indices)
-class_names = list(train_generator.class_indices.keys())
+    val_generator = train_datagen.flow_from_directory(
+        "dataset",
+        target_size=(IMG_SIZE, IMG_SIZE),
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='validation'
+    )
+
+    class_names = list(train_generator.class_indices.keys())
+    num_classes = len(class_names)
 print(f"Number of classes: {num_classes}")
 print(f"Classes: {class_names}")
 
@@ -76,14 +116,6 @@ except Exception as e:
     print(f"\n⚠ Could not load old model: {e}")
     print("Training new model from scratch...")
     
-    val_generator = train_datagen.flow_from_directory(
-        "dataset",
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        subset='validation'
-    )
-    
     model_new.compile(
         optimizer='adam',
         loss='categorical_crossentropy',
@@ -0,0 +1,329 @@
+"""
+Shared-Memory Frame Bus
+
+Only one process can own /dev/video0, but recording, preview and the gesture
+controller all want the same stream. One producer captures into a ring of
+frame slots in shared memory (see shm_buffer.py); any number of consumers map
+the same ring and read the newest slot as a NumPy view, with no copy and no
+locking that could stall the producer.
+
+Layout:
+    [header 64 B][slot seq u64 x N][slot timestamp f64 x N][frame slot x N]
+
+Each slot is guarded by a sequence lock: the producer makes the slot's
+counter odd before writing and even (2 * frame_number + 2) afterwards.
+A reader that sees the same even counter before and after using a view knows
+the pixels were not overwritten meanwhile; with N slots a view stays valid
+for about N - 1 frame periods.
+
+Usage:
+    python frame_bus.py                      # publish camera 0/1 as "gesture-frames"
+    python frame_bus.py --monitor            # consumer: print fps / lag / torn reads
+    python3 media_control_mpv.py --frame-bus gesture-frames
+"""
+import argparse
+import struct
+import time
+
+import numpy as np
+
+from shm_buffer import SharedBuffer
+
+# ==================== CONFIGURATION ====================
+DEFAULT_BUS = "gesture-frames"
+RING_SLOTS = 4
+POLL_INTERVAL = 0.001  # Seconds between checks while waiting for a new frame
+
+BUS_MAGIC = b"GSTFBUS1"
+BUS_VERSION = 1
+HEADER = struct.Struct("<8sIIIII")  # magic, version, slots, height, width, channels
+HEADER_SIZE = 64
+LATEST_OFFSET = 40                  # u64 latest published frame number, inside the header
+
+
+class FrameBusError(Exception):
+    """Raised when a bus does not exist or has an incompatible layout"""
+
+
+class Frame:
+    """A frame read from the bus: a view into shared memory plus its sequence and timestamp"""
+
+    def __init__(self, bus, slot, seq, timestamp, image):
+        self.bus = bus
+        self.slot = slot
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+
+    @property
+    def number(self):
+        return self.seq // 2 - 1
+
+    def valid(self):
+        """True while the producer has not started overwriting this slot"""
+        return int(self.bus.slot_seq[self.slot]) == self.seq
+
+
+class _FrameBus:
+    """Views over a mapped ring shared by producer and consumers"""
+
+    def _map(self, slots, height, width, channels):
+        self.slots = slots
+        self.shape = (height, width, channels)
+        offset = HEADER_SIZE
+        self.latest = self.shm.ndarray((1,), np.uint64, LATEST_OFFSET)
+        self.slot_seq = self.shm.ndarray((slots,), np.uint64, offset)
+        offset += 8 * slots
+        self.slot_time = self.shm.ndarray((slots,), np.float64, offset)
+        offset += 8 * slots
+        self.frames = self.shm.ndarray((slots,) + self.shape, np.uint8, offset)
+
+    @staticmethod
+    def size_for(slots, height, width, channels):
+        return HEADER_SIZE + 16 * slots + slots * height * width * channels
+
+    def close(self):
+        self.latest = self.slot_seq = self.slot_time = self.frames = None
+        self.shm.close()
+
+
+class FrameBusWriter(_FrameBus):
+    """Producer side: owns the ring and publishes frames into it"""
+
+    def __init__(self, name=DEFAULT_BUS, width=640, height=480, channels=3, slots=RING_SLOTS):
+        self.name = name
+        self.shm = SharedBuffer(name, self.size_for(slots, height, width, channels), create=True)
+        self._map(slots, height, width, channels)
+        self.slot_seq[:] = 0
+        self.latest[0] = 0
+        # Magic last, so a consumer never maps a half-initialized ring
+        self.shm.buffer[:HEADER.size] = HEADER.pack(BUS_MAGIC, BUS_VERSION, slots, height, width, channels)
+        self.published = 0
+        self._slot = None
+
+    def begin(self):
+        """
+        Claim the next slot and return a view to capture straight into,
+        e.g. cap.read(bus.begin()); finish with commit().
+        """
+        self._slot = self.published % self.slots
+        self.slot_seq[self._slot] = 2 * self.published + 1  # odd: write in progress
+        return self.frames[self._slot]
+
+    def commit(self, timestamp=None):
+        """Publish the slot claimed by begin()"""
+        slot = self._slot
+        self.slot_time[slot] = time.time() if timestamp is None else timestamp
+        self.slot_seq[slot] = 2 * self.published + 2
+        self.published += 1
+        self.latest[0] = self.published
+        self._slot = None
+
+    def publish(self, frame, timestamp=None):
+        """Copy a frame into the next slot and publish it"""
+        view = self.begin()
+        if frame.shape != view.shape:
+            self.commit(timestamp)  # keep the counter even before failing
+            raise FrameBusError(f"frame shape {frame.shape} does not match bus {view.shape}")
+        view[...] = frame
+        self.commit(timestamp)
+
+    def close(self):
+        _FrameBus.close(self)
+        self.shm.unlink()
+
+
+class FrameBusReader(_FrameBus):
+    """Consumer side: maps an existing ring read-only by convention"""
+
+    def __init__(self, name=DEFAULT_BUS):
+        self.name = name
+        try:
+            self.shm = SharedBuffer(name)
+        except OSError as e:
+            raise FrameBusError(f"frame bus {name!r} not found (is the producer running?): {e}")
+        except ValueError:
+            # mmap of a zero-length file: the producer has created but not sized it yet
+            raise FrameBusError(f"frame bus {name!r} is not initialized yet")
+        if self.shm.size < HEADER_SIZE:
+            self.shm.close()
+            raise FrameBusError(f"frame bus {name!r} is not initialized yet")
+        magic, version, slots, height, width, channels = HEADER.unpack(bytes(self.shm.buffer[:HEADER.size]))
+        if magic != BUS_MAGIC or version != BUS_VERSION:
+            self.shm.close()
+            raise FrameBusError(f"{name!r} is not a v{BUS_VERSION} frame bus")
+        self._map(slots, height, width, channels)
+        self.last_number = 0
+        self.torn = 0
+
+    def published(self):
+        """Number of frames the producer has published so far"""
+        return int(self.latest[0])
+
+    def latest_frame(self):
+        """The newest complete frame as a zero-copy Frame, or None if none yet"""
+        for _ in range(self.slots):
+            number = self.published()
+            if number == 0:
+                return None
+            slot = (number - 1) % self.slots
+            seq = int(self.slot_seq[slot])
+            if seq == 2 * number:
+                return Frame(self, slot, seq, float(self.slot_time[slot]), self.frames[slot])
+            # Producer lapped us between the two reads; count it and retry
+            self.torn += 1
+        return None
+
+    def wait(self, timeout=1.0):
+        """Block (polling) until a frame newer than the last one returned, or None on timeout"""
+        deadline = time.time() + timeout
+        while True:
+            if self.published() > self.last_number:
+                frame = self.latest_frame()
+                if frame is not None:
+                    self.last_number = frame.number + 1
+                    return frame
+            if time.time() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def read_copy(self, timeout=1.0):
+        """Next frame copied out of shared memory (retries torn reads); returns (frame, array) or (None, None)"""
+        while True:
+            frame = self.wait(timeout)
+            if frame is None:
+                return None, None
+            image = frame.image.copy()
+            if frame.valid():
+                return frame, image
+            self.torn += 1
+
+
+class BusCapture:
+    """cv2.VideoCapture-style wrapper so camera loops can read from a bus unchanged"""
+
+    def __init__(self, name=DEFAULT_BUS, timeout=2.0):
+        self.reader = FrameBusReader(name)
+        self.timeout = timeout
+
+    def isOpened(self):
+        return self.reader is not None
+
+    def read(self):
+        """Returns (ret, frame); frame is a shared-memory view valid for ~slots-1 frames"""
+        frame = self.reader.wait(self.timeout)
+        if frame is None:
+            return False, None
+        return True, frame.image
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def open_bus_capture(name=DEFAULT_BUS, timeout=5.0):
+    """Like capture.open_camera() for a bus: returns (cap, name, first_frame) or (None, None, None)"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            cap = BusCapture(name)
+            break
+        except FrameBusError:
+            if time.time() >= deadline:
+                return None, None, None
+            time.sleep(0.2)
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        return None, None, None
+    return cap, name, frame
+
+
+# ==================== CLI ====================
+def run_producer(args):
+    from capture import CAMERA_INDICES, open_camera
+    indices = [args.camera] if args.camera is not None else CAMERA_INDICES
+    cap, index, frame = open_camera(indices, args.width, args.height)
+    if cap is None:
+        print(f"❌ ERROR: Cannot open camera (tried {list(indices)})")
+        exit(1)
+    height, width = frame.shape[:2]
+    bus = FrameBusWriter(args.name, width, height, frame.shape[2], args.slots)
+    print(f"✓ Camera {index} → bus '{args.name}' ({width}x{height}, {args.slots} slots)")
+    print("Press Ctrl+C to stop")
+
+    start = time.time()
+    count = 0
+    try:
+        while True:
+            # Decode straight into the shared slot: no intermediate copy
+            view = bus.begin()
+            ret, image = cap.read(view)
+            if ret and not np.shares_memory(image, view):
+                # Backend allocated its own buffer (size changed?): copy if it still fits
+                ret = image.shape == view.shape
+                if ret:
+                    view[...] = image
+            bus.commit()
+            if not ret:
+                print("⚠ Camera read failed")
+                break
+            count += 1
+            if count % 100 == 0:
+                print(f"  {count} frames, {count / (time.time() - start):.1f} fps")
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        cap.release()
+        bus.close()
+
+
+def run_monitor(args):
+    try:
+        reader = FrameBusReader(args.name)
+    except FrameBusError as e:
+        print(f"❌ ERROR: {e}")
+        exit(1)
+    print(f"✓ Reading bus '{args.name}' {reader.shape} ({reader.slots} slots)")
+    start = time.time()
+    received = 0
+    first = None
+    lag_total = 0.0
+    try:
+        while True:
+            frame = reader.wait(timeout=2.0)
+            if frame is None:
+                print("⚠ No frames for 2s")
+                continue
+            first = frame.number if first is None else first
+            received += 1
+            lag_total += time.time() - frame.timestamp
+            if received % 100 == 0:
+                elapsed = time.time() - start
+                skipped = frame.number - first + 1 - received
+                print(f"  {received / elapsed:.1f} fps | lag {lag_total / received * 1000:.2f} ms | "
+                      f"skipped {skipped} | torn {reader.torn}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory camera frame bus")
+    parser.add_argument("--name", default=DEFAULT_BUS)
+    parser.add_argument("--monitor", action="store_true", help="run as a consumer and print stats")
+    parser.add_argument("--camera", type=int, default=None, help="camera index (default: try 0, 1)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--slots", type=int, default=RING_SLOTS)
+    args = parser.parse_args()
+    if args.monitor:
+        run_monitor(args)
+    else:
+        run_producer(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Gesture Decision Logic
+
+Turns per-frame (gesture, confidence) predictions into player commands:
+a gesture must stay above the confidence threshold for the hold time before
+it fires; play/stop follow the playback state, volume repeats at its own
+interval and forward/reverse need a cooldown and a change of gesture.
+
+Each stream/player pair owns one GestureDecider, so several cameras can be
+served from one process without sharing state. MotionTrigger does the same
+for swipes recognised by temporal_head.py.
+
+Threshold, hold time and cooldown can be set per class from the
+decision_config.json written by tune_decisions.py; classes it does not list
+keep the global settings.
+"""
+import json
+import os
+import time
+
+CONFIDENCE_THRESHOLD = 90.0  # Percent
+GESTURE_HOLD_TIME = 0.5      # Seconds a gesture must be held before triggering
+COMMAND_COOLDOWN = 0.5       # Seconds between forward/reverse commands
+VOLUME_CHANGE_INTERVAL = 0.5 # Seconds between volume changes
+MOTION_THRESHOLD = 85.0      # Percent, for temporal (swipe) gestures
+MOTION_COOLDOWN = 1.0        # Seconds before another motion gesture may fire
+DECISION_CONFIG_FILE = "decision_config.json"
+DECISION_CONFIG_VERSION = 1
+REPEAT_GESTURES = ('volume_up',)  # Fire repeatedly while held (cooldown = repeat interval)
+
+
+class GestureDecider:
+    def __init__(self, confidence_threshold=CONFIDENCE_THRESHOLD, hold_time=GESTURE_HOLD_TIME,
+                 command_cooldown=COMMAND_COOLDOWN, volume_interval=VOLUME_CHANGE_INTERVAL,
+                 class_config=None):
+        self.confidence_threshold = confidence_threshold
+        self.hold_time = hold_time
+        self.command_cooldown = command_cooldown
+        self.volume_interval = volume_interval
+        # gesture -> {"confidence_threshold", "hold_time", "cooldown"}, each optional
+        self.class_config = dict(class_config or {})
+
+        self.is_playing = True           # Video starts playing
+        self.current_gesture = None      # Gesture currently above threshold
+        self.gesture_start_time = None   # When current_gesture was first seen
+        self.stable_gesture = None       # Gesture held long enough to act on
+        self.last_detected_gesture = None
+        self.last_command_time = 0
+        self.last_volume_change_time = 0
+        self.last_fire_times = {}        # Per gesture, for play/stop cooldowns
+
+    def threshold_for(self, gesture):
+        return self.class_config.get(gesture, {}).get("confidence_threshold", self.confidence_threshold)
+
+    def hold_time_for(self, gesture):
+        return self.class_config.get(gesture, {}).get("hold_time", self.hold_time)
+
+    def cooldown_for(self, gesture):
+        """Repeat interval for volume, cooldown for forward/reverse, none for play/stop by default"""
+        if gesture in REPEAT_GESTURES:
+            default = self.volume_interval
+        elif gesture in ('forward', 'reverse'):
+            default = self.command_cooldown
+        else:
+            default = 0.0
+        return self.class_config.get(gesture, {}).get("cooldown", default)
+
+    def observe(self, gesture, confidence, now=None):
+        """Update the hold timer with one prediction; returns the stable gesture or None"""
+        now = time.time() if now is None else now
+        if confidence >= self.threshold_for(gesture):
+            if self.current_gesture == gesture:
+                if self.gesture_start_time is not None:
+                    held = now - self.gesture_start_time
+                    self.stable_gesture = gesture if held >= self.hold_time_for(gesture) else None
+                else:
+                    self.gesture_start_time = now
+                    self.stable_gesture = None
+            else:
+                # New gesture detected, reset timer
+                self.current_gesture = gesture
+                self.gesture_start_time = now
+                self.stable_gesture = None
+        else:
+            # Confidence too low, reset
+            self.current_gesture = None
+            self.gesture_start_time = None
+            self.stable_gesture = None
+        return self.stable_gesture
+
+    def act(self, send, now=None):
+        """
+        Fire the stable gesture through send(gesture) -> bool if its rules allow.
+        Returns the gesture sent, or None.
+        """
+        now = time.time() if now is None else now
+        gesture = self.stable_gesture
+        if not gesture:
+            # Allow the same forward/reverse again once the cooldown has passed
+            if self.last_detected_gesture in ('forward', 'reverse') and \
+                    now - self.last_command_time > self.cooldown_for(self.last_detected_gesture):
+                self.last_detected_gesture = None
+            return None
+
+        cooled_down = now - self.last_fire_times.get(gesture, float('-inf')) >= self.cooldown_for(gesture)
+        if gesture == 'play' and not self.is_playing and cooled_down:
+            if send('play'):
+                self.is_playing = True
+                self.last_detected_gesture = 'play'
+                self.last_fire_times[gesture] = now
+                return gesture
+        elif gesture == 'stop' and self.is_playing and cooled_down:
+            if send('stop'):
+                self.is_playing = False
+                self.last_detected_gesture = 'stop'
+                self.last_fire_times[gesture] = now
+                return gesture
+        elif gesture in REPEAT_GESTURES:
+            # Continuous control with its own shorter interval
+            if now - self.last_volume_change_time >= self.cooldown_for(gesture):
+                if send(gesture):
+                    self.last_volume_change_time = now
+                    self.last_fire_times[gesture] = now
+                    return gesture
+        elif gesture in ('forward', 'reverse'):
+            if now - self.last_command_time >= self.cooldown_for(gesture) and \
+                    gesture != self.last_detected_gesture:
+                if send(gesture):
+                    self.last_command_time = now
+                    self.last_detected_gesture = gesture
+                    self.last_fire_times[gesture] = now
+                    return gesture
+        return None
+
+    def update(self, gesture, confidence, send, now=None):
+        """observe() then act(); returns the gesture sent, or None"""
+        now = time.time() if now is None else now
+        self.observe(gesture, confidence, now)
+        return self.act(send, now)
+
+    def hold_remaining(self, now=None):
+        """Seconds until the current gesture triggers (None if nothing is being held)"""
+        if self.gesture_start_time is None:
+            return None
+        now = time.time() if now is None else now
+        return max(0.0, self.hold_time_for(self.current_gesture) - (now - self.gesture_start_time))
+
+
+def load_decision_config(path=DECISION_CONFIG_FILE):
+    """Per-class settings written by tune_decisions.py (None if the file does not exist)"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        config = json.load(f)
+    if config.get("format_version", 0) > DECISION_CONFIG_VERSION:
+        raise ValueError(f"{path} uses decision config v{config['format_version']}, "
+                         f"this runtime reads v{DECISION_CONFIG_VERSION}")
+    return config
+
+
+def create_decider(config=None, **settings):
+    """GestureDecider with the given global settings and the per-class entries of a decision config"""
+    if config:
+        settings["class_config"] = config.get("classes") or {}
+    return GestureDecider(**settings)
+
+
+class MotionTrigger:
+    """
+    Fires dynamic gestures from the temporal head. A swipe is an event, not a
+    held pose: it fires once when confident, then the cooldown (longer than
+    the window) keeps the same swipe from firing again as it slides by.
+    """
+
+    def __init__(self, confidence_threshold=MOTION_THRESHOLD, cooldown=MOTION_COOLDOWN, none_class="none"):
+        self.confidence_threshold = confidence_threshold
+        self.cooldown = cooldown
+        self.none_class = none_class
+        self.last_fire_time = 0
+
+    def update(self, gesture, confidence, send, now=None):
+        """Returns the gesture sent, or None"""
+        now = time.time() if now is None else now
+        if gesture == self.none_class or confidence < self.confidence_threshold:
+            return None
+        if now - self.last_fire_time < self.cooldown:
+            return None
+        if send(gesture):
+            self.last_fire_time = now
+            return gesture
+        return None
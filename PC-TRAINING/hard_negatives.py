@@ -0,0 +1,188 @@
+"""
+Hard-Negative Sample Sink
+
+Keeps the ROIs the live runtime got wrong or nearly wrong, for the next
+retraining round. Frames are selected when:
+- low_margin: the top two class probabilities are within LOW_MARGIN of each
+  other while the top one is at least LOW_MARGIN_CONFIDENCE
+- undo: they were seen just before a command the user undid within
+  UNDO_WINDOW seconds (forward then reverse, play then stop, ...)
+- random: a RANDOM_RATE fraction of all frames, as an unbiased reference
+
+The frame loop only copies the ROI into a short ring buffer and queues the
+selected ones on an AsyncImageWriter; JPEG encoding and disk writes run on
+its thread, and a full queue drops the sample instead of waiting. A token
+bucket caps the images per hour and STORE_LIMIT_MB caps the whole store, so
+flash wear stays bounded on the Jetson.
+
+Layout: hard_negatives/<reason>/<predicted>/<time>_<top1><conf>_<top2><conf>.jpg
+Review the images and move them into dataset/<true gesture>/ (the
+collect_data.py layout) before retraining.
+"""
+import collections
+import os
+import random
+import time
+
+import numpy as np
+
+from dataset_writer import AsyncImageWriter
+
+HARD_NEGATIVE_DIR = 'hard_negatives'
+LOW_MARGIN = 0.15             # Top-1 minus top-2 probability below this is ambiguous
+LOW_MARGIN_CONFIDENCE = 0.5   # ...but only when the top class is at least this likely
+LOW_MARGIN_INTERVAL = 1.0     # Seconds between low-margin samples (one per ambiguous hold)
+RANDOM_RATE = 0.002           # Fraction of frames sampled regardless of the prediction
+UNDO_WINDOW = 3.0             # Seconds within which an opposite command counts as an undo
+UNDO_HISTORY = 1.5            # Seconds of frames before the undone command that are kept
+UNDO_FRAMES = 4               # Frames saved per undo, evenly spaced over UNDO_HISTORY
+MAX_PER_HOUR = 360            # Token bucket refill rate (images per hour)
+BURST = 12                    # Token bucket size (an undo takes UNDO_FRAMES at once)
+STORE_LIMIT_MB = 500          # Stop sampling once the store holds this much
+QUEUE_SIZE = 32               # Samples buffered for the background writer
+JPEG_QUALITY = 90
+
+# A command followed by its opposite means the first one was unwanted
+UNDO_PAIRS = {
+    'forward': ('reverse', 'swipe_left'),
+    'reverse': ('forward', 'swipe_right'),
+    'swipe_right': ('swipe_left', 'reverse'),
+    'swipe_left': ('swipe_right', 'forward'),
+    'play': ('stop',),
+    'stop': ('play',),
+}
+REASONS = ('low_margin', 'undo', 'random')
+
+
+def store_size(root):
+    """Bytes currently stored under root"""
+    total = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+class HardNegativeSink:
+    """Selects ROIs per frame and writes them in the background under rate and size caps"""
+
+    def __init__(self, classes, root=HARD_NEGATIVE_DIR, max_per_hour=MAX_PER_HOUR,
+                 store_limit_mb=STORE_LIMIT_MB, low_margin=LOW_MARGIN, random_rate=RANDOM_RATE,
+                 undo_window=UNDO_WINDOW, seed=None):
+        self.classes = list(classes)
+        self.root = root
+        self.rate = max_per_hour / 3600.0
+        self.tokens = float(BURST)
+        self.last_refill = None
+        self.store_limit = store_limit_mb * 1024 * 1024
+        self.store_start = store_size(root)
+        self.low_margin = low_margin
+        self.random_rate = random_rate
+        self.undo_window = undo_window
+        self.random = random.Random(seed)
+        self.history = collections.deque()  # (time, roi, top1, conf1, top2, conf2)
+        self.pending = None                 # (time, gesture, frames) of the last command
+        self.last_low_margin = None
+        self.selected = {reason: 0 for reason in REASONS}
+        self.rate_limited = 0
+        self.writer = AsyncImageWriter(max_queue=QUEUE_SIZE, jpeg_quality=JPEG_QUALITY)
+
+    def store_full(self):
+        return self.store_start + self.writer.bytes_written >= self.store_limit
+
+    def _take_token(self, now):
+        if self.last_refill is not None:
+            self.tokens = min(float(BURST), self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens < 1.0:
+            self.rate_limited += 1
+            return False
+        self.tokens -= 1.0
+        return True
+
+    def _submit(self, reason, sample):
+        now, roi, top1, conf1, top2, conf2 = sample
+        if self.store_full() or not self._take_token(now):
+            return False
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        name = f"{stamp}_{top1}{conf1 * 100:.0f}_{top2}{conf2 * 100:.0f}.jpg"
+        if not self.writer.submit(os.path.join(self.root, reason, top1, name), roi):
+            return False
+        self.selected[reason] += 1
+        return True
+
+    def observe(self, now, roi, probs, copy=True):
+        """
+        Record one classified ROI; returns the reason it was queued for writing, or None.
+        Pass copy=False if roi is not drawn on or reused after this call.
+        """
+        probs = np.asarray(probs)
+        second, first = np.argsort(probs)[-2:]
+        sample = (now, roi.copy() if copy else roi, self.classes[first], float(probs[first]),
+                  self.classes[second], float(probs[second]))
+        self.history.append(sample)
+        while self.history and now - self.history[0][0] > UNDO_HISTORY:
+            self.history.popleft()
+
+        if (sample[3] >= LOW_MARGIN_CONFIDENCE and sample[3] - sample[5] < self.low_margin and
+                (self.last_low_margin is None or now - self.last_low_margin >= LOW_MARGIN_INTERVAL)):
+            self.last_low_margin = now
+            if self._submit('low_margin', sample):
+                return 'low_margin'
+        if self.random_rate and self.random.random() < self.random_rate:
+            if self._submit('random', sample):
+                return 'random'
+        return None
+
+    def command(self, now, gesture):
+        """Record a delivered command; an undo of the previous one saves the frames that caused it"""
+        pending, self.pending = self.pending, None
+        if pending is not None and now - pending[0] <= self.undo_window and \
+                gesture in UNDO_PAIRS.get(pending[1], ()):
+            frames = pending[2]
+            if frames:
+                picks = np.unique(np.linspace(0, len(frames) - 1, UNDO_FRAMES).round().astype(int))
+                for index in picks:
+                    self._submit('undo', frames[index])
+            return True  # The correction itself is intended, so it is not an undo candidate
+        self.pending = (now, gesture, list(self.history))
+        return False
+
+    def stats(self):
+        return {'selected': dict(self.selected), 'written': self.writer.written,
+                'dropped': self.writer.dropped, 'failed': self.writer.failed,
+                'rate_limited': self.rate_limited, 'store_full': self.store_full(),
+                'megabytes_written': round(self.writer.bytes_written / 1024 / 1024, 2)}
+
+    def close(self):
+        self.writer.close()
+
+
+def sampling_sender(sink, send):
+    """Wrap a send(gesture) -> bool callable so delivered commands reach the sink's undo detection"""
+    def wrapped(gesture):
+        delivered = send(gesture)
+        if delivered:
+            sink.command(time.time(), gesture)
+        return delivered
+    return wrapped
+
+
+def add_hard_negative_arguments(parser):
+    parser.add_argument('--hard-negatives', nargs='?', const=HARD_NEGATIVE_DIR, default=None, metavar='DIR',
+                        help=f'save low-margin, undone and random ROIs for retraining (default dir: {HARD_NEGATIVE_DIR})')
+    parser.add_argument('--hard-negative-rate', type=float, default=MAX_PER_HOUR, metavar='N',
+                        help='maximum hard-negative images per hour')
+
+
+def print_sink_stats(sink, label="Hard negatives"):
+    stats = sink.stats()
+    selected = ", ".join(f"{count} {reason}" for reason, count in stats['selected'].items())
+    print(f"✓ {label}: {stats['written']} written to {sink.root} ({selected}, "
+          f"{stats['megabytes_written']} MB)")
+    if stats['dropped'] or stats['rate_limited'] or stats['store_full']:
+        print(f"  ⚠ {stats['dropped']} dropped (writer busy), {stats['rate_limited']} over the rate cap"
+              + (", store limit reached" if stats['store_full'] else ""))
@@ -0,0 +1,284 @@
+"""
+Model Hot-Swap
+
+Replaces the model of a running runtime without a restart, so a new
+gesture_model.gmb does not pay the TensorFlow import and interpreter load
+again. HotSwapBackend wraps the backend the runtime already loaded and is
+used exactly like it (predict, classes, embeddings, stats, ... are the
+active backend's).
+
+A worker thread watches the model file (and the gesture head of a split
+backend) and takes reload requests from runtime_control.py. A candidate is
+loaded, warmed up and validated on that thread:
+- same class list, image size, preprocessing and input shape/dtype as the
+  running model (the frame loop keeps using them unchanged)
+- a probe prediction on the last real input returns finite probabilities
+  of the right shape
+A rejected candidate is closed and the running model stays. An accepted one
+is swapped in by predict() between two frames; the old backend is kept for
+PROBATION_FRAMES frames and if the new one raises or returns garbage in
+that time it is rolled back and the old one answers the same frame, so no
+frame is dropped either way.
+
+Deploy with a rename, not by copying over the file in place: TFLite maps the
+model file, and overwriting it changes the model under the running interpreter.
+    scp gesture_model.gmb jetson@192.168.1.x:~/gesture_model.gmb.new
+    ssh jetson@192.168.1.x mv gesture_model.gmb.new gesture_model.gmb
+    python3 runtime_control.py model                       # status
+    python3 runtime_control.py model action=reload path=other.gmb
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+POLL_INTERVAL = 2.0     # Seconds between model file checks
+SETTLE_TIME = 1.0       # A changed file must stay unchanged this long before it is loaded
+WARMUP_INVOKES = 3      # Warm-up predictions before a candidate is validated
+PROBATION_FRAMES = 30   # Frames the old backend is kept to roll back to
+
+
+class SwapError(Exception):
+    """Candidate model rejected (it cannot replace the running one)"""
+    pass
+
+
+def file_signature(path):
+    """(mtime, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def watched_files(backend):
+    """Files whose change means a new model: the model and, for split backends, the gesture head"""
+    paths = [backend.model_path]
+    heads = getattr(backend, 'heads', None)
+    if heads and 'gesture' in heads:
+        paths.append(heads['gesture'].path)
+    return [path for path in paths if path]
+
+
+def check_same_input(candidate, running):
+    """Raise SwapError unless candidate can be fed the batches preprocessed for running"""
+    if candidate.img_size != running.img_size:
+        raise SwapError(f"image size {candidate.img_size} differs from the running {running.img_size}")
+    if candidate.preprocessing != running.preprocessing:
+        raise SwapError(f"preprocessing {candidate.preprocessing} differs from the running {running.preprocessing}")
+    new_spec, old_spec = candidate.metadata['input_spec'], running.metadata['input_spec']
+    if list(new_spec['shape'][1:]) != list(old_spec['shape'][1:]) or new_spec['dtype'] != old_spec['dtype']:
+        raise SwapError(f"input spec {new_spec} differs from the running {old_spec}")
+
+
+def check_compatible(candidate, running):
+    """Raise SwapError unless candidate takes the same input and yields the same classes as running"""
+    if list(candidate.classes) != list(running.classes):
+        raise SwapError(f"classes {list(candidate.classes)} differ from the running {list(running.classes)}")
+    check_same_input(candidate, running)
+    if getattr(candidate, 'embedding_dim', None) != getattr(running, 'embedding_dim', None):
+        raise SwapError(f"embedding size {getattr(candidate, 'embedding_dim', None)} differs from the "
+                        f"running {getattr(running, 'embedding_dim', None)}")
+
+
+def check_output(probs, batch_size, num_classes):
+    """Raise SwapError unless probs is a finite (batch_size, num_classes) probability array"""
+    probs = np.asarray(probs)
+    if probs.shape != (batch_size, num_classes):
+        raise SwapError(f"output shape {probs.shape}, expected {(batch_size, num_classes)}")
+    if not np.all(np.isfinite(probs)) or probs.min() < -1e-3 or probs.max() > 1.0 + 1e-3:
+        raise SwapError("output is not a probability (NaN, inf or out of [0, 1])")
+
+
+class HotSwapBackend:
+    """Proxy for the running backend that loads replacements in the background and swaps between frames"""
+
+    def __init__(self, backend, factory, watch=True, poll_interval=POLL_INTERVAL,
+                 probation_frames=PROBATION_FRAMES):
+        """factory(model_path) -> backend builds a candidate with the same settings as backend"""
+        self.active = backend
+        self.factory = factory
+        self.watch = watch
+        self.poll_interval = poll_interval
+        self.probation_frames = probation_frames
+        self.watch_path = backend.model_path
+        self.signatures = {path: file_signature(path) for path in watched_files(backend)}
+        self.lock = threading.Lock()
+        self.pending = None       # Validated candidate waiting for the next frame
+        self.previous = None      # Old backend during probation
+        self.probation_left = 0
+        self.retired = []         # Backends to close on the worker thread
+        self.requested = None     # Path of a reload request
+        self.last_batch = None
+        self.loading = False
+        self.swaps = 0
+        self.rollbacks = 0
+        self.rejected = 0
+        self.last_error = None
+        self.last_load_seconds = None
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='model-swap', daemon=True)
+        self.thread.start()
+
+    def __getattr__(self, name):
+        # Everything not defined here (classes, img_size, embeddings, stats, ...) is the active backend's
+        if name == 'active':
+            raise AttributeError(name)
+        return getattr(self.active, name)
+
+    # ---------- frame loop ----------
+    def predict(self, batch):
+        if self.pending is not None:
+            self._swap()
+        self.last_batch = batch
+        if self.previous is None:
+            return self.active.predict(batch)
+        try:
+            probs = self.active.predict(batch)
+            check_output(probs, len(batch), len(self.active.classes))
+        except Exception as e:
+            self._rollback(e)
+            return self.active.predict(batch)
+        self.probation_left -= 1
+        if self.probation_left <= 0:
+            self._retire(self.previous)
+            self.previous = None
+        return probs
+
+    def _swap(self):
+        with self.lock:
+            candidate, self.pending = self.pending, None
+        if self.previous is not None:
+            self._retire(self.previous)  # Still on probation from the last swap: keep only the newest fallback
+        ring = getattr(self.active, 'embeddings', None)
+        if ring is not None and hasattr(candidate, 'embeddings'):
+            candidate.embeddings = ring  # Motion heads keep their history across the swap
+        self.previous, self.active = self.active, candidate
+        self.probation_left = self.probation_frames
+        self.watch_path = candidate.model_path
+        self.swaps += 1
+        print(f"✓ Model swapped: {candidate.describe()}")
+
+    def _rollback(self, error):
+        failed, self.active, self.previous = self.active, self.previous, None
+        self.watch_path = self.active.model_path
+        self.rollbacks += 1
+        self.last_error = f"rolled back {failed.model_path}: {error}"
+        print(f"⚠ Model rolled back to {self.active.model_path}: {error}")
+        self._retire(failed)
+
+    def _retire(self, backend):
+        with self.lock:
+            self.retired.append(backend)
+        self.wake.set()
+
+    # ---------- control ----------
+    def request_reload(self, path=None):
+        """Load path (default: the watched model file) in the background; returns immediately"""
+        with self.lock:
+            self.requested = path or self.watch_path
+        self.wake.set()
+
+    def status(self):
+        return {'model': self.active.model_path, 'backend': self.active.name, 'watching': self.watch,
+                'loading': self.loading, 'probation_frames': self.probation_left if self.previous else 0,
+                'swaps': self.swaps, 'rollbacks': self.rollbacks, 'rejected': self.rejected,
+                'last_load_seconds': self.last_load_seconds, 'last_error': self.last_error}
+
+    def handle_command(self, message):
+        """runtime_control.py handler: action=status|reload, optional path for reload"""
+        action = message.get('action', 'status')
+        if action == 'reload':
+            path = message.get('path')
+            if path is not None and not os.path.exists(path):
+                raise ValueError(f"model file not found: {path}")
+            self.request_reload(path)
+            return {'requested': path or self.watch_path, **self.status()}
+        if action == 'status':
+            return self.status()
+        raise ValueError(f"unknown model action {action!r} (status, reload)")
+
+    # ---------- worker ----------
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.poll_interval)
+            self.wake.clear()
+            self._close_retired()
+            if self.stopped.is_set():
+                break
+            with self.lock:
+                path, self.requested = self.requested, None
+            if path is None and self.watch:
+                path = self._changed_file()
+            if path is not None:
+                self._load(path)
+
+    def _close_retired(self):
+        with self.lock:
+            retired, self.retired = self.retired, []
+        for backend in retired:
+            backend.close()
+
+    def _changed_file(self):
+        """The model path once a watched file changed and stopped changing, else None"""
+        changed = [path for path, signature in self.signatures.items()
+                   if file_signature(path) not in (None, signature)]
+        if not changed:
+            return None
+        while not self.stopped.is_set():
+            before = {path: file_signature(path) for path in changed}
+            self.stopped.wait(SETTLE_TIME)
+            if all(file_signature(path) == signature for path, signature in before.items()):
+                break
+        for path in changed:
+            self.signatures[path] = file_signature(path)
+        return self.watch_path
+
+    def _load(self, path):
+        self.loading = True
+        start = time.time()
+        candidate = None
+        try:
+            candidate = self.factory(path)
+            for _ in range(WARMUP_INVOKES):
+                candidate.warm_up()
+            running = self.active
+            check_compatible(candidate, running)
+            batch = self.last_batch
+            if batch is None:
+                batch = np.zeros((1, running.img_size, running.img_size, 3), dtype=np.float32)
+            check_output(candidate.predict(batch), len(batch), len(running.classes))
+        except Exception as e:
+            # Anything the loader or interpreter raises means the running model stays
+            if candidate is not None:
+                candidate.close()
+            self.rejected += 1
+            self.last_error = f"rejected {path}: {e}"
+            print(f"⚠ Model reload rejected, keeping {self.active.model_path}: {e}")
+            return
+        finally:
+            self.loading = False
+            self.last_load_seconds = round(time.time() - start, 2)
+        self.signatures = {p: file_signature(p) for p in watched_files(candidate)}
+        with self.lock:
+            stale, self.pending = self.pending, candidate
+        if stale is not None:
+            stale.close()
+        print(f"✓ Model {path} loaded and validated in {self.last_load_seconds:.2f}s; swapping on the next frame")
+
+    def close(self):
+        self.stopped.set()
+        self.wake.set()
+        self.thread.join(timeout=5.0)
+        self._close_retired()
+        for backend in (self.pending, self.previous, self.active):
+            if backend is not None:
+                backend.close()
+
+
+def add_hot_swap_arguments(parser):
+    parser.add_argument('--no-watch-model', dest='watch_model', action='store_false',
+                        help='do not reload the model when its file changes (the control command still can)')
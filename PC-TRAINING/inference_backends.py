@@ -0,0 +1,566 @@
+"""
+Pluggable Inference Backends
+
+Every script classifies frames through the same API:
+
+    backend = create_backend(args.backend, args.model)
+    probs = backend.predict(batch)   # (N, H, W, 3) float32 -> (N, num_classes)
+
+Backends:
+    keras   - .h5 / SavedModel called directly through a compiled tf.function
+              (model.predict() per frame runs the whole Keras batching and
+              callback machinery and is several times slower)
+    tflite  - .gmb bundle or .tflite via tflite_runtime / tf.lite
+    opencv  - cv2.dnn for the formats it can read (.onnx, frozen .pb, .tflite
+              with OpenCV >= 4.8)
+    server  - a running inference_server.py (no TensorFlow in this process)
+    split   - backbone bundle + NumPy head (split_model.py); embeddings of the
+              last frames stay in a ring buffer for additional heads
+    cascade - 48 px stage-1 bundle (train_cascade.py) that answers obvious
+              frames itself and only passes uncertain ones to the full model
+
+"auto" picks from the file extension. All backends expose the same metadata
+dict as load_model_metadata() and refuse a model whose input/output shape
+disagrees with it. If the metadata carries a calibration (calibration.py),
+predict() returns calibrated probabilities.
+
+Compare backends on identical input:
+    python inference_backends.py --backends keras tflite opencv --image hand.jpg
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from calibration import apply_calibration
+from model_bundle import BundleError, is_bundle, load_bundle, load_model_metadata
+
+BACKENDS = ('auto', 'keras', 'tflite', 'opencv', 'server', 'split', 'cascade')
+DEFAULT_SOCKET = "/tmp/gesture-inference.sock"
+BATCH_BUCKETS = (1, 2, 4, 8)  # TFLite batch sizes kept allocated below max_batch (as in inference_server.py)
+
+# Tried in order when no Keras model is given explicitly
+KERAS_CANDIDATES = ["gesture_model_jetson.h5", "gesture_model.h5"]
+KERAS_WEIGHTS = ["gesture_model.weights.h5", "gesture_model_weights.h5"]
+KERAS_ARCHITECTURE = "model_architecture.json"
+
+
+class BackendError(Exception):
+    """Raised when a backend is unavailable or cannot read the model"""
+
+
+# ==================== BACKENDS ====================
+class Backend:
+    """Common interface: metadata, predict(batch) -> probs, close()"""
+    name = None
+
+    def __init__(self, model_path, metadata):
+        self.model_path = model_path
+        self.metadata = metadata
+        self.classes = metadata["classes"]
+        self.img_size = metadata["img_size"]
+        self.preprocessing = metadata["preprocessing"]
+        self.calibration = metadata.get("calibration")
+
+    def predict(self, batch):
+        """Class probabilities, with the model's stored calibration applied"""
+        probs = self._predict(batch)
+        if self.calibration:
+            probs = apply_calibration(probs, self.calibration)
+        return probs
+
+    def _predict(self, batch):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """One prediction on zeros so the first real frame is not slow"""
+        self.predict(np.zeros((1, self.img_size, self.img_size, 3), dtype=np.float32))
+
+    def describe(self):
+        return f"{self.name}: {self.model_path}"
+
+    def padded_slots(self):
+        """Zero images invoked so far only to fill a fixed interpreter batch size"""
+        return 0
+
+    def close(self):
+        pass
+
+
+def configure_tensorflow(threads=None):
+    """Memory growth on GPUs (the Nano OOMs otherwise) and optional thread limits"""
+    import tensorflow as tf
+    for gpu in tf.config.experimental.list_physical_devices('GPU'):
+        try:
+            tf.config.experimental.set_memory_growth(gpu, True)
+        except RuntimeError as e:
+            print(f"GPU configuration error: {e}")
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    return tf
+
+
+def load_keras_model(model_path=None):
+    """
+    Load a Keras model; without a path, try the compatible H5, the original
+    H5, then architecture + weights. Returns (model, path used for metadata).
+    """
+    import tensorflow as tf
+    if model_path:
+        candidates = [model_path]
+    else:
+        candidates = [path for path in KERAS_CANDIDATES if os.path.exists(path)]
+    for path in candidates:
+        try:
+            model = tf.keras.models.load_model(path, compile=False)
+            print(f"✓ Loaded {path}")
+            return model, path
+        except Exception as e:
+            print(f"⚠ Could not load {path}: {e}")
+
+    if not model_path and os.path.exists(KERAS_ARCHITECTURE):
+        for weights_file in KERAS_WEIGHTS:
+            if os.path.exists(weights_file):
+                try:
+                    with open(KERAS_ARCHITECTURE, 'r') as f:
+                        model = tf.keras.models.model_from_json(f.read())
+                    model.load_weights(weights_file)
+                    print(f"✓ Loaded from architecture + {weights_file}")
+                    return model, "gesture_model.h5"
+                except Exception as e:
+                    print(f"⚠ Could not load from {weights_file}: {e}")
+    raise BackendError("could not load a Keras model (run fix_model_compatibility.py first)")
+
+
+class KerasBackend(Backend):
+    name = "keras"
+
+    def __init__(self, model_path=None, threads=None):
+        tf = configure_tensorflow(threads)
+        self.model, model_path = load_keras_model(model_path)
+        Backend.__init__(self, model_path, load_model_metadata(model_path))
+
+        input_shape = tuple(self.model.input_shape[1:])
+        if input_shape[:2] != (self.img_size, self.img_size) or \
+                self.model.output_shape[-1] != len(self.classes):
+            raise BundleError(f"model expects {self.model.input_shape} -> {self.model.output_shape}, "
+                              f"metadata says {self.img_size}x{self.img_size} -> {len(self.classes)} classes")
+
+        # Traced once for any batch size; every call after that skips Keras' predict loop
+        model = self.model
+        self._call = tf.function(lambda x: model(x, training=False),
+                                 input_signature=[tf.TensorSpec((None,) + input_shape, tf.float32)])
+
+    def _predict(self, batch):
+        return self._call(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+class TFLiteBackend(Backend):
+    name = "tflite"
+
+    def __init__(self, model_path, max_batch=1, threads=None, embeddings=False):
+        from model_bundle import load_tflite_model
+        from tflite_loader import interpreter_source, make_interpreter
+
+        self.interpreter, metadata = load_tflite_model(
+            model_path, lambda model_path: make_interpreter(model_path=model_path, num_threads=threads))
+        if metadata.get("embedding") and not embeddings:
+            raise BundleError(f"{model_path} is a backbone (outputs embeddings); use --backend split")
+        Backend.__init__(self, model_path, metadata)
+        self.source = interpreter_source()
+
+        # One interpreter per batch bucket: a partial batch runs on the smallest
+        # bucket that holds it instead of being padded up to max_batch
+        self.interpreters = {1: self.interpreter}
+        input_shape = list(self.interpreter.get_input_details()[0]['shape'][1:])
+        for size in [b for b in BATCH_BUCKETS if 1 < b < max_batch] + ([max_batch] if max_batch > 1 else []):
+            try:
+                interpreter = make_interpreter(model_path=model_path, num_threads=threads)
+                interpreter.resize_tensor_input(interpreter.get_input_details()[0]['index'], [size] + input_shape)
+                interpreter.allocate_tensors()
+            except Exception:
+                break  # Fixed batch dimension: larger buckets cannot be allocated either
+            self.interpreters[size] = interpreter
+        self.buckets = sorted(self.interpreters)
+        self.tensors = {size: (interpreter.get_input_details()[0]['index'],
+                               interpreter.get_output_details()[0]['index'])
+                        for size, interpreter in self.interpreters.items()}
+        self.batch_size = self.buckets[-1]
+        self.padded = 0
+
+    def _invoke(self, chunk):
+        count = len(chunk)
+        size = next(b for b in self.buckets if b >= count)
+        if count < size:
+            self.padded += size - count
+            chunk = np.concatenate([chunk, np.zeros((size - count,) + chunk.shape[1:], dtype=chunk.dtype)])
+        interpreter = self.interpreters[size]
+        input_index, output_index = self.tensors[size]
+        interpreter.set_tensor(input_index, chunk)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[:count]
+
+    def _predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) <= self.batch_size:
+            return self._invoke(batch)
+        return np.concatenate([self._invoke(batch[start:start + self.batch_size])
+                               for start in range(0, len(batch), self.batch_size)])
+
+    def padded_slots(self):
+        return self.padded
+
+    def describe(self):
+        buckets = f", batch buckets {self.buckets}" if len(self.buckets) > 1 else ""
+        return f"tflite ({self.source}{buckets}): {self.model_path}"
+
+
+class OpenCVBackend(Backend):
+    name = "opencv"
+
+    def __init__(self, model_path, threads=None):
+        import cv2
+        if threads:
+            cv2.setNumThreads(threads)
+        extension = os.path.splitext(model_path)[1].lower()
+        # TensorFlow graphs are imported as NCHW; ONNX and TFLite keep the Keras NHWC layout
+        self.channels_first = extension == ".pb"
+        try:
+            if extension == ".onnx":
+                self.net = cv2.dnn.readNetFromONNX(model_path)
+            elif extension == ".pb":
+                self.net = cv2.dnn.readNetFromTensorflow(model_path)
+            elif extension in (".tflite", ".gmb") and hasattr(cv2.dnn, "readNetFromTFLite"):
+                if is_bundle(model_path):
+                    bundle = load_bundle(model_path)
+                    try:
+                        self.net = cv2.dnn.readNetFromTFLite(np.frombuffer(bundle.model_view(), np.uint8).copy())
+                    finally:
+                        bundle.close()
+                else:
+                    self.net = cv2.dnn.readNetFromTFLite(model_path)
+            else:
+                raise BackendError(f"OpenCV {cv2.__version__} cannot read {extension or model_path} models")
+        except cv2.error as e:
+            raise BackendError(f"OpenCV could not read {model_path}: {e}")
+        Backend.__init__(self, model_path, load_model_metadata(model_path))
+
+        probs = self.predict(np.zeros((1, self.img_size, self.img_size, 3), dtype=np.float32))
+        if probs.shape[-1] != len(self.classes):
+            raise BundleError(f"model outputs {probs.shape[-1]} classes, metadata lists {len(self.classes)}")
+
+    def _predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self.channels_first:
+            batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        self.net.setInput(batch)
+        return self.net.forward().reshape(len(batch), -1)
+
+
+class ServerBackend(Backend):
+    name = "server"
+
+    def __init__(self, model_path, socket_path=DEFAULT_SOCKET, max_batch=1):
+        from inference_client import InferenceClient, InferenceError
+        try:
+            self.client = InferenceClient(socket_path, model_path, max_batch)
+        except InferenceError as e:
+            raise BackendError(str(e))
+        Backend.__init__(self, model_path, self.client.metadata)
+        self.socket_path = socket_path
+
+    def _predict(self, batch):
+        return self.client.predict(batch)
+
+    def describe(self):
+        return f"server ({self.socket_path}): {self.model_path}"
+
+    def close(self):
+        self.client.close()
+
+
+class SplitBackend(Backend):
+    """
+    Backbone bundle once per frame, then NumPy heads on the embedding. predict()
+    runs the gesture head; other heads read the same embeddings via run_head().
+    """
+    name = "split"
+
+    def __init__(self, model_path, head_path=None, max_batch=1, threads=None):
+        from split_model import EmbeddingRing, HeadError, default_head_path
+        self.backbone = TFLiteBackend(model_path, max_batch, threads, embeddings=True)
+        self.embedding_dim = self.backbone.metadata["embedding"]["dim"]
+        self.embeddings = EmbeddingRing(self.embedding_dim)
+        self.last_embeddings = None
+        self.heads = {}
+        try:
+            self.set_head(head_path or default_head_path(model_path, self.backbone.metadata))
+        except HeadError as e:
+            raise BackendError(str(e))
+
+    def set_head(self, path, name="gesture"):
+        """Load a head (replacing one of the same name); the gesture head also sets classes"""
+        from split_model import HeadError, load_head
+        head = load_head(path)
+        if head.embedding_dim != self.embedding_dim:
+            raise HeadError(f"head {path} expects {head.embedding_dim}-d embeddings, "
+                            f"backbone outputs {self.embedding_dim}")
+        self.heads[name] = head
+        if name == "gesture":
+            metadata = dict(self.backbone.metadata, classes=head.classes, calibration=head.calibration)
+            Backend.__init__(self, self.backbone.model_path, metadata)
+        return head
+
+    def embed(self, batch, timestamp=None):
+        """Backbone pass; the embeddings are kept for run_head() and the ring buffer"""
+        self.last_embeddings = self.backbone._predict(batch)
+        self.embeddings.push(self.last_embeddings, time.time() if timestamp is None else timestamp)
+        return self.last_embeddings
+
+    def run_head(self, name, embeddings=None):
+        """Run another head on the embeddings of the last predict() (no backbone pass)"""
+        return self.heads[name].predict(self.last_embeddings if embeddings is None else embeddings)
+
+    def _predict(self, batch):
+        # Calibration is applied by Backend.predict from the gesture head metadata
+        return self.heads["gesture"].predict(self.embed(batch), calibrated=False)
+
+    def padded_slots(self):
+        return self.backbone.padded_slots()
+
+    def describe(self):
+        return (f"split ({self.backbone.source}): {self.model_path} + "
+                f"{', '.join(os.path.basename(head.path) for head in self.heads.values())}")
+
+
+class CascadeBackend(Backend):
+    """
+    Early-exit cascade: the stage-1 model sees a downscaled copy of the normal
+    input. Frames whose stage-1 confidence clears the tuned exit threshold of
+    their class are answered there ("background" as a uniform, below-threshold
+    distribution); only the rest are sent to the full model.
+    """
+    name = "cascade"
+
+    def __init__(self, model_path, max_batch=1, threads=None, socket_path=DEFAULT_SOCKET):
+        self.stage1 = TFLiteBackend(model_path, max_batch, threads)
+        cascade = self.stage1.metadata.get("cascade")
+        if not cascade:
+            raise BundleError(f"{model_path} has no cascade metadata (train it with train_cascade.py)")
+        full_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), cascade["full_model"])
+        self.full = create_backend("auto", full_path, max_batch, threads, socket_path)
+        # Callers preprocess for the full model; stage 1 downsamples that tensor itself
+        Backend.__init__(self, model_path, dict(self.full.metadata, cascade=cascade))
+        self.calibration = None  # The full model calibrates its own output
+
+        self.background = cascade["background_class"]
+        thresholds = cascade["exit_thresholds"]
+        self.exit_thresholds = np.array([thresholds.get(name, 2.0) for name in self.stage1.classes])
+        self.background_index = self.stage1.classes.index(self.background)
+        gestures = [name for name in self.stage1.classes if name != self.background]
+        if sorted(gestures) != sorted(self.classes):
+            raise BundleError(f"stage 1 classes {gestures} do not match the full model {self.classes}")
+        # Column of each full-model class in the stage-1 output
+        self.columns = [self.stage1.classes.index(name) for name in self.classes]
+        self.counts = {"frames": 0, "background_exits": 0, "gesture_exits": 0, "full_invocations": 0}
+
+    def _predict(self, batch):
+        import cv2
+        batch = np.asarray(batch, dtype=np.float32)
+        size = self.stage1.img_size
+        small = np.stack([cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA) for image in batch])
+        stage1 = self.stage1.predict(small)
+        top = np.argmax(stage1, axis=1)
+        exits = stage1[np.arange(len(batch)), top] >= self.exit_thresholds[top]
+        background = exits & (top == self.background_index)
+
+        probs = np.empty((len(batch), len(self.classes)), dtype=np.float32)
+        probs[background] = 1.0 / len(self.classes)
+        gesture = exits & ~background
+        if gesture.any():
+            answered = stage1[gesture][:, self.columns]
+            probs[gesture] = answered / answered.sum(axis=1, keepdims=True)
+        if not exits.all():
+            probs[~exits] = self.full.predict(batch[~exits])
+
+        self.counts["frames"] += len(batch)
+        self.counts["background_exits"] += int(background.sum())
+        self.counts["gesture_exits"] += int(gesture.sum())
+        self.counts["full_invocations"] += int((~exits).sum())
+        return probs
+
+    def stats(self):
+        """Per-stage invocation counts and the share of frames that reached the full model"""
+        frames = max(self.counts["frames"], 1)
+        return dict(self.counts, full_rate=round(self.counts["full_invocations"] / frames, 4))
+
+    def describe(self):
+        return f"cascade: {self.model_path} -> {self.full.describe()}"
+
+    def padded_slots(self):
+        return self.stage1.padded_slots() + self.full.padded_slots()
+
+    def close(self):
+        self.stage1.close()
+        self.full.close()
+
+
+# ==================== FACTORY ====================
+def default_model(backend):
+    """Default model file for a backend (None lets Keras try its fallback chain)"""
+    if backend == "keras":
+        return None
+    if backend == "split":
+        from split_model import BACKBONE_FILE
+        return BACKBONE_FILE
+    if backend == "cascade":
+        return "gesture_stage1.gmb"
+    if backend == "opencv":
+        for path in ("gesture_model.onnx", "gesture_model.pb"):
+            if os.path.exists(path):
+                return path
+    return "gesture_model.gmb" if os.path.exists("gesture_model.gmb") else "gesture_model.tflite"
+
+
+def detect_backend(model_path):
+    """Backend implied by a model file's extension (backbone and cascade bundles by their metadata)"""
+    if model_path is None:
+        return "keras"
+    extension = os.path.splitext(model_path)[1].lower()
+    if extension in (".tflite", ".gmb"):
+        if os.path.exists(model_path) and is_bundle(model_path):
+            bundle = load_bundle(model_path, verify=False)
+            try:
+                if bundle.metadata.get("embedding"):
+                    return "split"
+                if bundle.metadata.get("cascade"):
+                    return "cascade"
+            finally:
+                bundle.close()
+        return "tflite"
+    if extension in (".onnx", ".pb"):
+        return "opencv"
+    return "keras"
+
+
+def create_backend(backend="auto", model_path=None, max_batch=1, threads=None,
+                   socket_path=DEFAULT_SOCKET, calibrated=True, head_path=None):
+    """
+    Build a backend by name. Raises BackendError if it is unavailable and
+    BundleError if the model disagrees with its metadata.
+    calibrated=False returns the raw model output (used to fit calibration).
+    """
+    instance = _create_backend(backend, model_path, max_batch, threads, socket_path, head_path)
+    if not calibrated:
+        instance.calibration = None
+    return instance
+
+
+def _create_backend(backend, model_path, max_batch, threads, socket_path, head_path):
+    if backend == "auto":
+        backend = detect_backend(model_path)
+    if model_path is None:
+        model_path = default_model(backend)
+    if model_path is not None and backend != "server" and not os.path.exists(model_path):
+        raise BackendError(f"model file not found: {model_path}")
+
+    if backend == "keras":
+        return KerasBackend(model_path, threads)
+    if backend == "tflite":
+        return TFLiteBackend(model_path, max_batch, threads)
+    if backend == "opencv":
+        return OpenCVBackend(model_path, threads)
+    if backend == "server":
+        return ServerBackend(model_path, socket_path, max_batch)
+    if backend == "split":
+        return SplitBackend(model_path, head_path, max_batch, threads)
+    if backend == "cascade":
+        return CascadeBackend(model_path, max_batch, threads, socket_path)
+    raise BackendError(f"unknown backend {backend!r} (choose from {', '.join(BACKENDS)})")
+
+
+def add_backend_arguments(parser, default_backend="auto"):
+    """The --backend/--model/--threads/--server-socket flags shared by every script"""
+    parser.add_argument("--backend", default=default_backend, choices=BACKENDS,
+                        help="inference backend (auto picks from the model extension)")
+    parser.add_argument("--model", default=None, help="model file (default depends on backend)")
+    parser.add_argument("--threads", type=int, default=None, help="inference threads")
+    parser.add_argument("--server-socket", default=DEFAULT_SOCKET,
+                        help="inference_server.py socket for --backend server")
+    parser.add_argument("--head", default=None,
+                        help="head file for --backend split (default: named in the backbone bundle)")
+    return parser
+
+
+def backend_from_args(args, max_batch=1):
+    return create_backend(args.backend, args.model, max_batch, args.threads, args.server_socket,
+                          head_path=args.head)
+
+
+# ==================== COMPARISON ====================
+def compare_backends(names, model_paths, batch, repeats=20):
+    """Run every backend on the same batch; report latency and disagreement with the first"""
+    results = []
+    reference = None
+    for name, model_path in zip(names, model_paths):
+        try:
+            backend = create_backend(name, model_path, max_batch=len(batch))
+        except (BackendError, BundleError, ImportError) as e:
+            print(f"⚠ {name}: unavailable ({e})")
+            continue
+        backend.warm_up()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            probs = backend.predict(batch)
+        elapsed = (time.perf_counter() - start) / repeats
+        result = {
+            "backend": backend.describe(),
+            "ms_per_batch": round(elapsed * 1000, 3),
+            "top1": np.argmax(probs, axis=1).tolist(),
+        }
+        if reference is None:
+            reference = probs
+        else:
+            result["max_abs_diff"] = round(float(np.max(np.abs(probs - reference))), 6)
+            result["top1_agreement"] = round(float(np.mean(
+                np.argmax(probs, axis=1) == np.argmax(reference, axis=1))), 4)
+        results.append(result)
+        backend.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends on identical input")
+    parser.add_argument("--backends", nargs="+", default=["keras", "tflite", "opencv"], choices=BACKENDS)
+    parser.add_argument("--models", nargs="+", default=None,
+                        help="model file per backend (default: each backend's default)")
+    parser.add_argument("--image", nargs="+", default=None, help="images to classify (default: random)")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    model_paths = (args.models or []) + [None] * (len(args.backends) - len(args.models or []))
+    metadata = load_model_metadata(next((p for p in model_paths if p), "gesture_model.h5"))
+    size = metadata["img_size"]
+    if args.image:
+        import cv2
+        from model_bundle import preprocess_roi
+        batch = np.concatenate([preprocess_roi(cv2.imread(path), size, metadata["preprocessing"])
+                                for path in args.image])
+    else:
+        batch = np.random.RandomState(0).rand(args.batch_size, size, size, 3).astype(np.float32)
+
+    print("=" * 60)
+    print(f"BACKEND COMPARISON ({len(batch)} image(s), {size}x{size})")
+    print("=" * 60)
+    for result in compare_backends(args.backends, model_paths, batch, args.repeats):
+        line = f"{result['backend']:50} {result['ms_per_batch']:8.2f} ms"
+        if "max_abs_diff" in result:
+            line += f" | max |Δ| {result['max_abs_diff']:.6f} | top-1 agree {result['top1_agreement'] * 100:.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
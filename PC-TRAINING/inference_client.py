@@ -0,0 +1,97 @@
+"""
+Client for inference_server.py
+
+    client = InferenceClient(model_path="gesture_model.gmb")
+    probs = client.predict(batch)   # (N, H, W, 3) float32 -> (N, num_classes)
+
+Needs only NumPy and the standard library, so scripts using it never import
+TensorFlow. Each client owns one shared-memory buffer that the server maps;
+predict() writes the batch into it, sends one JSON line and reads the
+probabilities back from the same buffer.
+"""
+import json
+import os
+import socket
+import uuid
+
+import numpy as np
+
+from shm_buffer import SharedBuffer
+
+DEFAULT_SOCKET = "/tmp/gesture-inference.sock"
+SHM_PREFIX = "gesture-infer-"  # The server only attaches buffers named like this
+
+
+class InferenceError(Exception):
+    """Raised when the server is unreachable or rejects a request"""
+
+
+class InferenceClient:
+    def __init__(self, socket_path=DEFAULT_SOCKET, model_path="gesture_model.gmb",
+                 max_batch=1, timeout=5.0):
+        self.socket_path = socket_path
+        self.shm = None
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(socket_path)
+        except OSError as e:
+            raise InferenceError(f"cannot connect to inference server at {socket_path}: {e}")
+        self.reader = self.sock.makefile("rb")
+
+        reply = self._call({"op": "open", "model": os.path.abspath(model_path),
+                            "max_batch": max_batch})
+        self.metadata = reply["metadata"]
+        self.max_batch = reply["max_batch"]
+        self.num_classes = reply["num_classes"]
+        self.input_shape = tuple(reply["input_shape"])
+
+        input_bytes = self.max_batch * int(np.prod(self.input_shape)) * 4
+        output_bytes = self.max_batch * self.num_classes * 4
+        self.shm = SharedBuffer(f"{SHM_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}",
+                                input_bytes + output_bytes, create=True)
+        try:
+            self._call({"op": "attach", "shm": self.shm.name})
+        finally:
+            # Both sides have it mapped now; drop the name so nothing leaks on a crash
+            self.shm.unlink()
+        self.inputs = self.shm.ndarray((self.max_batch,) + self.input_shape, np.float32)
+        self.outputs = self.shm.ndarray((self.max_batch, self.num_classes), np.float32, input_bytes)
+
+    def _call(self, message):
+        try:
+            self.sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+            line = self.reader.readline()
+        except OSError as e:
+            raise InferenceError(f"inference server connection failed: {e}")
+        if not line:
+            raise InferenceError("inference server closed the connection")
+        reply = json.loads(line.decode("utf-8"))
+        if not reply.get("ok"):
+            raise InferenceError(reply.get("error", "unknown error"))
+        return reply
+
+    def predict(self, batch):
+        """Class probabilities for a (N, H, W, 3) float32 batch"""
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch.shape[1:] != self.input_shape:
+            raise InferenceError(f"batch shape {batch.shape[1:]} does not match "
+                                 f"model input {self.input_shape}")
+        results = np.empty((len(batch), self.num_classes), dtype=np.float32)
+        for start in range(0, len(batch), self.max_batch):
+            chunk = batch[start:start + self.max_batch]
+            n = len(chunk)
+            self.inputs[:n] = chunk
+            self._call({"op": "predict", "n": n})
+            results[start:start + n] = self.outputs[:n]
+        return results
+
+    def stats(self):
+        return self._call({"op": "stats"})["stats"]
+
+    def close(self):
+        self.inputs = self.outputs = None
+        if self.shm is not None:
+            self.shm.close()
+        self.reader.close()
+        self.sock.close()
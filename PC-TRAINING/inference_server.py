@@ -0,0 +1,297 @@
+"""
+Local Inference Server
+
+One long-lived process holds the loaded TFLite interpreters so several
+scripts (test_model.py, the collect_data.py preview, media_control_mpv.py,
+tooling) can classify frames without each importing TensorFlow and loading
+their own copy of the model - on a 4 GB Nano two copies do not fit.
+
+Clients connect over a Unix socket and pass ROI tensors through a shared-memory
+buffer (see shm_buffer.py); only small JSON control lines go over the socket.
+Concurrent requests for the same model are micro-batched into one invoke.
+
+Protocol (newline-delimited JSON):
+    -> {"op": "open", "model": "/abs/path/gesture_model.gmb", "max_batch": 4}
+    <- {"ok": true, "metadata": {...}, "max_batch": 4, "num_classes": 5}
+    -> {"op": "attach", "shm": "<buffer name>"}
+    <- {"ok": true}
+    -> {"op": "predict", "n": 2}      # inputs already written to the buffer
+    <- {"ok": true}                   # probabilities written after the inputs
+    -> {"op": "stats"}
+    <- {"ok": true, "stats": {...}}
+
+Buffer layout: [max_batch x H x W x 3 float32 inputs][max_batch x K float32 outputs]
+
+Usage:
+    python3 inference_server.py --model gesture_model.gmb
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+from model_bundle import BundleError, load_tflite_model
+from shm_buffer import SharedBuffer
+from tflite_loader import interpreter_source, make_interpreter, warm_up
+
+# ==================== CONFIGURATION ====================
+DEFAULT_SOCKET = "/tmp/gesture-inference.sock"
+SHM_PREFIX = "gesture-infer-"  # Client buffer names; anything else is refused
+BATCH_BUCKETS = (1, 2, 4, 8)  # Interpreter batch sizes kept allocated
+MAX_WAIT_MS = 2.0             # How long the batcher waits for more requests to join a batch
+
+
+class Request:
+    """One client's predict call, completed by the batcher thread"""
+
+    def __init__(self, inputs, outputs):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.n = len(inputs)
+        self.error = None
+        self.done = threading.Event()
+
+
+class LoadedModel:
+    """A model with one interpreter per batch bucket and its own batcher thread"""
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        interpreter, self.metadata = load_tflite_model(model_path, self._make_interpreter)
+        self.num_classes = len(self.metadata["classes"])
+        self.input_shape = [int(d) for d in interpreter.get_input_details()[0]['shape'][1:]]
+        self.interpreters = {}
+        self.buckets = [b for b in BATCH_BUCKETS if self._prepare(b, interpreter if b == 1 else None)]
+        if not self.buckets:
+            raise BundleError(f"{model_path} cannot be invoked with batch size 1")
+        self.stats = {"requests": 0, "frames": 0, "invokes": 0, "busy_seconds": 0.0}
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._batch_loop, name="batcher", daemon=True)
+        self.thread.start()
+
+    def _make_interpreter(self, model_path):
+        return make_interpreter(model_path=model_path, num_threads=self.num_threads)
+
+    def _prepare(self, size, interpreter=None):
+        """Allocate an interpreter for a batch size; False if the model cannot be resized"""
+        try:
+            interpreter = interpreter or self._make_interpreter(self.model_path)
+            details = interpreter.get_input_details()[0]
+            if int(details['shape'][0]) != size:
+                interpreter.resize_tensor_input(details['index'], [size] + self.input_shape)
+                interpreter.allocate_tensors()
+            warm_up(interpreter)
+            self.interpreters[size] = interpreter
+            return True
+        except Exception:
+            return False
+
+    @property
+    def max_batch(self):
+        return self.buckets[-1]
+
+    def submit(self, request):
+        self.queue.put(request)
+
+    def _batch_loop(self):
+        while True:
+            pending = [self.queue.get()]
+            frames = pending[0].n
+            deadline = time.time() + MAX_WAIT_MS / 1000.0
+            while frames < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                frames += request.n
+            self._run(pending)
+
+    def _run(self, pending):
+        """Pack requests into as few invokes as the largest bucket allows"""
+        group, frames = [], 0
+        for request in pending:
+            if group and frames + request.n > self.max_batch:
+                self._invoke(group, frames)
+                group, frames = [], 0
+            group.append(request)
+            frames += request.n
+        if group:
+            self._invoke(group, frames)
+
+    def _invoke(self, group, frames):
+        size = next(b for b in self.buckets if b >= frames)
+        interpreter = self.interpreters[size]
+        start = time.time()
+        try:
+            input_index = interpreter.get_input_details()[0]['index']
+            output_index = interpreter.get_output_details()[0]['index']
+            # Copy each client's shared-memory view straight into the input tensor
+            input_tensor = interpreter.tensor(input_index)()
+            offset = 0
+            for request in group:
+                input_tensor[offset:offset + request.n] = request.inputs
+                offset += request.n
+            if offset < size:
+                input_tensor[offset:] = 0
+            del input_tensor  # must not hold tensor views across invoke()
+            interpreter.invoke()
+            probs = interpreter.get_tensor(output_index)
+            offset = 0
+            for request in group:
+                request.outputs[:] = probs[offset:offset + request.n]
+                offset += request.n
+        except Exception as e:
+            for request in group:
+                request.error = str(e)
+        finally:
+            self.stats["requests"] += len(group)
+            self.stats["frames"] += frames
+            self.stats["invokes"] += 1
+            self.stats["busy_seconds"] += time.time() - start
+            for request in group:
+                request.done.set()
+
+
+class ClientHandler(socketserver.StreamRequestHandler):
+    """One connected client: open a model, attach a buffer, then predict"""
+
+    def reply(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        model = None
+        shm = None
+        inputs = outputs = None
+        max_batch = 1
+        try:
+            for line in self.rfile:
+                try:
+                    message = json.loads(line.decode("utf-8"))
+                    op = message.get("op")
+                    if op == "open":
+                        model = self.server.get_model(message["model"])
+                        max_batch = max(1, min(int(message.get("max_batch", 1)), model.max_batch))
+                        self.reply({"ok": True, "metadata": model.metadata, "max_batch": max_batch,
+                                    "num_classes": model.num_classes, "input_shape": model.input_shape})
+                    elif op == "attach":
+                        if model is None:
+                            raise ValueError("open a model before attaching a buffer")
+                        inputs = outputs = None
+                        if shm is not None:
+                            shm.close()  # Attaching again replaces the previous buffer
+                            shm = None
+                        shm = SharedBuffer(message["shm"], prefix=SHM_PREFIX)
+                        input_shape = [max_batch] + model.input_shape
+                        input_bytes = int(np.prod(input_shape)) * 4
+                        needed = input_bytes + max_batch * model.num_classes * 4
+                        if shm.size < needed:
+                            raise ValueError(f"buffer is {shm.size} bytes, need {needed}")
+                        inputs = shm.ndarray(input_shape, np.float32)
+                        outputs = shm.ndarray((max_batch, model.num_classes), np.float32, input_bytes)
+                        self.reply({"ok": True})
+                    elif op == "predict":
+                        if inputs is None:
+                            raise ValueError("attach a buffer before predicting")
+                        n = int(message["n"])
+                        if not 1 <= n <= max_batch:
+                            raise ValueError(f"n must be between 1 and {max_batch}")
+                        request = Request(inputs[:n], outputs[:n])
+                        model.submit(request)
+                        request.done.wait()
+                        if request.error:
+                            self.reply({"ok": False, "error": request.error})
+                        else:
+                            self.reply({"ok": True})
+                    elif op == "stats":
+                        self.reply({"ok": True, "stats": self.server.stats()})
+                    else:
+                        raise ValueError(f"unknown op {op!r}")
+                except (BundleError, KeyError, ValueError, OSError) as e:
+                    self.reply({"ok": False, "error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            inputs = outputs = None
+            if shm is not None:
+                shm.close()
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, num_threads=None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        socketserver.UnixStreamServer.__init__(self, socket_path, ClientHandler)
+        self.socket_path = socket_path
+        self.num_threads = num_threads
+        self.models = {}
+        self.models_lock = threading.Lock()
+
+    def get_model(self, model_path):
+        """Load a model on first use; every client of the same file shares it"""
+        model_path = os.path.abspath(model_path)
+        with self.models_lock:
+            if model_path not in self.models:
+                start = time.time()
+                self.models[model_path] = LoadedModel(model_path, self.num_threads)
+                model = self.models[model_path]
+                print(f"✓ Loaded {model_path} in {time.time() - start:.2f}s "
+                      f"(batch buckets {model.buckets}, {interpreter_source()})")
+            return self.models[model_path]
+
+    def stats(self):
+        with self.models_lock:
+            result = {}
+            for path, model in self.models.items():
+                stats = dict(model.stats)
+                stats["frames_per_invoke"] = round(stats["frames"] / stats["invokes"], 2) \
+                    if stats["invokes"] else 0.0
+                result[path] = stats
+            return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared local inference server")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--model", action="append", default=[],
+                        help="model to preload (may be repeated); others load on first request")
+    parser.add_argument("--threads", type=int, default=None, help="interpreter threads")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("GESTURE INFERENCE SERVER")
+    print("=" * 60)
+    server = InferenceServer(args.socket, args.threads)
+    for model_path in args.model:
+        try:
+            server.get_model(model_path)
+        except (BundleError, OSError) as e:
+            print(f"❌ ERROR: Could not load {model_path}: {e}")
+            exit(1)
+    print(f"✓ Listening on {args.socket}")
+    print("Press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,37 @@
 import cv2
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-import os
+import argparse
+from inference_backends import BackendError, add_backend_arguments, backend_from_args
+from model_bundle import BundleError, preprocess_roi
 import time
 import subprocess
 import platform
 
-# Limit GPU memory growth on Jetson Nano
-gpus = tf.config.experimental.list_physical_devices('GPU')
-if gpus:
-    try:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-    except RuntimeError as e:
-        print(f"GPU configuration error: {e}")
-
 # ==================== CONFIGURATION ====================
-IMG_SIZE = 128
 CONFIDENCE_THRESHOLD = 75.0  # Minimum confidence to trigger action
 COOLDOWN_TIME = 2.0  # Seconds between gesture commands
 last_action_time = 0
 last_gesture = None
 
-# Load model (with fallback for compatibility)
-model = None
-gesture_classes = None
-
-# Try loading from compatible H5 first
-if os.path.exists("gesture_model_jetson.h5"):
-    try:
-        print("Loading gesture_model_jetson.h5...")
-        model = load_model("gesture_model_jetson.h5", compile=False)
-        print("✓ Model loaded successfully")
-    except Exception as e:
-        print(f"⚠ Could not load gesture_model_jetson.h5: {e}")
-
-# Fallback to original model
-if model is None and os.path.exists("gesture_model.h5"):
-    try:
-        print("Loading gesture_model.h5...")
-        model = load_model("gesture_model.h5", compile=False)
-        print("✓ Model loaded successfully")
-    except Exception as e:
-        print(f"⚠ Could not load gesture_model.h5: {e}")
-
-# Fallback to loading from architecture + weights
-weights_files = ["gesture_model.weights.h5", "gesture_model_weights.h5"]
-if model is None and os.path.exists("model_architecture.json"):
-    for weights_file in weights_files:
-        if os.path.exists(weights_file):
-            try:
-                print(f"Loading from architecture + {weights_file}...")
-                with open("model_architecture.json", 'r') as f:
-                    model = tf.keras.models.model_from_json(f.read())
-                model.load_weights(weights_file)
-                print("✓ Model loaded from architecture + weights")
-                break
-            except Exception as e:
-                print(f"⚠ Could not load from {weights_file}: {e}")
-
-if model is None:
-    print("ERROR: Could not load model!")
+# Load model through the selected backend (Keras tries the compatible H5,
+# the original H5, then architecture + weights)
+parser = argparse.ArgumentParser(description="Gesture-based media control")
+add_backend_arguments(parser, default_backend="keras")
+args = parser.parse_args()
+
+try:
+    backend = backend_from_args(args)
+except (BackendError, BundleError) as e:
+    print(f"ERROR: Could not load model! {e}")
     print("Please run fix_model_compatibility.py on PC and transfer gesture_model_jetson.h5")
     exit(1)
 
-# Load class names
-if os.path.exists("class_names.txt"):
-    gesture_classes = []
-    with open("class_names.txt", 'r') as f:
-        gesture_classes = [line.strip() for line in f.readlines()]
-    print(f"Loaded classes from file: {gesture_classes}")
-else:
-    gesture_classes = sorted(os.listdir("dataset"))
-    print(f"Loaded classes from dataset folder: {gesture_classes}")
+# Class names and input size come with the model metadata
+gesture_classes = backend.classes
+IMG_SIZE = backend.img_size
+PREPROCESSING = backend.preprocessing
+print(f"Loaded classes from {backend.metadata['source']}: {gesture_classes}")
+print(f"Backend: {backend.describe()}")
 
 # ==================== MEDIA CONTROL FUNCTIONS ====================
 def execute_media_command(gesture):
@@ -145,12 +103,10 @@ while True:
 
     # Extract and preprocess ROI
     roi = frame[100:400, 100:400]
-    roi_resized = cv2.resize(roi, (IMG_SIZE, IMG_SIZE))
-    roi_normalized = roi_resized / 255.0
-    roi_input = np.expand_dims(roi_normalized, axis=0)
+    roi_input = preprocess_roi(roi, IMG_SIZE, PREPROCESSING)
 
     # Predict
-    predictions = model.predict(roi_input, verbose=0)
+    predictions = backend.predict(roi_input)
     predicted_class_idx = np.argmax(predictions[0])
     confidence = predictions[0][predicted_class_idx] * 100
     predicted_gesture = gesture_classes[predicted_class_idx]
@@ -201,4 +157,5 @@ while True:
         break
 
 cap.release()
+backend.close()
 cv2.destroyAllWindows()
@@ -1,11 +1,18 @@
+import time
 import cv2
 import numpy as np
-import tensorflow as tf
-import json
-import time
 import subprocess
 import platform
-import os
+import argparse
+from inference_backends import BackendError, add_backend_arguments, backend_from_args
+from model_bundle import BundleError, preprocess_roi
+from tflite_loader import StartupTimer, get_interpreter_class
+
+startup = StartupTimer("media_control_tflite")
+
+parser = argparse.ArgumentParser(description="Gesture-based media control (TFLite)")
+add_backend_arguments(parser, default_backend="tflite")
+args = parser.parse_args()
 
 print("="*60)
 print("GESTURE-BASED MEDIA CONTROL SYSTEM (TFLite)")
@@ -13,29 +20,36 @@ print("="*60)
 
 # ==================== LOAD MODEL ====================
 try:
-    # Load TFLite model
-    print("\nLoading gesture_model.tflite...")
-    interpreter = tf.lite.Interpreter(model_path="gesture_model.tflite")
-    interpreter.allocate_tensors()
+    # Load TFLite model (bundle first, then bare .tflite + model_info.json)
+    # unless another backend was chosen with --backend
+    print(f"\nLoading {args.model or 'model'} ({args.backend} backend)...")
+    if args.backend == "tflite":
+        get_interpreter_class()  # tflite_runtime if installed, else TensorFlow
+        startup.mark("import")
+    backend = backend_from_args(args)
+    startup.mark("load")
+    backend.warm_up()
+    startup.mark("first_invoke")
+    print(f"✓ Model loaded successfully ({backend.describe()})")
     
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    print("✓ TFLite model loaded successfully")
-    
-    # Load model info
-    print("Loading model_info.json...")
-    with open("model_info.json", "r") as f:
-        model_info = json.load(f)
-    gesture_classes = model_info["classes"]
-    IMG_SIZE = model_info.get("img_size", 128)
-    print(f"✓ Loaded {len(gesture_classes)} gesture classes")
+    gesture_classes = backend.classes
+    IMG_SIZE = backend.img_size
+    PREPROCESSING = backend.preprocessing
+    print(f"✓ Loaded {len(gesture_classes)} gesture classes from {backend.metadata['source']}")
     print(f"  Classes: {gesture_classes}")
+    startup.report(model=backend.model_path, backend=backend.name)
     
+except BundleError as e:
+    print(f"\n❌ ERROR: Refusing model - {e}")
+    exit(1)
+except BackendError as e:
+    print(f"\n❌ ERROR: {e}")
+    exit(1)
 except Exception as e:
     print(f"\n❌ ERROR: Could not load model - {e}")
     print("\nMake sure you have transferred:")
-    print("  1. gesture_model.tflite")
-    print("  2. model_info.json")
+    print("  1. gesture_model.gmb (or gesture_model.tflite + model_info.json)")
+    print("  2. model_bundle.py, tflite_loader.py and inference_backends.py")
     print("\nRun create_tflite_model.py on PC first!")
     exit(1)
 
@@ -151,14 +165,10 @@ try:
 
         # Extract and preprocess ROI
         roi = frame[100:400, 100:400]
-        roi_resized = cv2.resize(roi, (IMG_SIZE, IMG_SIZE))
-        roi_normalized = roi_resized.astype(np.float32) / 255.0
-        roi_input = np.expand_dims(roi_normalized, axis=0)
-
-        # Run inference with TFLite
-        interpreter.set_tensor(input_details[0]['index'], roi_input)
-        interpreter.invoke()
-        predictions = interpreter.get_tensor(output_details[0]['index'])[0]
+        roi_input = preprocess_roi(roi, IMG_SIZE, PREPROCESSING)
+
+        # Run inference through the selected backend
+        predictions = backend.predict(roi_input)[0]
         
         predicted_class_idx = np.argmax(predictions)
         confidence = predictions[predicted_class_idx] * 100
@@ -217,6 +227,7 @@ except Exception as e:
     print(f"\n\n❌ ERROR: {e}")
 finally:
     cap.release()
+    backend.close()
     cv2.destroyAllWindows()
     print("✓ Camera released")
     print("✓ Program terminated")
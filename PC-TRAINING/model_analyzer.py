@@ -0,0 +1,570 @@
+"""
+TFLite Model Analyzer
+
+Every converter writes <model>.analysis.json next to each exported model so a
+slow model on the Nano can be traced to its ops instead of guessed at:
+
+    - op list and counts per type, Flex (SELECT_TF_OPS) and custom ops
+    - estimated FLOPs (conv / depthwise / dense / elementwise, from tensor shapes)
+    - weight bytes and an estimated tensor arena (greedy placement of the
+      activation tensors by lifetime, 64-byte aligned like the TFLite planner)
+    - per-op latency from a profiling run on this machine: benchmark_model
+      --enable_op_profiling when the binary is on PATH (or BENCHMARK_MODEL),
+      otherwise the measured invoke time split by FLOPs and marked estimated
+
+The flatbuffer is read directly (no schema package needed), so reports can be
+produced for .tflite files and for the model inside .gmb bundles. When a report
+already exists it is compared with the new build before being replaced.
+
+    python model_analyzer.py gesture_model_v1.tflite gesture_model_v2.tflite
+    python model_analyzer.py gesture_backbone.gmb --no-profile
+    python model_analyzer.py --compare old.analysis.json gesture_model.tflite.analysis.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+REPORT_SUFFIX = ".analysis.json"
+REPORT_VERSION = 1
+WARMUP_RUNS = 5
+PROFILE_RUNS = 50
+TENSOR_ALIGNMENT = 64  # TFLite arena alignment
+TOP_OPS = 10           # Slowest ops printed in the summary
+BENCHMARK_ENV = "BENCHMARK_MODEL"
+
+# BuiltinOperator enum from the TFLite schema
+BUILTIN_OPS = (
+    "ADD", "AVERAGE_POOL_2D", "CONCATENATION", "CONV_2D", "DEPTHWISE_CONV_2D", "DEPTH_TO_SPACE",
+    "DEQUANTIZE", "EMBEDDING_LOOKUP", "FLOOR", "FULLY_CONNECTED", "HASHTABLE_LOOKUP",
+    "L2_NORMALIZATION", "L2_POOL_2D", "LOCAL_RESPONSE_NORMALIZATION", "LOGISTIC", "LSH_PROJECTION",
+    "LSTM", "MAX_POOL_2D", "MUL", "RELU", "RELU_N1_TO_1", "RELU6", "RESHAPE", "RESIZE_BILINEAR",
+    "RNN", "SOFTMAX", "SPACE_TO_DEPTH", "SVDF", "TANH", "CONCAT_EMBEDDINGS", "SKIP_GRAM", "CALL",
+    "CUSTOM", "EMBEDDING_LOOKUP_SPARSE", "PAD", "UNIDIRECTIONAL_SEQUENCE_RNN", "GATHER",
+    "BATCH_TO_SPACE_ND", "SPACE_TO_BATCH_ND", "TRANSPOSE", "MEAN", "SUB", "DIV", "SQUEEZE",
+    "UNIDIRECTIONAL_SEQUENCE_LSTM", "STRIDED_SLICE", "BIDIRECTIONAL_SEQUENCE_RNN", "EXP", "TOPK_V2",
+    "SPLIT", "LOG_SOFTMAX", "DELEGATE", "BIDIRECTIONAL_SEQUENCE_LSTM", "CAST", "PRELU", "MAXIMUM",
+    "ARG_MAX", "MINIMUM", "LESS", "NEG", "PADV2", "GREATER", "GREATER_EQUAL", "LESS_EQUAL",
+    "SELECT", "SLICE", "SIN", "TRANSPOSE_CONV", "SPARSE_TO_DENSE", "TILE", "EXPAND_DIMS", "EQUAL",
+    "NOT_EQUAL", "LOG", "SUM", "SQRT", "RSQRT", "SHAPE", "POW", "ARG_MIN", "FAKE_QUANT",
+    "REDUCE_PROD", "REDUCE_MAX", "PACK", "LOGICAL_OR", "ONE_HOT", "LOGICAL_AND", "LOGICAL_NOT",
+    "UNPACK", "REDUCE_MIN", "FLOOR_DIV", "REDUCE_ANY", "SQUARE", "ZEROS_LIKE", "FILL", "FLOOR_MOD",
+    "RANGE", "RESIZE_NEAREST_NEIGHBOR", "LEAKY_RELU", "SQUARED_DIFFERENCE", "MIRROR_PAD", "ABS",
+    "SPLIT_V", "UNIQUE", "CEIL", "REVERSE_V2", "ADD_N", "GATHER_ND", "COS", "WHERE", "RANK", "ELU",
+    "REVERSE_SEQUENCE", "MATRIX_DIAG", "QUANTIZE", "MATRIX_SET_DIAG", "ROUND", "HARD_SWISH", "IF",
+    "WHILE", "NON_MAX_SUPPRESSION_V4", "NON_MAX_SUPPRESSION_V5", "SCATTER_ND", "SELECT_V2",
+    "DENSIFY", "SEGMENT_SUM", "BATCH_MATMUL",
+)
+
+# TensorType enum -> (name, bytes per element)
+TENSOR_TYPES = {
+    0: ("float32", 4), 1: ("float16", 2), 2: ("int32", 4), 3: ("uint8", 1), 4: ("int64", 8),
+    5: ("string", 1), 6: ("bool", 1), 7: ("int16", 2), 8: ("complex64", 8), 9: ("int8", 1),
+    10: ("float64", 8), 11: ("complex128", 16), 12: ("uint64", 8), 15: ("uint32", 4), 16: ("uint16", 2),
+}
+
+ELEMENTWISE_OPS = {"ADD", "SUB", "MUL", "DIV", "MAXIMUM", "MINIMUM", "SQUARED_DIFFERENCE", "RELU",
+                   "RELU6", "RELU_N1_TO_1", "LOGISTIC", "TANH", "HARD_SWISH", "LEAKY_RELU", "PRELU",
+                   "ELU", "EXP", "SQRT", "RSQRT", "ABS", "NEG", "SQUARE", "DEQUANTIZE", "QUANTIZE"}
+REDUCTION_OPS = {"AVERAGE_POOL_2D", "MAX_POOL_2D", "L2_POOL_2D", "MEAN", "SUM", "REDUCE_MAX",
+                 "REDUCE_MIN", "REDUCE_PROD"}
+
+
+class AnalyzerError(Exception):
+    """Raised when a file is not a readable TFLite flatbuffer"""
+
+
+# ==================== FLATBUFFER ====================
+class _Table:
+    """Minimal read-only view of one flatbuffer table"""
+
+    def __init__(self, data, position):
+        self.data = data
+        self.position = position
+        vtable = position - struct.unpack_from("<i", data, position)[0]
+        self.vtable = vtable
+        self.vtable_size = struct.unpack_from("<H", data, vtable)[0]
+
+    def _field(self, index):
+        entry = 4 + 2 * index
+        if entry >= self.vtable_size:
+            return 0
+        return struct.unpack_from("<H", self.data, self.vtable + entry)[0]
+
+    def scalar(self, index, fmt, default=0):
+        offset = self._field(index)
+        return struct.unpack_from("<" + fmt, self.data, self.position + offset)[0] if offset else default
+
+    def _target(self, index):
+        offset = self._field(index)
+        if not offset:
+            return None
+        position = self.position + offset
+        return position + struct.unpack_from("<I", self.data, position)[0]
+
+    def vector_length(self, index):
+        target = self._target(index)
+        return 0 if target is None else struct.unpack_from("<I", self.data, target)[0]
+
+    def vector(self, index, fmt):
+        target = self._target(index)
+        if target is None:
+            return []
+        length = struct.unpack_from("<I", self.data, target)[0]
+        return list(struct.unpack_from(f"<{length}{fmt}", self.data, target + 4))
+
+    def tables(self, index):
+        target = self._target(index)
+        if target is None:
+            return []
+        length = struct.unpack_from("<I", self.data, target)[0]
+        positions = (target + 4 + 4 * i for i in range(length))
+        return [_Table(self.data, p + struct.unpack_from("<I", self.data, p)[0]) for p in positions]
+
+    def string(self, index):
+        target = self._target(index)
+        if target is None:
+            return None
+        length = struct.unpack_from("<I", self.data, target)[0]
+        return bytes(self.data[target + 4:target + 4 + length]).decode("utf-8", "replace")
+
+
+def read_model_bytes(path):
+    """Flatbuffer bytes of a .tflite file or of the model inside a .gmb bundle"""
+    from model_bundle import is_bundle, load_bundle
+    if is_bundle(path):
+        bundle = load_bundle(path, verify=False)
+        try:
+            view = bundle.model_view()
+            data = bytes(view)
+            view.release()
+        finally:
+            bundle.close()
+        return data
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def parse_model(data):
+    """Operators and tensors of every subgraph: the structural half of the report"""
+    if len(data) < 8 or data[4:8] != b"TFL3":
+        raise AnalyzerError("missing TFL3 identifier (not a TFLite flatbuffer)")
+    try:
+        model = _Table(data, struct.unpack_from("<I", data, 0)[0])
+        opcodes = []
+        for code in model.tables(1):
+            builtin = max(code.scalar(0, "b"), code.scalar(3, "i"))
+            custom = code.string(1)
+            if builtin == BUILTIN_OPS.index("CUSTOM") and custom:
+                opcodes.append(custom)
+            else:
+                opcodes.append(BUILTIN_OPS[builtin] if builtin < len(BUILTIN_OPS) else f"BUILTIN_{builtin}")
+        buffer_sizes = [max(buffer.vector_length(0), buffer.scalar(2, "Q")) for buffer in model.tables(4)]
+
+        subgraphs = []
+        for subgraph in model.tables(2):
+            tensors = []
+            for tensor in subgraph.tables(0):
+                type_name, item_size = TENSOR_TYPES.get(tensor.scalar(1, "b"), ("unknown", 1))
+                shape = tensor.vector(0, "i")
+                buffer = tensor.scalar(2, "I")
+                tensors.append({
+                    "name": tensor.string(3) or "",
+                    "shape": shape,
+                    "dtype": type_name,
+                    "bytes": int(np.prod([max(d, 1) for d in shape], dtype=np.int64)) * item_size,
+                    "constant": 0 < buffer < len(buffer_sizes) and buffer_sizes[buffer] > 0,
+                    "variable": bool(tensor.scalar(5, "B")),
+                })
+            operators = [{"type": opcodes[op.scalar(0, "I")],
+                          "inputs": [i for i in op.vector(1, "i") if i >= 0],
+                          "outputs": [i for i in op.vector(2, "i") if i >= 0]}
+                         for op in subgraph.tables(3)]
+            subgraphs.append({"tensors": tensors, "operators": operators,
+                              "inputs": subgraph.vector(1, "i"), "outputs": subgraph.vector(2, "i")})
+    except (struct.error, IndexError) as e:
+        raise AnalyzerError(f"malformed flatbuffer: {e}")
+    return subgraphs
+
+
+# ==================== STATIC ANALYSIS ====================
+def _elements(shape):
+    return int(np.prod([max(d, 1) for d in shape], dtype=np.int64)) if shape else 1
+
+
+def estimate_flops(op, tensors):
+    """Multiply-adds count as 2 FLOPs; shapes follow the TFLite kernel layouts"""
+    op_type = op["type"]
+    inputs = [tensors[i] for i in op["inputs"]]
+    outputs = [tensors[i] for i in op["outputs"]]
+    if not outputs:
+        return 0
+    out_elements = _elements(outputs[0]["shape"])
+    if op_type == "CONV_2D" and len(inputs) > 1:
+        _, kh, kw, in_channels = inputs[1]["shape"]           # filter (out, kh, kw, in)
+        return 2 * out_elements * kh * kw * in_channels
+    if op_type == "DEPTHWISE_CONV_2D" and len(inputs) > 1:
+        _, kh, kw, _ = inputs[1]["shape"]                     # filter (1, kh, kw, out)
+        return 2 * out_elements * kh * kw
+    if op_type == "TRANSPOSE_CONV" and len(inputs) > 2:
+        _, kh, kw, _ = inputs[1]["shape"]
+        return 2 * _elements(inputs[2]["shape"]) * kh * kw * inputs[1]["shape"][0]
+    if op_type == "FULLY_CONNECTED" and len(inputs) > 1:
+        return 2 * out_elements * inputs[1]["shape"][-1]      # weights (out, in)
+    if op_type == "BATCH_MATMUL" and inputs:
+        return 2 * out_elements * inputs[0]["shape"][-1]
+    if op_type in ("SOFTMAX", "LOG_SOFTMAX"):
+        return 3 * out_elements
+    if op_type in ELEMENTWISE_OPS:
+        return out_elements
+    if op_type in REDUCTION_OPS and inputs:
+        return _elements(inputs[0]["shape"])
+    return 0
+
+
+def estimate_arena(subgraph):
+    """
+    Arena bytes for the activations of one subgraph: each non-constant tensor
+    lives from the op that produces it to its last consumer, and tensors are
+    placed largest first at the lowest offset free for their whole lifetime.
+    """
+    operators = subgraph["operators"]
+    last = len(operators)
+    lifetimes = {}
+    for index in subgraph["inputs"]:
+        lifetimes[index] = [0, 0]
+    for step, op in enumerate(operators):
+        for index in op["outputs"]:
+            lifetimes.setdefault(index, [step, step])
+        for index in op["inputs"]:
+            lifetimes.setdefault(index, [0, step])[1] = step
+    for index in subgraph["outputs"]:
+        lifetimes.setdefault(index, [last, last])[1] = last
+
+    tensors = subgraph["tensors"]
+    allocations = []
+    for index, (first, end) in lifetimes.items():
+        tensor = tensors[index]
+        if tensor["constant"]:
+            continue
+        if tensor["variable"]:
+            first, end = 0, last
+        size = -(-tensor["bytes"] // TENSOR_ALIGNMENT) * TENSOR_ALIGNMENT
+        allocations.append((size, first, end))
+
+    placed, arena = [], 0
+    for size, first, end in sorted(allocations, reverse=True):
+        offset = 0
+        for other_offset, other_size, other_first, other_end in sorted(placed):
+            overlaps_in_time = not (other_end < first or end < other_first)
+            if overlaps_in_time and offset + size > other_offset and offset < other_offset + other_size:
+                offset = other_offset + other_size
+        placed.append((offset, size, first, end))
+        arena = max(arena, offset + size)
+    no_reuse = sum(size for size, _, _ in allocations)
+    return arena, no_reuse
+
+
+def analyze_structure(data):
+    subgraphs = parse_model(data)
+    op_counts, flops_by_type, weight_dtypes = {}, {}, {}
+    flex_ops, custom_ops, per_op = set(), set(), []
+    weights_bytes, arena, no_reuse = 0, 0, 0
+    for number, subgraph in enumerate(subgraphs):
+        tensors = subgraph["tensors"]
+        for op in subgraph["operators"]:
+            op_type = op["type"]
+            op_counts[op_type] = op_counts.get(op_type, 0) + 1
+            if op_type.startswith("Flex"):
+                flex_ops.add(op_type)
+            elif op_type not in BUILTIN_OPS and not op_type.startswith("BUILTIN_"):
+                custom_ops.add(op_type)
+            flops = estimate_flops(op, tensors)
+            flops_by_type[op_type] = flops_by_type.get(op_type, 0) + flops
+            if number == 0:
+                name = tensors[op["outputs"][0]]["name"] if op["outputs"] else ""
+                per_op.append({"index": len(per_op), "type": op_type, "name": name, "flops": flops})
+        for tensor in tensors:
+            if tensor["constant"]:
+                weights_bytes += tensor["bytes"]
+                weight_dtypes[tensor["dtype"]] = weight_dtypes.get(tensor["dtype"], 0) + tensor["bytes"]
+        subgraph_arena, subgraph_no_reuse = estimate_arena(subgraph)
+        arena = max(arena, subgraph_arena)
+        no_reuse = max(no_reuse, subgraph_no_reuse)
+
+    main = subgraphs[0]
+    describe = lambda index: {"shape": main["tensors"][index]["shape"], "dtype": main["tensors"][index]["dtype"]}
+    return {
+        "subgraphs": len(subgraphs),
+        "inputs": [describe(i) for i in main["inputs"]],
+        "outputs": [describe(i) for i in main["outputs"]],
+        "ops": {"total": sum(op_counts.values()),
+                "by_type": dict(sorted(op_counts.items(), key=lambda item: -item[1]))},
+        "flex_ops": sorted(flex_ops),
+        "custom_ops": sorted(custom_ops),
+        "flops": int(sum(flops_by_type.values())),
+        "flops_by_type": {k: int(v) for k, v in sorted(flops_by_type.items(), key=lambda item: -item[1]) if v},
+        "weights_bytes": int(weights_bytes),
+        "weight_dtypes": weight_dtypes,
+        "arena": {"estimated_bytes": int(arena), "no_reuse_bytes": int(no_reuse), "estimated": True},
+        "per_op": per_op,
+    }
+
+
+# ==================== PROFILING ====================
+def find_benchmark_model():
+    return os.environ.get(BENCHMARK_ENV) or shutil.which("benchmark_model")
+
+
+def profile_with_benchmark(binary, data, threads, runs=PROFILE_RUNS):
+    """Per-op milliseconds from benchmark_model's op profiling table (Run Order section)"""
+    with tempfile.NamedTemporaryFile(suffix=".tflite", delete=False) as f:
+        f.write(data)
+        graph = f.name
+    try:
+        command = [binary, f"--graph={graph}", "--enable_op_profiling=true",
+                   f"--num_runs={runs}", f"--warmup_runs={WARMUP_RUNS}", f"--num_threads={threads or 1}"]
+        output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, timeout=600).stdout
+    finally:
+        os.remove(graph)
+
+    row = re.compile(r"^\s*(\S+)\s+[\d.]+\s+[\d.]+\s+([\d.]+)\s+[\d.]+%\s+[\d.]+%\s+[\d.]+\s+\d+\s+\[(.*)\]")
+    op_ms, in_run_order = [], False
+    for line in output.splitlines():
+        if "Run Order" in line:
+            in_run_order = True
+            continue
+        if in_run_order and line.strip().startswith("====="):
+            break
+        match = row.match(line) if in_run_order else None
+        if match:
+            op_ms.append((match.group(1), float(match.group(2))))
+    if not op_ms:
+        raise AnalyzerError("benchmark_model printed no op profile")
+    invoke = re.search(r"Inference \(avg\):\s*([\d.]+)", output)  # Microseconds
+    invoke_ms = float(invoke.group(1)) / 1000.0 if invoke else sum(ms for _, ms in op_ms)
+    return invoke_ms, op_ms
+
+
+def time_invoke(data, threads, runs=PROFILE_RUNS):
+    """Median invoke time in ms on random input, through the runtime interpreter"""
+    from tflite_loader import interpreter_source, make_interpreter
+    interpreter = make_interpreter(model_content=data, num_threads=threads)
+    interpreter.allocate_tensors()
+    rng = np.random.RandomState(0)
+    for details in interpreter.get_input_details():
+        if np.issubdtype(details['dtype'], np.floating):
+            value = rng.rand(*details['shape'])
+        else:
+            value = rng.randint(0, 127, size=details['shape'])
+        interpreter.set_tensor(details['index'], value.astype(details['dtype']))
+    for _ in range(WARMUP_RUNS):
+        interpreter.invoke()
+    times = []
+    for _ in range(runs):
+        start = time.time()
+        interpreter.invoke()
+        times.append((time.time() - start) * 1000.0)
+    return float(np.median(times)), interpreter_source()
+
+
+def profile(data, per_op, threads=None, runs=PROFILE_RUNS):
+    """
+    Fill per_op[i]["ms"] from a profiling run. Without benchmark_model the
+    invoke time is measured here and apportioned by FLOPs (marked estimated).
+    """
+    latency = {"host": f"{platform.node()} ({platform.machine()})", "threads": threads, "runs": runs}
+    binary = find_benchmark_model()
+    if binary:
+        try:
+            invoke_ms, op_ms = profile_with_benchmark(binary, data, threads, runs)
+            latency.update({"source": "benchmark_model", "estimated_per_op": False, "invoke_ms": invoke_ms})
+            if len(op_ms) == len(per_op):
+                for op, (_, ms) in zip(per_op, op_ms):
+                    op["ms"] = ms
+            else:
+                # Delegates fuse ops, so the rows no longer line up with the graph
+                latency["profiled_ops"] = [{"type": op_type, "ms": ms} for op_type, ms in op_ms]
+            return latency
+        except (OSError, subprocess.SubprocessError, AnalyzerError) as e:
+            latency["benchmark_error"] = str(e)
+
+    try:
+        invoke_ms, source = time_invoke(data, threads, runs)
+    except Exception as e:  # Flex ops without the Flex delegate, missing runtime, ...
+        latency.update({"source": None, "error": str(e)})
+        return latency
+    total_flops = sum(op["flops"] for op in per_op)
+    for op in per_op:
+        op["ms"] = invoke_ms * op["flops"] / total_flops if total_flops else invoke_ms / max(len(per_op), 1)
+    latency.update({"source": source, "estimated_per_op": True, "invoke_ms": invoke_ms})
+    return latency
+
+
+# ==================== REPORT ====================
+def report_path(model_path):
+    return model_path + REPORT_SUFFIX
+
+
+def analyze_model(model_path, threads=None, runs=PROFILE_RUNS, run_profile=True):
+    data = read_model_bytes(model_path)
+    report = {
+        "format_version": REPORT_VERSION,
+        "model": os.path.basename(model_path),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size_bytes": len(data),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    report.update(analyze_structure(data))
+    if run_profile:
+        report["latency"] = profile(data, report["per_op"], threads, runs)
+        by_type = {}
+        for op in report["per_op"]:
+            if "ms" in op:
+                by_type[op["type"]] = by_type.get(op["type"], 0.0) + op["ms"]
+        report["latency"]["by_type_ms"] = {k: round(v, 4) for k, v in
+                                           sorted(by_type.items(), key=lambda item: -item[1])}
+    return report
+
+
+def _summary_line(label, old, new, unit="", scale=1.0, digits=1):
+    if old is None or new is None:
+        return None
+    old, new = old * scale, new * scale
+    change = f" ({(new - old) / old * 100:+.1f}%)" if old else ""
+    return f"  {label:<14} {old:.{digits}f}{unit} → {new:.{digits}f}{unit}{change}"
+
+
+def compare_reports(old, new):
+    """Human-readable differences between two reports of the same model"""
+    lines = []
+    if old.get("sha256") == new.get("sha256"):
+        lines.append("  model unchanged (same SHA-256)")
+    for line in (
+            _summary_line("size", old.get("size_bytes"), new.get("size_bytes"), " MB", 1.0 / (1024 * 1024), 2),
+            _summary_line("FLOPs", old.get("flops"), new.get("flops"), " M", 1e-6),
+            _summary_line("arena", old["arena"]["estimated_bytes"], new["arena"]["estimated_bytes"],
+                          " KB", 1.0 / 1024, 0),
+            _summary_line("ops", old["ops"]["total"], new["ops"]["total"], digits=0),
+            _summary_line("invoke", (old.get("latency") or {}).get("invoke_ms"),
+                          (new.get("latency") or {}).get("invoke_ms"), " ms", 1.0, 2)):
+        if line:
+            lines.append(line)
+    old_types, new_types = old["ops"]["by_type"], new["ops"]["by_type"]
+    for op_type in sorted(set(old_types) | set(new_types)):
+        if old_types.get(op_type, 0) != new_types.get(op_type, 0):
+            lines.append(f"  {op_type:<14} {old_types.get(op_type, 0)} → {new_types.get(op_type, 0)} ops")
+    added_flex = sorted(set(new["flex_ops"]) - set(old["flex_ops"]))
+    if added_flex:
+        lines.append(f"  ⚠ new Flex ops: {', '.join(added_flex)}")
+    old_ms = (old.get("latency") or {}).get("by_type_ms", {})
+    for op_type, ms in (new.get("latency") or {}).get("by_type_ms", {}).items():
+        if op_type in old_ms and old_ms[op_type] and abs(ms - old_ms[op_type]) / old_ms[op_type] > 0.2:
+            lines.append(f"  {op_type:<14} {old_ms[op_type]:.2f} → {ms:.2f} ms")
+    return lines
+
+
+def print_report(report, top=TOP_OPS):
+    print(f"✓ {report['model']}: {report['ops']['total']} ops, {report['flops'] / 1e6:.1f} MFLOPs, "
+          f"weights {report['weights_bytes'] / (1024 * 1024):.2f} MB, "
+          f"arena ~{report['arena']['estimated_bytes'] / 1024:.0f} KB")
+    print("  Ops: " + ", ".join(f"{op_type} ×{count}" for op_type, count in report["ops"]["by_type"].items()))
+    if report["flex_ops"]:
+        print(f"  ⚠ Flex ops (need the TF Select delegate on the Nano): {', '.join(report['flex_ops'])}")
+    if report["custom_ops"]:
+        print(f"  ⚠ Custom ops: {', '.join(report['custom_ops'])}")
+    latency = report.get("latency")
+    if not latency:
+        return
+    if latency.get("invoke_ms") is None:
+        print(f"  ⚠ Profiling failed: {latency.get('error')}")
+        return
+    estimated = " (per-op split by FLOPs, estimated)" if latency.get("estimated_per_op") else ""
+    print(f"  Invoke: {latency['invoke_ms']:.2f} ms via {latency['source']} on {latency['host']}{estimated}")
+    slowest = sorted((op for op in report["per_op"] if "ms" in op), key=lambda op: -op["ms"])[:top]
+    for op in slowest:
+        print(f"    {op['ms']:7.3f} ms  {op['type']:<18} {op['name'][:48]}")
+
+
+def write_report(model_path, threads=None, runs=PROFILE_RUNS, run_profile=True, quiet=False):
+    """Analyze a model, compare with the previous report if any, and save <model>.analysis.json"""
+    report = analyze_model(model_path, threads, runs, run_profile)
+    path = report_path(model_path)
+    previous = None
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+    if previous is not None:
+        report["previous"] = {key: previous.get(key) for key in ("sha256", "created", "flops", "size_bytes")}
+        report["previous"]["invoke_ms"] = (previous.get("latency") or {}).get("invoke_ms")
+    if not quiet:
+        print_report(report)
+        if previous is not None:
+            print(f"  Compared with the previous build ({previous.get('created')}):")
+            for line in compare_reports(previous, report):
+                print("  " + line)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+
+def analyze_exports(paths, threads=None):
+    """Converter hook: analyze every model that exists, never failing the conversion"""
+    print("\n" + "=" * 60)
+    print("MODEL ANALYSIS")
+    print("=" * 60)
+    for model_path in paths:
+        if not os.path.exists(model_path):
+            continue
+        try:
+            write_report(model_path, threads)
+            print(f"  Report: {report_path(model_path)}")
+        except (AnalyzerError, OSError) as e:
+            print(f"⚠ Could not analyze {model_path}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Op, FLOPs, arena and latency report for TFLite models")
+    parser.add_argument("models", nargs="*", help=".tflite or .gmb files")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--runs", type=int, default=PROFILE_RUNS)
+    parser.add_argument("--no-profile", action="store_true", help="static analysis only")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], "r") as f:
+            old = json.load(f)
+        with open(args.compare[1], "r") as f:
+            new = json.load(f)
+        print(f"{old['model']} ({old.get('created')}) → {new['model']} ({new.get('created')})")
+        for line in compare_reports(old, new):
+            print(line)
+        return
+    if not args.models:
+        parser.error("give model files or --compare OLD NEW")
+    for model_path in args.models:
+        try:
+            write_report(model_path, args.threads, args.runs, not args.no_profile)
+            print(f"  Report: {report_path(model_path)}")
+        except (AnalyzerError, OSError) as e:
+            print(f"❌ ERROR: {model_path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
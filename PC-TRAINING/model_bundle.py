@@ -0,0 +1,351 @@
+"""
+Self-Describing Model Bundle (.gmb)
+
+One file holding everything a runtime needs: the TFLite flatbuffer, the class
+list, the input spec, preprocessing parameters, calibration data and a SHA-256
+checksum of the flatbuffer.
+
+Layout:
+    [TFLite flatbuffer][JSON metadata][u64 metadata length][8-byte magic]
+
+The flatbuffer stays at offset 0 and the metadata is a trailer, so TFLite can
+open the bundle directly with model_path= (it memory-maps the file itself)
+and Python only maps the file to read the trailer and hash the model region.
+Nothing is copied into Python bytes on the load path.
+
+Also provides load_model_metadata() for the legacy model_info.json /
+class_names.txt layout, so every script reads metadata the same way.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+
+BUNDLE_MAGIC = b"GSTBNDL1"
+BUNDLE_VERSION = 1
+BUNDLE_EXTENSION = ".gmb"
+FOOTER = struct.Struct("<Q8s")
+
+DEFAULT_IMG_SIZE = 128
+DEFAULT_CLASSES = ['forward', 'play', 'reverse', 'stop', 'volume_up']
+
+
+class BundleError(Exception):
+    """Raised when a bundle is malformed, corrupt or incompatible"""
+
+
+def default_preprocessing(color_order="BGR"):
+    """Preprocessing parameters: ROI is resized, channel-ordered, then x * scale + offset"""
+    return {
+        "color_order": color_order,
+        "scale": 1.0 / 255.0,
+        "offset": 0.0,
+        "interpolation": "linear",
+    }
+
+
+def write_bundle(path, tflite_model, classes, img_size=DEFAULT_IMG_SIZE,
+                 preprocessing=None, calibration=None, model_version="v1.0", extra=None):
+    """
+    Write a bundle from TFLite flatbuffer bytes.
+    preprocessing defaults to RGB order, which is what Keras training feeds.
+    """
+    tflite_model = bytes(tflite_model)
+    metadata = {
+        "format_version": BUNDLE_VERSION,
+        "model_version": model_version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "classes": list(classes),
+        "input_spec": {
+            "shape": [1, img_size, img_size, 3],
+            "dtype": "float32",
+        },
+        "preprocessing": preprocessing or default_preprocessing("RGB"),
+        "calibration": calibration,
+        "model": {
+            "length": len(tflite_model),
+            "sha256": hashlib.sha256(tflite_model).hexdigest(),
+        },
+    }
+    if extra:
+        metadata.update(extra)
+
+    encoded = json.dumps(metadata, indent=1).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(tflite_model)
+        f.write(encoded)
+        f.write(FOOTER.pack(len(encoded), BUNDLE_MAGIC))
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def update_bundle_metadata(path, **updates):
+    """Rewrite a bundle with some metadata keys replaced (the flatbuffer is copied unchanged)"""
+    bundle = load_bundle(path, verify=True)
+    try:
+        metadata = dict(bundle.metadata)
+        metadata.update(updates)
+        encoded = json.dumps(metadata, indent=1).encode("utf-8")
+        tmp_path = path + ".tmp"
+        view = bundle.model_view()
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(view)
+                f.write(encoded)
+                f.write(FOOTER.pack(len(encoded), BUNDLE_MAGIC))
+        finally:
+            view.release()
+    finally:
+        bundle.close()
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def is_bundle(path):
+    """True if the file ends with the bundle footer"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(-FOOTER.size, os.SEEK_END)
+            return FOOTER.unpack(f.read(FOOTER.size))[1] == BUNDLE_MAGIC
+    except (OSError, struct.error):
+        return False
+
+
+class ModelBundle:
+    """A bundle opened through a read-only memory map"""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BundleError(f"{path} is empty")
+
+        size = len(self.buffer)
+        if size < FOOTER.size:
+            self.close()
+            raise BundleError(f"{path} is too small to be a bundle")
+        meta_length, magic = FOOTER.unpack(self.buffer[size - FOOTER.size:])
+        if magic != BUNDLE_MAGIC:
+            self.close()
+            raise BundleError(f"{path} is not a model bundle")
+
+        meta_start = size - FOOTER.size - meta_length
+        self.metadata = json.loads(self.buffer[meta_start:size - FOOTER.size].decode("utf-8"))
+        if self.metadata.get("format_version", 0) > BUNDLE_VERSION:
+            self.close()
+            raise BundleError(f"{path} uses bundle format "
+                              f"v{self.metadata['format_version']}, this runtime reads v{BUNDLE_VERSION}")
+
+        self.model_length = self.metadata["model"]["length"]
+        if self.model_length != meta_start:
+            self.close()
+            raise BundleError(f"{path} model length does not match its layout")
+        if verify:
+            self.verify()
+
+    @property
+    def classes(self):
+        return self.metadata["classes"]
+
+    @property
+    def input_spec(self):
+        return self.metadata["input_spec"]
+
+    @property
+    def img_size(self):
+        return self.input_spec["shape"][1]
+
+    @property
+    def preprocessing(self):
+        return self.metadata.get("preprocessing") or default_preprocessing()
+
+    @property
+    def calibration(self):
+        return self.metadata.get("calibration")
+
+    def model_view(self):
+        """Zero-copy memoryview of the flatbuffer region"""
+        return memoryview(self.buffer)[:self.model_length]
+
+    def verify(self):
+        """Check the flatbuffer against the stored SHA-256"""
+        digest = hashlib.sha256()
+        view = self.model_view()
+        try:
+            digest.update(view)
+        finally:
+            view.release()
+        if digest.hexdigest() != self.metadata["model"]["sha256"]:
+            raise BundleError(f"{self.path} checksum mismatch (corrupt or truncated transfer?)")
+
+    def close(self):
+        try:
+            self.buffer.close()
+        except (AttributeError, BufferError):
+            pass
+        self._file.close()
+
+
+def load_bundle(path, verify=True):
+    return ModelBundle(path, verify)
+
+
+def validate_input_spec(input_spec, input_details, classes=None, output_details=None):
+    """
+    Refuse a model whose actual input tensor differs from its declared spec
+    (or whose output width differs from the class list). Raises BundleError.
+    """
+    actual_shape = [int(d) for d in input_details[0]['shape']]
+    expected_shape = list(input_spec["shape"])
+    # Batch dimension is free: runtimes may resize it
+    if actual_shape[1:] != expected_shape[1:]:
+        raise BundleError(f"input shape mismatch: model has {actual_shape}, "
+                          f"bundle declares {expected_shape}")
+    actual_dtype = getattr(input_details[0]['dtype'], '__name__', str(input_details[0]['dtype']))
+    if actual_dtype != input_spec["dtype"]:
+        raise BundleError(f"input dtype mismatch: model has {actual_dtype}, "
+                          f"bundle declares {input_spec['dtype']}")
+    if classes is not None and output_details is not None:
+        num_outputs = int(output_details[0]['shape'][-1])
+        if num_outputs != len(classes):
+            raise BundleError(f"model outputs {num_outputs} classes, "
+                              f"metadata lists {len(classes)}")
+
+
+def load_model_metadata(model_path, dataset_dir="dataset"):
+    """
+    Metadata for a bare model file, from the first source found:
+    bundle trailer, model_info.json ("class_names" or legacy "classes"),
+    class_names.txt, the dataset folder, then the default class list.
+    Returns a dict with classes, img_size, input_spec, preprocessing, calibration,
+    embedding (backbone bundles only, see split_model.py) and source.
+    """
+    if os.path.exists(model_path) and is_bundle(model_path):
+        bundle = load_bundle(model_path, verify=False)
+        try:
+            return {
+                "classes": bundle.classes,
+                "img_size": bundle.img_size,
+                "input_spec": bundle.input_spec,
+                "preprocessing": bundle.preprocessing,
+                "calibration": bundle.calibration,
+                "embedding": bundle.metadata.get("embedding"),
+                "source": model_path,
+            }
+        finally:
+            bundle.close()
+
+    model_dir = os.path.dirname(os.path.abspath(model_path))
+    metadata = {
+        "classes": None,
+        "img_size": DEFAULT_IMG_SIZE,
+        "preprocessing": default_preprocessing("BGR"),
+        "calibration": None,
+        "embedding": None,
+        "source": None,
+    }
+
+    info_path = os.path.join(model_dir, "model_info.json")
+    if os.path.exists(info_path):
+        with open(info_path, "r") as f:
+            info = json.load(f)
+        metadata["classes"] = info.get("class_names") or info.get("classes")
+        if "input_shape" in info:
+            metadata["img_size"] = info["input_shape"][0]
+        metadata["img_size"] = info.get("img_size", metadata["img_size"])
+        metadata["preprocessing"] = info.get("preprocessing", metadata["preprocessing"])
+        metadata["calibration"] = info.get("calibration")
+        metadata["source"] = info_path
+
+    names_path = os.path.join(model_dir, "class_names.txt")
+    if not metadata["classes"] and os.path.exists(names_path):
+        with open(names_path, "r") as f:
+            metadata["classes"] = [line.strip() for line in f if line.strip()]
+        metadata["source"] = names_path
+
+    if not metadata["classes"] and os.path.isdir(dataset_dir):
+        metadata["classes"] = sorted(d for d in os.listdir(dataset_dir)
+                                     if os.path.isdir(os.path.join(dataset_dir, d)))
+        metadata["source"] = dataset_dir
+
+    if not metadata["classes"]:
+        metadata["classes"] = list(DEFAULT_CLASSES)
+        metadata["source"] = "defaults"
+    metadata["input_spec"] = input_spec_for(metadata["img_size"])
+    return metadata
+
+
+def preprocess_roi(roi, img_size, preprocessing):
+    """Resize a BGR camera ROI and apply bundle preprocessing; returns a (1, H, W, 3) float32 batch"""
+    import cv2
+    import numpy as np
+    interpolation = cv2.INTER_AREA if preprocessing.get("interpolation") == "area" else cv2.INTER_LINEAR
+    resized = cv2.resize(roi, (img_size, img_size), interpolation=interpolation)
+    if preprocessing.get("color_order", "BGR") == "RGB":
+        resized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+    batch = resized.astype(np.float32)
+    batch *= preprocessing.get("scale", 1.0 / 255.0)
+    offset = preprocessing.get("offset", 0.0)
+    if offset:
+        batch += offset
+    return batch[np.newaxis]
+
+
+def input_spec_for(img_size):
+    """Input spec implied by a legacy model_info.json"""
+    return {"shape": [1, img_size, img_size, 3], "dtype": "float32"}
+
+
+def load_tflite_model(model_path, interpreter_class, dataset_dir="dataset"):
+    """
+    Open a bundle or bare .tflite file, verify it and check its input spec.
+    Returns (interpreter, metadata); raises BundleError if the model does
+    not match its metadata.
+    """
+    if is_bundle(model_path):
+        # Checksum first: never hand a corrupt flatbuffer to the interpreter
+        load_bundle(model_path, verify=True).close()
+    metadata = load_model_metadata(model_path, dataset_dir)
+
+    # For bundles TFLite maps the file itself and ignores the metadata trailer
+    interpreter = interpreter_class(model_path=model_path)
+    interpreter.allocate_tensors()
+    embedding = metadata.get("embedding")
+    validate_input_spec(metadata["input_spec"], interpreter.get_input_details(),
+                        None if embedding else metadata["classes"], interpreter.get_output_details())
+    if embedding:
+        width = int(interpreter.get_output_details()[0]['shape'][-1])
+        if width != embedding["dim"]:
+            raise BundleError(f"backbone outputs {width} values, metadata declares {embedding['dim']}")
+    return interpreter, metadata
+
+
+def write_model_info(path, classes, img_size=DEFAULT_IMG_SIZE, preprocessing=None,
+                     calibration=None, model_version="v1.0"):
+    """Legacy sidecar metadata, written with the same keys the bundle uses"""
+    model_info = {
+        "class_names": list(classes),
+        "input_shape": [img_size, img_size, 3],
+        "preprocessing": preprocessing or default_preprocessing("RGB"),
+        "model_version": model_version,
+    }
+    if calibration is not None:
+        model_info["calibration"] = calibration
+    with open(path, "w") as f:
+        json.dump(model_info, f, indent=2)
+    return model_info
+
+
+if __name__ == "__main__":
+    import sys
+    for bundle_path in sys.argv[1:]:
+        bundle = load_bundle(bundle_path)
+        print(f"✓ {bundle_path}: checksum OK")
+        print(json.dumps(bundle.metadata, indent=2))
+        bundle.close()
@@ -0,0 +1,116 @@
+"""
+MPV JSON IPC Client
+
+One MPVClient per player socket. The connection is kept open and re-opened
+at most every RECONNECT_INTERVAL seconds when MPV is not running, instead of
+connecting once per frame to check status and again per command.
+
+Start MPV with:
+    mpv --input-ipc-server=/tmp/mpv-socket --loop video.mp4
+"""
+import json
+import socket
+import time
+
+DEFAULT_SOCKET = '/tmp/mpv-socket'
+RECONNECT_INTERVAL = 1.0  # Seconds between reconnect attempts while MPV is down
+
+# MPV command mappings (JSON IPC format)
+MPV_COMMANDS = {
+    'play': ['cycle', 'pause'],
+    'stop': ['cycle', 'pause'],          # Pause instead of stop
+    'forward': ['seek', '10'],           # Skip forward 10 seconds
+    'reverse': ['seek', '-10'],          # Skip backward 10 seconds
+    'volume_up': ['add', 'volume', '10'], # Increase volume by 10%
+    'swipe_left': ['seek', '-10'],       # Motion gestures (temporal_head.py)
+    'swipe_right': ['seek', '10'],
+}
+
+
+class MPVClient:
+    """Persistent connection to one MPV IPC socket (simulate=True only prints commands)"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=1.0, simulate=False):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.simulate = simulate
+        self.sock = None
+        self.reader = None
+        self.last_attempt = 0.0
+        self.request_id = 0
+        self.sent = 0
+        self.failed = 0
+
+    def connect(self, force=False):
+        """Open the socket unless connected or a recent attempt failed; returns True if connected"""
+        if self.simulate or self.sock is not None:
+            return True
+        now = time.time()
+        if not force and now - self.last_attempt < RECONNECT_INTERVAL:
+            return False
+        self.last_attempt = now
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            return False
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+        return True
+
+    def connected(self):
+        """True if MPV is reachable (reconnects lazily)"""
+        return self.connect()
+
+    def _disconnect(self):
+        for resource in (self.reader, self.sock):
+            if resource is not None:
+                try:
+                    resource.close()
+                except OSError:
+                    pass
+        self.sock = None
+        self.reader = None
+
+    def command(self, args):
+        """Send one IPC command and wait for its reply; returns True on success"""
+        if self.simulate:
+            print(f"  [SIMULATION] {self.socket_path}: {args}")
+            self.sent += 1
+            return True
+        if not self.connect(force=True):
+            self.failed += 1
+            return False
+        self.request_id += 1
+        request = {'command': args, 'request_id': self.request_id}
+        try:
+            self.sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+            # MPV interleaves events with replies; a reply is the line carrying "error",
+            # and one echoing another request_id is a late reply to an earlier command
+            while True:
+                line = self.reader.readline()
+                if not line:
+                    raise OSError("MPV closed the connection")
+                reply = json.loads(line.decode('utf-8'))
+                if 'error' in reply and reply.get('request_id', self.request_id) == self.request_id:
+                    break
+        except (OSError, ValueError):
+            self._disconnect()
+            self.failed += 1
+            return False
+        if reply['error'] != 'success':
+            self.failed += 1
+            return False
+        self.sent += 1
+        return True
+
+    def send_gesture(self, gesture):
+        """Send the command mapped to a gesture; False if unmapped or not delivered"""
+        if gesture not in MPV_COMMANDS:
+            return False
+        return self.command(MPV_COMMANDS[gesture])
+
+    def close(self):
+        self._disconnect()
@@ -0,0 +1,237 @@
+"""
+MJPEG Preview Server
+
+Shows what a headless unit sees without cv2.imshow: open
+http://<host>:<port>/ in a browser (or ssh -L 8080:localhost:8080 jetson).
+
+The frame loop asks wants_frame() before drawing its overlay and only
+publishes when a viewer is connected and the PREVIEW_FPS throttle allows, so
+with nobody watching the cost is one attribute check per frame. Published
+frames are downscaled and JPEG-encoded once per frame on an encoder thread
+(cv2.imencode releases the GIL) and shared by all viewers.
+
+Endpoints:
+    /                       page with every channel
+    /stream.mjpg            first channel as multipart/x-mixed-replace
+    /stream/<channel>.mjpg  one channel (multi_stream_control.py: one per stream)
+    /snapshot.jpg           next frame of the first channel (?channel=<name>)
+"""
+import html
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+
+PREVIEW_HOST = '127.0.0.1'  # Local only; pass --preview-host 0.0.0.0 to serve the network
+PREVIEW_PORT = 8080
+PREVIEW_FPS = 5.0           # Frames per second encoded while someone watches
+JPEG_QUALITY = 60
+MAX_WIDTH = 640             # Frames are downscaled to at most this width before encoding
+SNAPSHOT_TIMEOUT = 2.0
+BOUNDARY = 'gestureframe'
+
+
+class Channel:
+    """Latest encoded frame of one stream plus its viewer count"""
+
+    def __init__(self, name):
+        self.name = name
+        self.condition = threading.Condition()
+        self.viewers = 0
+        self.snapshot_wanted = False
+        self.pending = None       # Raw frame waiting for the encoder
+        self.jpeg = None
+        self.sequence = 0
+        self.last_publish = 0.0
+        self.encoded = 0
+
+    def wait_jpeg(self, after, timeout):
+        """(sequence, jpeg) newer than `after`, or (after, None) on timeout"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after, timeout)
+            if self.sequence > after:
+                return self.sequence, self.jpeg
+            return after, None
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # No per-request console spam in the runtime
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        server = self.server.preview
+        if url.path == '/':
+            return self._index(server)
+        if url.path == '/snapshot.jpg':
+            name = parse_qs(url.query).get('channel', [None])[0]
+            return self._snapshot(server.channel(name))
+        if url.path == '/stream.mjpg':
+            return self._stream(server.channel(None))
+        if url.path.startswith('/stream/') and url.path.endswith('.mjpg'):
+            return self._stream(server.channel(url.path[len('/stream/'):-len('.mjpg')]))
+        self.send_error(404)
+
+    def _index(self, server):
+        names = server.channel_names() or ['main']
+        images = ''.join(f'<h3>{html.escape(name)}</h3><img src="/stream/{html.escape(name)}.mjpg">'
+                         for name in names)
+        body = f'<html><head><title>Gesture preview</title></head><body>{images}</body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _snapshot(self, channel):
+        if channel is None:
+            return self.send_error(404, 'no such channel')
+        with channel.condition:
+            channel.snapshot_wanted = True
+            after = channel.sequence
+        _, jpeg = channel.wait_jpeg(after, SNAPSHOT_TIMEOUT)
+        if jpeg is None:
+            return self.send_error(503, 'no frame published')
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(jpeg)))
+        self.end_headers()
+        self.wfile.write(jpeg)
+
+    def _stream(self, channel):
+        if channel is None:
+            return self.send_error(404, 'no such channel')
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        with channel.condition:
+            channel.viewers += 1
+        sequence = 0
+        try:
+            while not self.server.preview.stopped.is_set():
+                sequence, jpeg = channel.wait_jpeg(sequence, 1.0)
+                if jpeg is None:
+                    continue
+                self.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                 f'Content-Length: {len(jpeg)}\r\n\r\n'.encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b'\r\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with channel.condition:
+                channel.viewers -= 1
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class PreviewServer:
+    """HTTP MJPEG server and encoder thread; publish() frames from the loop"""
+
+    def __init__(self, port=PREVIEW_PORT, host=PREVIEW_HOST, fps=PREVIEW_FPS, quality=JPEG_QUALITY,
+                 max_width=MAX_WIDTH):
+        self.interval = 1.0 / fps
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.max_width = max_width
+        self.channels = {}
+        self.channels_lock = threading.Lock()
+        self.work = threading.Condition()
+        self.stopped = threading.Event()
+        self.httpd = _HTTPServer((host, port), PreviewHandler)
+        self.httpd.preview = self
+        self.address = f"http://{host}:{self.httpd.server_address[1]}/"
+        self.threads = [threading.Thread(target=self.httpd.serve_forever, name='preview-http', daemon=True),
+                        threading.Thread(target=self._encode_loop, name='preview-encoder', daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def channel(self, name):
+        """Channel by name (None = first); created on first publish"""
+        with self.channels_lock:
+            if name is None:
+                return next(iter(self.channels.values()), None)
+            return self.channels.get(name)
+
+    def channel_names(self):
+        with self.channels_lock:
+            return list(self.channels)
+
+    def _get_channel(self, name):
+        channel = self.channels.get(name)
+        if channel is None:
+            with self.channels_lock:
+                channel = self.channels.setdefault(name, Channel(name))
+        return channel
+
+    def wants_frame(self, name='main', now=None):
+        """True if a viewer is waiting and the throttle allows another frame (cheap, no locking)"""
+        channel = self._get_channel(name)
+        if not channel.viewers and not channel.snapshot_wanted:
+            return False
+        now = time.time() if now is None else now
+        return channel.snapshot_wanted or now - channel.last_publish >= self.interval
+
+    def publish(self, frame, name='main'):
+        """Hand a BGR frame to the encoder (do not modify it afterwards); never blocks on encoding"""
+        channel = self._get_channel(name)
+        channel.last_publish = time.time()
+        with self.work:
+            channel.pending = frame  # An unencoded older frame is simply replaced
+            self.work.notify()
+
+    def _encode_loop(self):
+        while not self.stopped.is_set():
+            with self.work:
+                self.work.wait_for(lambda: self.stopped.is_set() or
+                                   any(c.pending is not None for c in list(self.channels.values())), 1.0)
+                jobs = [(c, c.pending) for c in list(self.channels.values()) if c.pending is not None]
+                for channel, _ in jobs:
+                    channel.pending = None
+            for channel, frame in jobs:
+                h, w = frame.shape[:2]
+                if w > self.max_width:
+                    frame = cv2.resize(frame, (self.max_width, h * self.max_width // w),
+                                       interpolation=cv2.INTER_AREA)
+                ok, jpeg = cv2.imencode('.jpg', frame, self.params)
+                if not ok:
+                    continue
+                with channel.condition:
+                    channel.jpeg = jpeg.tobytes()
+                    channel.sequence += 1
+                    channel.encoded += 1
+                    channel.snapshot_wanted = False
+                    channel.condition.notify_all()
+
+    def viewers(self):
+        with self.channels_lock:
+            return sum(channel.viewers for channel in self.channels.values())
+
+    def stats(self):
+        with self.channels_lock:
+            return {name: {'viewers': c.viewers, 'encoded': c.encoded} for name, c in self.channels.items()}
+
+    def close(self):
+        self.stopped.set()
+        with self.work:
+            self.work.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+
+
+def add_preview_arguments(parser):
+    parser.add_argument('--preview', nargs='?', type=int, const=PREVIEW_PORT, default=None, metavar='PORT',
+                        help=f'serve an MJPEG preview over HTTP (default port {PREVIEW_PORT}) while someone watches')
+    parser.add_argument('--preview-host', default=PREVIEW_HOST,
+                        help='address the preview binds to (0.0.0.0 for the whole network)')
+    parser.add_argument('--preview-fps', type=float, default=PREVIEW_FPS, help='preview frames per second')
+    parser.add_argument('--preview-quality', type=int, default=JPEG_QUALITY, help='preview JPEG quality')
@@ -0,0 +1,140 @@
+"""
+Runtime Control Socket
+
+Lets a headless runtime be driven while it runs: the runtime registers
+handlers on a ControlServer, which answers newline-delimited JSON on a Unix
+socket from a daemon thread, in the same style as inference_server.py:
+
+    -> {"op": "profile", "action": "start", "seconds": 30}
+    <- {"ok": true, "started": true, "running": true, ...}
+    -> {"op": "help"}
+    <- {"ok": true, "ops": ["help", "profile", "status"]}
+
+Handlers run on the control thread, so they must only read runtime state or
+hand work to it (e.g. via an Event); they never block the frame loop.
+
+Usage (client):
+    python3 runtime_control.py status
+    python3 runtime_control.py profile action=start seconds=30
+    python3 runtime_control.py --socket /tmp/gesture-control-2.sock profile action=stop
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+
+DEFAULT_SOCKET = '/tmp/gesture-control.sock'
+TIMEOUT = 30.0  # Seconds the client waits for a reply (a profile stop writes a file first)
+
+
+class ControlError(Exception):
+    """Control request failed (no server, bad reply, or an error from the handler)"""
+    pass
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """One client connection: each line is a request, each reply one line"""
+
+    def reply(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                try:
+                    message = json.loads(line.decode("utf-8"))
+                    result = self.server.dispatch(message)
+                    self.reply({"ok": True, **(result or {})})
+                except (KeyError, ValueError, TypeError, OSError) as e:
+                    self.reply({"ok": False, "error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves registered handlers from a background thread; start() returns immediately"""
+    daemon_threads = True
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        socketserver.UnixStreamServer.__init__(self, socket_path, ControlHandler)
+        self.socket_path = socket_path
+        self.handlers = {'help': lambda message: {'ops': sorted(self.handlers)}}
+        self.thread = None
+
+    def register(self, op, handler):
+        """handler(message dict) -> dict merged into the reply; raise ValueError to report an error"""
+        self.handlers[op] = handler
+
+    def dispatch(self, message):
+        op = message.get("op")
+        if op not in self.handlers:
+            raise ValueError(f"unknown op {op!r} (try 'help')")
+        return self.handlers[op](message)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='runtime-control', daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        if self.thread is not None:
+            self.shutdown()
+        self.server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def send_command(op, socket_path=DEFAULT_SOCKET, timeout=TIMEOUT, **fields):
+    """Send one request and return the reply dict; raises ControlError"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({"op": op, **fields}) + "\n").encode("utf-8"))
+        line = sock.makefile("rb").readline()
+    except OSError as e:
+        raise ControlError(f"{socket_path}: {e}")
+    finally:
+        sock.close()
+    if not line:
+        raise ControlError(f"{socket_path}: connection closed without a reply")
+    reply = json.loads(line.decode("utf-8"))
+    if not reply.get("ok"):
+        raise ControlError(reply.get("error", "request failed"))
+    return reply
+
+
+def parse_field(text):
+    """key=value, with value parsed as JSON when possible (numbers, true/false, lists)"""
+    key, sep, value = text.partition('=')
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected key=value, got {text!r}")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a command to a running gesture runtime")
+    parser.add_argument('op', help="operation, e.g. help, status, profile, model")
+    parser.add_argument('fields', nargs='*', type=parse_field, help='key=value request fields')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='runtime control socket')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT)
+    args = parser.parse_args()
+    try:
+        reply = send_command(args.op, args.socket, args.timeout, **dict(args.fields))
+    except ControlError as e:
+        print(f"❌ ERROR: {e}")
+        exit(1)
+    reply.pop("ok")
+    print(json.dumps(reply, indent=2))
+
+
+if __name__ == '__main__':
+    main()
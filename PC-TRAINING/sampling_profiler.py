@@ -0,0 +1,221 @@
+"""
+On-Demand Sampling Profiler
+
+A thread that, while switched on, snapshots the stacks of all other threads
+(sys._current_frames) RATE times per second and counts identical stacks.
+Stopping writes a collapsed-stack file, one "thread;outer;...;inner count"
+line per stack, ready for flamegraph.pl or speedscope.
+
+Nothing runs while it is off: no thread, no trace hook, no per-frame cost in
+the runtime. Switch it from outside a headless process with a signal or a
+runtime_control.py command:
+
+    kill -USR2 <pid>                                  # toggle (start / stop + dump)
+    python3 runtime_control.py profile action=start seconds=30
+    python3 runtime_control.py profile action=stop
+
+Read a dump on the unit itself:
+    python3 sampling_profiler.py profiles/media_control_mpv-1234-20240101-120000-1.collapsed --top 15
+    flamegraph.pl profiles/*.collapsed > profile.svg  # on the PC
+"""
+import argparse
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+
+PROFILE_RATE = 100          # Samples per second while on
+PROFILE_DIR = 'profiles'
+MAX_SECONDS = 300.0         # A forgotten profiler stops itself after this long
+TOGGLE_SIGNAL = 'SIGUSR2'   # Not available on Windows; use the control command there
+
+
+def frame_label(code):
+    """'function (file.py:first line)': one node per function, not per line"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Start/stop stack sampler; every stop() writes one collapsed-stack file"""
+
+    def __init__(self, name='runtime', rate=PROFILE_RATE, output_dir=PROFILE_DIR, max_seconds=MAX_SECONDS):
+        self.name = name
+        self.rate = rate
+        self.output_dir = output_dir
+        self.max_seconds = max_seconds
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = None
+        self.last_dump = None
+        self.last_summary = None
+        self.dumps = 0
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds=None):
+        """Start sampling (for at most `seconds`, default max_seconds); False if already running"""
+        with self.lock:
+            if self.running():
+                return False
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True,
+                                           args=(self.stop_event, min(seconds or self.max_seconds,
+                                                                      self.max_seconds)))
+            self.thread.start()
+            return True
+
+    def stop(self, wait=True):
+        """Stop sampling; the sampler thread writes the dump. Returns its path if wait, else None"""
+        with self.lock:
+            thread, event = self.thread, self.stop_event
+            if thread is None or not thread.is_alive():
+                return None
+            event.set()
+        if not wait:
+            return None
+        thread.join()
+        return self.last_dump
+
+    def toggle(self):
+        """Start if stopped, stop if running (without blocking the caller); returns True if now running"""
+        if self.running():
+            self.stop(wait=False)
+            return False
+        return self.start()
+
+    def _run(self, stop_event, seconds):
+        own = threading.get_ident()
+        stacks = collections.Counter()
+        interval = 1.0 / self.rate
+        start = time.time()
+        samples = 0
+        next_sample = time.perf_counter()
+        print(f"⏱ Profiler on ({self.rate} Hz, up to {seconds:.0f}s)")
+        while not stop_event.is_set() and time.time() - start < seconds:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks[';'.join(reversed(labels))] += 1
+            samples += 1
+            next_sample += interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                stop_event.wait(delay)
+            else:
+                next_sample = time.perf_counter()  # Fell behind: do not burst to catch up
+        self.last_dump = self._dump(stacks, start, time.time() - start, samples)
+
+    def _dump(self, stacks, start, elapsed, samples):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(start))
+        self.dumps += 1
+        path = os.path.join(self.output_dir, f"{self.name}-{os.getpid()}-{stamp}-{self.dumps}.collapsed")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+        self.last_summary = {'path': path, 'samples': samples, 'seconds': round(elapsed, 2),
+                             'rate': round(samples / elapsed, 1) if elapsed > 0 else 0.0,
+                             'stacks': len(stacks)}
+        print(f"⏱ Profiler off: {samples} samples in {elapsed:.1f}s → {path}")
+        return path
+
+    def status(self):
+        return {'running': self.running(), 'rate': self.rate, 'last': self.last_summary}
+
+    def handle_command(self, message):
+        """runtime_control.py handler: action=start|stop|toggle|status, optional seconds"""
+        action = message.get('action', 'toggle')
+        if action == 'start':
+            started = self.start(message.get('seconds'))
+            return {'started': started, **self.status()}
+        if action == 'stop':
+            self.stop()
+            return self.status()
+        if action == 'toggle':
+            return {'running': self.toggle()}
+        if action == 'status':
+            return self.status()
+        raise ValueError(f"unknown profile action {action!r} (start, stop, toggle, status)")
+
+
+def install_signal_toggle(profiler, signal_name=TOGGLE_SIGNAL):
+    """Toggle the profiler on a signal (main thread only); False where the signal does not exist"""
+    signum = getattr(signal, signal_name, None)
+    if signum is None:
+        return False
+    signal.signal(signum, lambda *_: profiler.toggle())
+    return True
+
+
+def add_profiler_arguments(parser):
+    parser.add_argument('--profile-rate', type=int, default=PROFILE_RATE, metavar='HZ',
+                        help=f'stack samples per second while the profiler is on ({TOGGLE_SIGNAL} toggles it)')
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help='where collapsed-stack dumps are written')
+
+
+# ==================== Reading dumps ====================
+def read_collapsed(path):
+    """[(frames list, count)] from a collapsed-stack file"""
+    stacks = []
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks.append((stack.split(';'), int(count)))
+    return stacks
+
+
+def summarize(stacks, top=20):
+    """(total samples, [(function, self count, total count)] by self count)"""
+    self_counts = collections.Counter()
+    total_counts = collections.Counter()
+    total = 0
+    for frames, count in stacks:
+        total += count
+        if len(frames) > 1:
+            self_counts[frames[-1]] += count
+        for label in set(frames[1:]):  # frames[0] is the thread name
+            total_counts[label] += count
+    rows = [(label, count, total_counts[label]) for label, count in self_counts.most_common(top)]
+    return total, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a collapsed-stack profile")
+    parser.add_argument('profile', help='.collapsed file written by the profiler')
+    parser.add_argument('--top', type=int, default=20, help='functions to list')
+    parser.add_argument('--thread', default=None, help='only stacks of threads whose name contains this')
+    args = parser.parse_args()
+
+    stacks = read_collapsed(args.profile)
+    if args.thread:
+        stacks = [(frames, count) for frames, count in stacks if args.thread in frames[0]]
+    total, rows = summarize(stacks, args.top)
+    threads = collections.Counter()
+    for frames, count in stacks:
+        threads[frames[0]] += count
+
+    print("=" * 60)
+    print(f"PROFILE: {args.profile}")
+    print("=" * 60)
+    print(f"{total} thread samples")
+    for name, count in threads.most_common():
+        print(f"  {name:<30} {count / max(total, 1):>7.1%}")
+    print(f"\n{'self':>7} {'total':>7}  function")
+    for label, self_count, total_count in rows:
+        print(f"{self_count / max(total, 1):>7.1%} {total_count / max(total, 1):>7.1%}  {label}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+"""
+Session Trace Recording and Replay
+
+Opt-in recorder for the gesture controller: every classified frame is logged
+with its timestamp, a downsampled copy of the ROI, the full probability
+vector and the decider state, and every command attempt is logged with its
+outcome. When a user reports a missed or phantom trigger, the trace shows
+exactly what the model saw and decided.
+
+File layout (little endian):
+    [magic "GSTTRACE"][u16 version][u32 header length][JSON header]
+    records: [u8 type][u32 payload length][payload] ...
+    [u64 offset of last index block][magic "GSTTREND"]   (written on close)
+
+An INDEX record is written every INDEX_INTERVAL frames, listing
+(frame, timestamp, offset) for those frames and the offset of the previous
+index block, so a reader can seek without scanning. A trace cut short by a
+crash has no footer; the reader then rebuilds the index with one linear scan.
+
+Replay runs the log at full speed through preprocessing, inference + decision,
+or the decision logic alone:
+    python session_trace.py session.trace --stage decision --threshold 80 --hold 0.3
+    python session_trace.py session.trace --stage inference --model gesture_model_v2.gmb
+    python session_trace.py session.trace --info
+"""
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+TRACE_MAGIC = b"GSTTRACE"
+TRACE_END = b"GSTTREND"
+TRACE_VERSION = 1
+INDEX_INTERVAL = 256   # Frames between index blocks
+ROI_JPEG_QUALITY = 90
+
+PREAMBLE = struct.Struct("<8sHI")        # magic, version, header length
+RECORD = struct.Struct("<BI")            # type, payload length
+FOOTER = struct.Struct("<Q8s")           # last index offset, end magic
+FRAME = struct.Struct("<Id")             # frame number, timestamp
+STATE = struct.Struct("<bbbBfff")        # current, stable, last detected, playing, held, since command, since volume
+COMMAND = struct.Struct("<IdB")          # frame number, timestamp, delivered
+INDEX_HEAD = struct.Struct("<QI")        # previous index offset, entry count
+INDEX_ENTRY = struct.Struct("<Idq")      # frame number, timestamp, record offset
+
+RECORD_FRAME = 1
+RECORD_COMMAND = 2
+RECORD_INDEX = 3
+
+ROI_RAW = "raw"
+ROI_JPEG = "jpeg"
+
+
+class TraceError(Exception):
+    """Raised for files that are not traces or are corrupt"""
+
+
+class FrameRecord:
+    __slots__ = ("frame", "timestamp", "state", "probs", "roi_data", "offset")
+
+    def __init__(self, frame, timestamp, state, probs, roi_data, offset):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.state = state
+        self.probs = probs
+        self.roi_data = roi_data
+        self.offset = offset
+
+
+class CommandRecord:
+    __slots__ = ("frame", "timestamp", "gesture", "delivered")
+
+    def __init__(self, frame, timestamp, gesture, delivered):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.gesture = gesture
+        self.delivered = delivered
+
+
+# ==================== RECORDING ====================
+class TraceWriter:
+    """Append-only trace writer; cheap enough to leave on in the frame loop"""
+
+    def __init__(self, path, classes, img_size, preprocessing, roi_size=None,
+                 roi_format=ROI_JPEG, decider=None, extra=None):
+        self.path = path
+        self.classes = list(classes)
+        self.roi_size = roi_size or img_size
+        self.roi_format = roi_format
+        header = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "classes": self.classes,
+            "img_size": img_size,
+            "preprocessing": preprocessing,
+            "roi_size": self.roi_size,
+            "roi_format": roi_format,
+            "decider": decider_config(decider) if decider is not None else None,
+        }
+        if extra:
+            header.update(extra)
+        encoded = json.dumps(header).encode("utf-8")
+        self.file = open(path, "wb", buffering=1 << 20)
+        self.file.write(PREAMBLE.pack(TRACE_MAGIC, TRACE_VERSION, len(encoded)))
+        self.file.write(encoded)
+        self.offset = PREAMBLE.size + len(encoded)
+        self.frames = 0
+        self.pending_index = []
+        self.last_index = 0
+
+    def _write(self, record_type, payload):
+        self.file.write(RECORD.pack(record_type, len(payload)))
+        self.file.write(payload)
+        offset = self.offset
+        self.offset += RECORD.size + len(payload)
+        return offset
+
+    def encode_roi(self, roi):
+        import cv2
+        small = cv2.resize(roi, (self.roi_size, self.roi_size), interpolation=cv2.INTER_AREA)
+        if self.roi_format == ROI_JPEG:
+            ok, data = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, ROI_JPEG_QUALITY])
+            if ok:
+                return data.tobytes()
+        return np.ascontiguousarray(small, dtype=np.uint8).tobytes()
+
+    def frame(self, timestamp, roi, probs, decider=None):
+        """Log one classified frame (roi is the BGR crop fed to preprocessing)"""
+        state = encode_state(decider, self.classes, timestamp) if decider is not None else \
+            STATE.pack(-1, -1, -1, 0, -1.0, -1.0, -1.0)
+        roi_data = self.encode_roi(roi) if roi is not None else b""
+        payload = b"".join([
+            FRAME.pack(self.frames, timestamp),
+            state,
+            np.asarray(probs, dtype=np.float32).tobytes(),
+            roi_data,
+        ])
+        offset = self._write(RECORD_FRAME, payload)
+        self.pending_index.append((self.frames, timestamp, offset))
+        self.frames += 1
+        if len(self.pending_index) >= INDEX_INTERVAL:
+            self._write_index()
+
+    def command(self, timestamp, gesture, delivered):
+        """Log one command attempt; it belongs to the frame logged next (decide, then frame())"""
+        payload = COMMAND.pack(self.frames, timestamp, 1 if delivered else 0) + \
+            gesture.encode("utf-8")
+        self._write(RECORD_COMMAND, payload)
+
+    def _write_index(self):
+        if not self.pending_index:
+            return
+        payload = INDEX_HEAD.pack(self.last_index, len(self.pending_index)) + \
+            b"".join(INDEX_ENTRY.pack(*entry) for entry in self.pending_index)
+        self.last_index = self._write(RECORD_INDEX, payload)
+        self.pending_index = []
+
+    def close(self):
+        if self.file.closed:
+            return
+        self._write_index()
+        self.file.write(FOOTER.pack(self.last_index, TRACE_END))
+        self.file.close()
+
+
+def decider_config(decider):
+    return {
+        "confidence_threshold": decider.confidence_threshold,
+        "hold_time": decider.hold_time,
+        "command_cooldown": decider.command_cooldown,
+        "volume_interval": decider.volume_interval,
+        "class_config": decider.class_config,
+    }
+
+
+def encode_state(decider, classes, now):
+    def index(gesture):
+        return classes.index(gesture) if gesture in classes else -1
+
+    def since(moment):
+        return float(now - moment) if moment else -1.0
+
+    held = float(now - decider.gesture_start_time) if decider.gesture_start_time is not None else -1.0
+    return STATE.pack(index(decider.current_gesture), index(decider.stable_gesture),
+                      index(decider.last_detected_gesture), 1 if decider.is_playing else 0,
+                      held, since(decider.last_command_time), since(decider.last_volume_change_time))
+
+
+def traced_sender(trace, send):
+    """Wrap a send(gesture) -> bool callable so every attempt lands in the trace"""
+    def wrapped(gesture):
+        delivered = send(gesture)
+        trace.command(time.time(), gesture, delivered)
+        return delivered
+    return wrapped
+
+
+# ==================== READING ====================
+class TraceReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        magic, version, header_length = PREAMBLE.unpack(self._read_exact(PREAMBLE.size))
+        if magic != TRACE_MAGIC:
+            raise TraceError(f"{path} is not a session trace")
+        if version > TRACE_VERSION:
+            raise TraceError(f"{path} is trace format v{version}, this reader handles v{TRACE_VERSION}")
+        self.header = json.loads(self._read_exact(header_length).decode("utf-8"))
+        self.data_start = PREAMBLE.size + header_length
+        self.classes = self.header["classes"]
+        self.num_classes = len(self.classes)
+        self.complete = False
+        self.index = self._load_index()
+
+    def _read_exact(self, size):
+        data = self.file.read(size)
+        if len(data) != size:
+            raise TraceError(f"{self.path} is truncated")
+        return data
+
+    def _load_index(self):
+        """[(frame, timestamp, offset)] from the index chain, or a linear scan for unfinished traces"""
+        size = os.path.getsize(self.path)
+        if size >= self.data_start + FOOTER.size:
+            self.file.seek(size - FOOTER.size)
+            last_index, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+            if magic == TRACE_END:
+                self.complete = True
+                self.end = size - FOOTER.size
+                blocks = []
+                offset = last_index
+                while offset:
+                    self.file.seek(offset)
+                    record_type, length = RECORD.unpack(self._read_exact(RECORD.size))
+                    if record_type != RECORD_INDEX:
+                        raise TraceError(f"{self.path} has a broken index chain")
+                    payload = self._read_exact(length)
+                    previous, count = INDEX_HEAD.unpack_from(payload)
+                    blocks.append([INDEX_ENTRY.unpack_from(payload, INDEX_HEAD.size + i * INDEX_ENTRY.size)
+                                   for i in range(count)])
+                    offset = previous
+                return [entry for block in reversed(blocks) for entry in block]
+
+        self.end = size
+        return [(record.frame, record.timestamp, record.offset)
+                for record in self.records() if isinstance(record, FrameRecord)]
+
+    def records(self, start_offset=None):
+        """Yield FrameRecord / CommandRecord objects from start_offset (default: beginning)"""
+        offset = self.data_start if start_offset is None else start_offset
+        self.file.seek(offset)
+        while offset + RECORD.size <= self.end:
+            header = self.file.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            record_type, length = RECORD.unpack(header)
+            payload = self.file.read(length)
+            if len(payload) < length:
+                return  # trace cut off mid-record
+            if record_type == RECORD_FRAME:
+                yield self._decode_frame(payload, offset)
+            elif record_type == RECORD_COMMAND:
+                frame, timestamp, delivered = COMMAND.unpack_from(payload)
+                yield CommandRecord(frame, timestamp, payload[COMMAND.size:].decode("utf-8"), bool(delivered))
+            offset += RECORD.size + length
+
+    def _decode_frame(self, payload, offset):
+        frame, timestamp = FRAME.unpack_from(payload)
+        state = STATE.unpack_from(payload, FRAME.size)
+        start = FRAME.size + STATE.size
+        probs = np.frombuffer(payload, dtype=np.float32, count=self.num_classes, offset=start)
+        return FrameRecord(frame, timestamp, state, probs, payload[start + 4 * self.num_classes:], offset)
+
+    def seek_time(self, timestamp):
+        """Offset of the first frame at or after timestamp (binary search over the index)"""
+        times = [entry[1] for entry in self.index]
+        position = int(np.searchsorted(times, timestamp))
+        if position >= len(self.index):
+            return self.end
+        return self.index[position][2]
+
+    def frames(self, start_time=None, end_time=None):
+        start = self.seek_time(start_time) if start_time is not None else None
+        for record in self.records(start):
+            if isinstance(record, FrameRecord):
+                if end_time is not None and record.timestamp > end_time:
+                    return
+                yield record
+
+    def commands(self):
+        return [record for record in self.records() if isinstance(record, CommandRecord)]
+
+    def decode_roi(self, record):
+        size = self.header["roi_size"]
+        if not record.roi_data:
+            return None
+        if self.header["roi_format"] == ROI_JPEG:
+            import cv2
+            return cv2.imdecode(np.frombuffer(record.roi_data, np.uint8), cv2.IMREAD_COLOR)
+        return np.frombuffer(record.roi_data, np.uint8).reshape(size, size, 3)
+
+    def close(self):
+        self.file.close()
+
+
+# ==================== REPLAY ====================
+def replay_decisions(frames, classes, decider):
+    """Run recorded (timestamp, probs) through a decider; returns [(frame, timestamp, gesture)]"""
+    issued = []
+    for number, timestamp, probs in frames:
+        index = int(np.argmax(probs))
+        sent = decider.update(classes[index], float(probs[index]) * 100,
+                              lambda gesture: True, timestamp)
+        if sent:
+            issued.append((number, timestamp, sent))
+    return issued
+
+
+def replay_preprocessing(reader, start_time=None, end_time=None):
+    """ROI -> model tensor for every frame; yields (record, tensor)"""
+    from model_bundle import preprocess_roi
+    img_size = reader.header["img_size"]
+    preprocessing = reader.header["preprocessing"]
+    for record in reader.frames(start_time, end_time):
+        roi = reader.decode_roi(record)
+        if roi is not None:
+            yield record, preprocess_roi(roi, img_size, preprocessing)
+
+
+def replay_inference(reader, backend, batch_size=32, start_time=None, end_time=None):
+    """Re-classify the recorded ROIs in batches; returns [(frame, timestamp, new probs, recorded probs)]"""
+    results = []
+    pending = []
+
+    def flush():
+        probs = backend.predict(np.concatenate([tensor for _, tensor in pending]))
+        for (record, _), p in zip(pending, probs):
+            results.append((record.frame, record.timestamp, p, record.probs))
+        del pending[:]
+
+    for item in replay_preprocessing(reader, start_time, end_time):
+        pending.append(item)
+        if len(pending) == batch_size:
+            flush()
+    if pending:
+        flush()
+    return results
+
+
+def compare_commands(recorded, replayed, tolerance=1):
+    """Match commands by gesture and frame (within tolerance frames); returns (missing, extra)"""
+    unmatched = list(replayed)
+    missing = []
+    for frame, timestamp, gesture in recorded:
+        match = next((item for item in unmatched
+                      if item[2] == gesture and abs(item[0] - frame) <= tolerance), None)
+        if match is None:
+            missing.append((frame, timestamp, gesture))
+        else:
+            unmatched.remove(match)
+    return missing, unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay a session trace")
+    parser.add_argument("trace")
+    parser.add_argument("--info", action="store_true", help="print header and summary only")
+    parser.add_argument("--stage", choices=["preprocess", "inference", "decision"], default="decision",
+                        help="preprocess: ROI -> tensor only; inference: re-run the model then decide; "
+                             "decision: recorded probabilities through the decider")
+    parser.add_argument("--start", type=float, default=None, help="seconds from trace start")
+    parser.add_argument("--end", type=float, default=None, help="seconds from trace start")
+    parser.add_argument("--threshold", type=float, default=None, help="override confidence threshold (%%)")
+    parser.add_argument("--hold", type=float, default=None, help="override hold time (s)")
+    parser.add_argument("--cooldown", type=float, default=None, help="override command cooldown (s)")
+    parser.add_argument("--volume-interval", type=float, default=None)
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--model", default=None, help="model for --stage inference")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    reader = TraceReader(args.trace)
+    if not reader.index:
+        print("❌ ERROR: Trace contains no frames")
+        exit(1)
+    t0 = reader.index[0][1]
+    start_time = t0 + args.start if args.start is not None else None
+    end_time = t0 + args.end if args.end is not None else None
+    duration = reader.index[-1][1] - t0
+    in_range = [frame for frame, timestamp, _ in reader.index
+                if (start_time is None or timestamp >= start_time) and (end_time is None or timestamp <= end_time)]
+    first_frame, last_frame = (in_range[0], in_range[-1]) if in_range else (0, -1)
+    # Motion gestures (temporal head) are not decided from per-frame probabilities
+    recorded = [(c.frame, c.timestamp, c.gesture) for c in reader.commands()
+                if c.delivered and first_frame <= c.frame <= last_frame and c.gesture in reader.header["classes"]]
+
+    print("=" * 60)
+    print(f"TRACE {args.trace}")
+    print("=" * 60)
+    print(f"Frames: {len(reader.index)} over {duration:.1f}s | Commands: {len(recorded)} | "
+          f"{'complete' if reader.complete else 'unfinished (index rebuilt by scan)'}")
+    print(f"Classes: {reader.classes} | ROI {reader.header['roi_size']}px {reader.header['roi_format']}")
+    if args.info:
+        print(json.dumps(reader.header, indent=2))
+        for frame, timestamp, gesture in recorded:
+            print(f"  {timestamp - t0:8.3f}s  frame {frame:6d}  {gesture}")
+        return
+
+    from gesture_decider import GestureDecider
+    config = dict(reader.header.get("decider") or {})
+    overrides = {"confidence_threshold": args.threshold, "hold_time": args.hold,
+                 "command_cooldown": args.cooldown, "volume_interval": args.volume_interval}
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    decider = GestureDecider(**config)
+
+    start = time.perf_counter()
+    if args.stage == "preprocess":
+        count = sum(1 for _ in replay_preprocessing(reader, start_time, end_time))
+        elapsed = time.perf_counter() - start
+        print(f"\nPreprocessed {count} ROIs in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f}/s, "
+              f"{duration / max(elapsed, 1e-9):.0f}x real time)")
+        return
+
+    if args.stage == "inference":
+        from inference_backends import create_backend
+        backend = create_backend(args.backend, args.model, max_batch=args.batch_size)
+        if backend.classes != reader.classes:
+            print(f"⚠ Model classes {backend.classes} differ from trace classes {reader.classes}")
+        results = replay_inference(reader, backend, args.batch_size, start_time, end_time)
+        backend.close()
+        new = np.array([r[2] for r in results])
+        old = np.array([r[3] for r in results])
+        print(f"\nRe-inferred {len(results)} frames | max |Δp| {np.abs(new - old).max():.4f} | "
+              f"top-1 agreement {np.mean(new.argmax(1) == old.argmax(1)) * 100:.1f}%")
+        frames = [(r[0], r[1], r[2]) for r in results]
+    else:
+        frames = [(r.frame, r.timestamp, r.probs) for r in reader.frames(start_time, end_time)]
+
+    replayed = replay_decisions(frames, reader.classes, decider)
+    elapsed = time.perf_counter() - start
+    missing, extra = compare_commands(recorded, replayed)
+
+    print(f"Decider: {config}")
+    print(f"Replayed {len(frames)} frames in {elapsed:.2f}s ({duration / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"Commands: recorded {len(recorded)} | replayed {len(replayed)} | "
+          f"missing {len(missing)} | extra {len(extra)}")
+    for frame, timestamp, gesture in missing:
+        print(f"  - {timestamp - t0:8.3f}s  frame {frame:6d}  {gesture}  (recorded, not replayed)")
+    for frame, timestamp, gesture in extra:
+        print(f"  + {timestamp - t0:8.3f}s  frame {frame:6d}  {gesture}  (replayed, not recorded)")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
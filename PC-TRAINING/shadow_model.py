@@ -0,0 +1,248 @@
+"""
+Shadow-Model Evaluation
+
+Runs a candidate model next to the live one on a sample of real frames,
+before it is rolled out. The candidate never actuates: the frame loop hands
+a sampled, already preprocessed batch and the primary's probabilities to a
+worker thread and carries on; the worker runs the candidate and compares.
+
+Logged every REPORT_INTERVAL seconds (and at exit) to the console and as one
+JSON line in SHADOW_LOG:
+- agreement: same top class as the primary, on all sampled frames and on the
+  frames where the primary was confident enough to actuate (the decider's
+  per-class thresholds)
+- per-class disagreement: for each class the primary predicted, how often
+  the candidate said something else and what it said instead
+- latency: candidate vs primary invoke time on the same frames
+
+The primary loop's FPS is protected three ways: the candidate runs with
+SHADOW_THREADS interpreter threads, at most one batch is in flight (a frame
+sampled while the worker is busy is skipped, never queued), and after each
+invoke the worker rests long enough that it uses at most CPU_SHARE of one
+core. The rest is scaled by the thread count, since an invoke on N threads
+can keep N cores busy for its duration. The candidate loads on the worker
+thread too, so startup is not slower.
+
+    python3 media_control_mpv.py --shadow gesture_model_v2.gmb --shadow-fraction 0.2
+    python3 runtime_control.py shadow                      # live report
+"""
+import collections
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+from hot_swap import check_same_input
+
+SHADOW_FRACTION = 0.2     # Fraction of frames offered to the candidate
+CPU_SHARE = 0.25          # Hard cap: fraction of one core the shadow worker may keep busy
+SHADOW_THREADS = 1        # Interpreter threads for the candidate
+ACTUATION_CONFIDENCE = 90.0  # Primary confidence (%) at which a frame could trigger a command
+REPORT_INTERVAL = 60.0    # Seconds between logged reports
+SHADOW_LOG = 'shadow_log.jsonl'
+LATENCY_WINDOW = 1000     # Recent invokes kept for the latency percentiles
+
+
+def _percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+
+class ShadowEvaluator:
+    """Compares a candidate backend with the primary on sampled frames, on a CPU-capped worker thread"""
+
+    def __init__(self, factory, primary, fraction=SHADOW_FRACTION, cpu_share=CPU_SHARE, threads=SHADOW_THREADS,
+                 threshold_for=None, log_path=SHADOW_LOG, report_interval=REPORT_INTERVAL, seed=None):
+        """
+        factory() -> candidate backend with `threads` interpreter threads; called on the worker thread.
+        threshold_for(class) -> confidence % needed to actuate (GestureDecider.threshold_for).
+        """
+        if not 0.0 < fraction <= 1.0 or not 0.0 < cpu_share <= 1.0:
+            raise ValueError(f"shadow fraction and CPU share must be in (0, 1], got {fraction} and {cpu_share}")
+        self.factory = factory
+        self.classes = list(primary.classes)
+        self.primary = primary
+        self.fraction = fraction
+        self.cpu_share = cpu_share
+        self.threads = max(1, threads or 1)
+        self.threshold_for = threshold_for or (lambda gesture: ACTUATION_CONFIDENCE)
+        self.log_path = log_path
+        self.report_interval = report_interval
+        self.candidate = None
+        self.error = None
+        self.random = random.Random(seed)  # Random, not every n-th frame, so periodic motion is not aliased
+        self.job = None
+        self.busy = True          # Until the candidate is loaded nothing is handed over
+        self.frames = 0
+        self.skipped = 0          # Sampled while the worker was busy or resting (CPU cap)
+        self.evaluated = 0
+        self.agree = 0
+        self.confident = 0
+        self.confident_agree = 0
+        self.per_class = {name: collections.Counter() for name in self.classes}  # primary -> candidate counts
+        self.primary_times = collections.deque(maxlen=LATENCY_WINDOW)
+        self.shadow_times = collections.deque(maxlen=LATENCY_WINDOW)
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()  # Counters are read by report() on the control thread
+        self.start_time = time.time()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='shadow-model', daemon=True)
+        self.thread.start()
+
+    # ---------- frame loop ----------
+    def offer(self, batch, probs, primary_seconds):
+        """Hand a sampled frame to the worker; never blocks. batch must not be modified afterwards"""
+        self.frames += 1
+        if self.random.random() >= self.fraction:
+            return False
+        if self.busy:
+            self.skipped += 1
+            return False
+        self.busy = True
+        self.job = (batch, np.array(probs), primary_seconds)
+        self.ready.set()
+        return True
+
+    # ---------- worker ----------
+    def _run(self):
+        try:
+            self.candidate = self.factory()
+            self.candidate.warm_up()
+            check_same_input(self.candidate, self.primary)
+        except Exception as e:
+            # Whatever the loader raises, the primary keeps running without a shadow
+            self.error = str(e)
+            print(f"⚠ Shadow model disabled: {e}")
+            return
+        print(f"✓ Shadow model: {self.candidate.describe()} on {self.fraction:.0%} of frames, "
+              f"≤{self.cpu_share:.0%} of one core")
+        self.busy = False
+        last_report = time.time()
+        while not self.stopped.is_set():
+            if self.ready.wait(1.0):
+                self.ready.clear()
+                batch, probs, primary_seconds = self.job
+                self.job = None
+                start = time.perf_counter()
+                try:
+                    shadow_probs = self.candidate.predict(batch)
+                except Exception as e:
+                    self.error = f"predict failed: {e}"
+                    print(f"⚠ Shadow model disabled: {self.error}")
+                    return
+                shadow_seconds = time.perf_counter() - start
+                self._compare(probs, np.asarray(shadow_probs), primary_seconds, shadow_seconds)
+                busy = time.perf_counter() - start
+                self.busy_seconds += busy
+                # Duty cycle: while busy up to `threads` cores run the invoke, so rest until
+                # threads * busy core-seconds are at most cpu_share of the time elapsed
+                self.stopped.wait(busy * (self.threads / self.cpu_share - 1.0))
+                self.busy = False
+            if time.time() - last_report >= self.report_interval:
+                last_report = time.time()
+                self.log()
+
+    def _compare(self, probs, shadow_probs, primary_seconds, shadow_seconds):
+        candidate_classes = self.candidate.classes
+        with self.lock:
+            self._count(probs, shadow_probs, candidate_classes)
+            self.primary_times.append(primary_seconds)
+            self.shadow_times.append(shadow_seconds)
+
+    def _count(self, probs, shadow_probs, candidate_classes):
+        for row, shadow_row in zip(probs, shadow_probs):
+            index = int(np.argmax(row))
+            primary_name = self.classes[index]
+            shadow_name = candidate_classes[int(np.argmax(shadow_row))]
+            self.evaluated += 1
+            self.per_class[primary_name][shadow_name] += 1
+            if shadow_name == primary_name:
+                self.agree += 1
+            if row[index] * 100 >= self.threshold_for(primary_name):
+                self.confident += 1
+                self.confident_agree += shadow_name == primary_name
+
+    # ---------- reporting ----------
+    def report(self):
+        with self.lock:
+            return self._report()
+
+    def _report(self):
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        per_class = {}
+        for name, counts in self.per_class.items():
+            total = sum(counts.values())
+            if not total:
+                continue
+            others = {other: count for other, count in counts.most_common() if other != name}
+            per_class[name] = {'frames': total, 'disagreement': round(sum(others.values()) / total, 4),
+                               'as': others}
+        primary_p50 = _percentile_ms(list(self.primary_times), 50)
+        shadow_p50 = _percentile_ms(list(self.shadow_times), 50)
+        return {'model': self.candidate.model_path if self.candidate else None, 'error': self.error,
+                'frames': self.frames, 'evaluated': self.evaluated, 'skipped': self.skipped,
+                'agreement': round(self.agree / self.evaluated, 4) if self.evaluated else None,
+                'confident_frames': self.confident,
+                'confident_agreement': round(self.confident_agree / self.confident, 4) if self.confident else None,
+                'per_class': per_class,
+                'primary_p50_ms': primary_p50, 'primary_p95_ms': _percentile_ms(list(self.primary_times), 95),
+                'shadow_p50_ms': shadow_p50, 'shadow_p95_ms': _percentile_ms(list(self.shadow_times), 95),
+                'latency_ratio': round(shadow_p50 / primary_p50, 2) if shadow_p50 and primary_p50 else None,
+                'cpu_share': round(self.busy_seconds * self.threads / elapsed, 3)}  # Upper bound, in cores
+
+    def log(self):
+        """Print the report and append it to the log file"""
+        report = self.report()
+        print_shadow_report(report)
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(dict(report, time=round(time.time(), 3))) + "\n")
+            except OSError as e:
+                print(f"⚠ Shadow log {self.log_path}: {e}")
+        return report
+
+    def handle_command(self, message):
+        """runtime_control.py handler: the current report"""
+        return self.report()
+
+    def close(self):
+        self.stopped.set()
+        self.ready.set()
+        self.thread.join(timeout=5.0)
+        if self.candidate is not None:
+            if self.evaluated:
+                self.log()
+            self.candidate.close()
+
+
+def print_shadow_report(report):
+    if report['error']:
+        print(f"⚠ Shadow model: {report['error']}")
+    if not report['evaluated']:
+        print(f"⏱ Shadow {report['model']}: no frames evaluated yet")
+        return
+    confident = (f", {report['confident_agreement']:.1%} of {report['confident_frames']} actuating frames"
+                 if report['confident_frames'] else "")
+    print(f"⏱ Shadow {report['model']}: agrees on {report['agreement']:.1%} of {report['evaluated']} frames"
+          f"{confident} ({report['skipped']} skipped by the CPU cap, {report['cpu_share']:.1%} CPU)")
+    print(f"  Latency p50 {report['shadow_p50_ms']} ms vs primary {report['primary_p50_ms']} ms "
+          f"(x{report['latency_ratio']})")
+    for name, row in report['per_class'].items():
+        if row['as']:
+            instead = ", ".join(f"{other} {count}" for other, count in row['as'].items())
+            print(f"  {name:<12} {row['disagreement']:>6.1%} disagree of {row['frames']} ({instead})")
+
+
+def add_shadow_arguments(parser):
+    parser.add_argument('--shadow', default=None, metavar='MODEL',
+                        help='evaluate a candidate model on live frames next to the primary (never actuates)')
+    parser.add_argument('--shadow-fraction', type=float, default=SHADOW_FRACTION,
+                        help='fraction of frames offered to the shadow model')
+    parser.add_argument('--shadow-cpu', type=float, default=CPU_SHARE,
+                        help='hard cap on the shadow worker, as a fraction of one core')
+    parser.add_argument('--shadow-threads', type=int, default=SHADOW_THREADS,
+                        help='interpreter threads for the shadow model')
+    parser.add_argument('--shadow-log', default=SHADOW_LOG, help='JSON-lines file the shadow reports go to')
@@ -0,0 +1,70 @@
+"""
+Named Shared-Memory Buffers
+
+multiprocessing.shared_memory needs Python 3.8, but the Nano runs 3.6, so
+buffers are plain files in /dev/shm (tmpfs, i.e. RAM) mapped with mmap.
+Any process that knows the name can map the same pages and wrap them in
+NumPy views without copying.
+"""
+import mmap
+import os
+import tempfile
+
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def shm_path(name, prefix=""):
+    """File behind a buffer name; ValueError for names that could leave SHM_DIR or lack prefix"""
+    separators = [sep for sep in (os.sep, os.altsep) if sep]
+    if not isinstance(name, str) or not name or ".." in name or any(sep in name for sep in separators):
+        raise ValueError(f"invalid shared memory name {name!r}")
+    if not name.startswith(prefix):
+        raise ValueError(f"shared memory name {name!r} does not start with {prefix!r}")
+    return os.path.join(SHM_DIR, name)
+
+
+class SharedBuffer:
+    """A named, fixed-size shared-memory region"""
+
+    def __init__(self, name, size=0, create=False, prefix=""):
+        """prefix: required start of the name, for names that come from another process"""
+        self.name = name
+        self.path = shm_path(name, prefix)
+        self.owner = create
+        if create:
+            # Replace rather than truncate a leftover file: processes still mapping
+            # the old one would fault on truncated pages
+            self.unlink()
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+            try:
+                os.ftruncate(fd, size)
+                self.buffer = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        else:
+            fd = os.open(self.path, os.O_RDWR)
+            try:
+                size = os.fstat(fd).st_size
+                self.buffer = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        self.size = size
+
+    def ndarray(self, shape, dtype, offset=0):
+        """NumPy view onto the buffer (no copy)"""
+        import numpy as np
+        return np.ndarray(shape, dtype=dtype, buffer=self.buffer, offset=offset)
+
+    def close(self):
+        try:
+            self.buffer.close()
+        except BufferError:
+            # A NumPy view is still alive; the mapping goes away with it
+            pass
+
+    def unlink(self):
+        """Remove the name (creator only); existing mappings stay valid"""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,189 @@
+"""
+Split Backbone / Head Models
+
+The classifier is MobileNetV2 -> GlobalAveragePooling -> Dense(softmax). Almost
+all of the cost is the backbone, so the converters also export it on its own
+(gesture_backbone.gmb, outputs the pooled 1280-d embedding) and the Dense layer
+as a tiny NumPy head (gesture_head.npz). At runtime one backbone pass per frame
+feeds an EmbeddingRing, and any number of heads (gesture classifier, rejection,
+analytics, temporal) run on the cached embeddings for a few microseconds each.
+A retrained head can be dropped in without touching the backbone.
+
+Head file (.npz): weights (dim, classes), bias (classes,) and a JSON metadata
+string with classes, activation, calibration and the embedding size.
+
+Inspect files:
+    python split_model.py gesture_backbone.gmb gesture_head.npz
+"""
+import json
+import os
+
+import numpy as np
+
+from calibration import apply_calibration, softmax
+
+BACKBONE_FILE = "gesture_backbone.gmb"
+HEAD_FILE = "gesture_head.npz"
+HEAD_FORMAT_VERSION = 1
+RING_SIZE = 64  # Embeddings kept per runtime (about 2 s at 30 FPS)
+
+
+class HeadError(Exception):
+    """Raised when a head file is malformed or does not fit the backbone"""
+
+
+# ==================== HEADS ====================
+class Head:
+    """Dense layer over embeddings: probs = activation(embeddings @ weights + bias)"""
+
+    def __init__(self, weights, bias, classes, activation="softmax", calibration=None,
+                 path=None, metadata=None):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.classes = list(classes)
+        self.activation = activation
+        self.calibration = calibration
+        self.path = path
+        self.metadata = metadata or {}
+        if self.weights.shape[1] != len(self.classes) or self.bias.shape != (len(self.classes),):
+            raise HeadError(f"head outputs {self.weights.shape[1]} values for {len(self.classes)} classes")
+
+    @property
+    def embedding_dim(self):
+        return self.weights.shape[0]
+
+    def predict(self, embeddings, calibrated=True):
+        logits = np.dot(embeddings, self.weights) + self.bias
+        if self.activation == "sigmoid":
+            return 1.0 / (1.0 + np.exp(-logits))
+        probs = softmax(logits)
+        return apply_calibration(probs, self.calibration) if calibrated else probs
+
+
+def write_head(path, weights, bias, classes, activation="softmax", calibration=None, extra=None):
+    """Save a head as .npz (written to a temp file, then renamed)"""
+    metadata = {
+        "format_version": HEAD_FORMAT_VERSION,
+        "classes": list(classes),
+        "activation": activation,
+        "embedding_dim": int(np.shape(weights)[0]),
+        "calibration": calibration,
+    }
+    if extra:
+        metadata.update(extra)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, weights=np.asarray(weights, dtype=np.float32),
+             bias=np.asarray(bias, dtype=np.float32), metadata=np.array(json.dumps(metadata)))
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def load_head(path):
+    try:
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            weights, bias = data["weights"], data["bias"]
+    except (OSError, KeyError, ValueError) as e:
+        raise HeadError(f"cannot read head {path}: {e}")
+    if metadata.get("format_version", 0) > HEAD_FORMAT_VERSION:
+        raise HeadError(f"{path} uses head format v{metadata['format_version']}, "
+                        f"this runtime reads v{HEAD_FORMAT_VERSION}")
+    return Head(weights, bias, metadata["classes"], metadata.get("activation", "softmax"),
+                metadata.get("calibration"), path, metadata)
+
+
+# ==================== EMBEDDING RING ====================
+class EmbeddingRing:
+    """
+    Fixed-size history of per-frame embeddings. Slots are preallocated, so
+    pushing a frame is one row copy; frame numbers keep counting across wraps.
+    """
+
+    def __init__(self, dim, capacity=RING_SIZE):
+        self.dim = dim
+        self.capacity = capacity
+        self.embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.count = 0  # Frames pushed so far; the newest is frame count - 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def push(self, embeddings, timestamp):
+        """Append a batch of embeddings; returns the frame number of the first one"""
+        first = self.count
+        for row in np.asarray(embeddings).reshape(-1, self.dim):
+            slot = self.count % self.capacity
+            self.embeddings[slot] = row
+            self.timestamps[slot] = timestamp
+            self.count += 1
+        return first
+
+    def frame(self, number):
+        """Embedding of one frame (None once it has been overwritten)"""
+        if number < 0 or number >= self.count or number < self.count - self.capacity:
+            return None
+        return self.embeddings[number % self.capacity]
+
+    def latest(self, n=1):
+        """Last n embeddings, oldest first, as a (n, dim) copy (fewer at startup)"""
+        n = min(n, len(self))
+        slots = np.arange(self.count - n, self.count) % self.capacity
+        return self.embeddings[slots]
+
+    def latest_timestamps(self, n=1):
+        n = min(n, len(self))
+        return self.timestamps[np.arange(self.count - n, self.count) % self.capacity]
+
+
+# ==================== EXPORT ====================
+def split_keras_model(model):
+    """
+    (backbone, dense layer) of a trained classifier: the backbone returns the
+    input of the final Dense layer, i.e. the pooled embedding.
+    """
+    import tensorflow as tf
+    head = model.layers[-1]
+    if not isinstance(head, tf.keras.layers.Dense):
+        raise HeadError(f"last layer is {type(head).__name__}, expected Dense")
+    backbone = tf.keras.Model(inputs=model.inputs, outputs=head.input, name="gesture_backbone")
+    return backbone, head
+
+
+def export_split(model, convert, classes, img_size, calibration=None, backbone_path=BACKBONE_FILE,
+                 head_path=HEAD_FILE, model_version="v1.0"):
+    """
+    Write the backbone bundle and the NumPy head for a trained Keras model.
+    convert(keras_model) -> TFLite bytes, so each converter keeps its own settings.
+    Returns the backbone bundle metadata.
+    """
+    from model_bundle import write_bundle
+    backbone, dense = split_keras_model(model)
+    weights, bias = dense.get_weights()
+    activation = dense.get_config().get("activation", "softmax")
+    write_head(head_path, weights, bias, classes, activation, calibration,
+               extra={"backbone": os.path.basename(backbone_path), "model_version": model_version})
+    # Classes stay in the backbone metadata so every runtime can still read them from the bundle
+    return write_bundle(backbone_path, convert(backbone), classes, img_size, model_version=model_version,
+                        extra={"embedding": {"dim": int(weights.shape[0]),
+                                             "head": os.path.basename(head_path)}})
+
+
+def default_head_path(backbone_path, metadata):
+    """Head named in the backbone metadata, next to the backbone"""
+    head_name = (metadata.get("embedding") or {}).get("head") or HEAD_FILE
+    return os.path.join(os.path.dirname(os.path.abspath(backbone_path)), head_name)
+
+
+if __name__ == "__main__":
+    import sys
+    from model_bundle import is_bundle, load_bundle
+    for path in sys.argv[1:]:
+        if is_bundle(path):
+            bundle = load_bundle(path)
+            print(f"✓ {path}: backbone, embedding {bundle.metadata.get('embedding')}")
+            bundle.close()
+        else:
+            head = load_head(path)
+            print(f"✓ {path}: head {head.embedding_dim} -> {head.classes} ({head.activation}, "
+                  f"calibration: {(head.calibration or {}).get('method', 'none')})")
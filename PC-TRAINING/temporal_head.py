@@ -0,0 +1,134 @@
+"""
+Temporal Gesture Head (dynamic gestures)
+
+Swipes cannot be recognised from one frame, but the split runtime already
+keeps the backbone embedding of every recent frame (split_model.EmbeddingRing).
+This head classifies the last WINDOW_SECONDS of those embeddings:
+
+    per-frame Dense(PROJECTION_DIM, relu) -> Conv1D(FILTERS, KERNEL, relu)
+    -> global max pool over time -> Dense(classes, softmax)
+
+The window is resampled to WINDOW_STEPS evenly spaced instants by timestamp, so
+the same head works at 10 or 30 FPS. It runs in NumPy on top of the existing
+inference: about 0.5 M multiply-adds per frame against ~100 M for MobileNetV2.
+
+Trained by train_temporal.py from clips recorded with collect_data.py ('c').
+"""
+import json
+import os
+
+import numpy as np
+
+from calibration import apply_calibration, softmax
+
+TEMPORAL_HEAD_FILE = "gesture_temporal.npz"
+HEAD_FORMAT_VERSION = 1
+WINDOW_STEPS = 12       # Embeddings per window after resampling
+WINDOW_SECONDS = 1.2    # Time span a window covers
+NONE_CLASS = "none"     # Background class (no motion gesture)
+
+
+class TemporalHeadError(Exception):
+    """Raised when a temporal head file is malformed or does not fit the backbone"""
+
+
+def resample_window(embeddings, timestamps, end_time=None, steps=WINDOW_STEPS, duration=WINDOW_SECONDS):
+    """
+    (steps, dim) window of the frames seen at evenly spaced instants ending at
+    end_time (latest frame at or before each instant). Returns None if the
+    history does not cover the window yet.
+    """
+    timestamps = np.asarray(timestamps)
+    if len(timestamps) == 0:
+        return None
+    end_time = timestamps[-1] if end_time is None else end_time
+    targets = np.linspace(end_time - duration, end_time, steps)
+    if targets[0] < timestamps[0]:
+        return None
+    indices = np.searchsorted(timestamps, targets + 1e-6, side="right") - 1  # Tolerate float rounding
+    return np.asarray(embeddings)[indices]
+
+
+class TemporalHead:
+    """NumPy forward pass of the temporal head; predict() takes (batch, steps, dim) windows"""
+
+    def __init__(self, layers, classes, steps=WINDOW_STEPS, duration=WINDOW_SECONDS,
+                 calibration=None, path=None, metadata=None):
+        self.projection_w = np.asarray(layers["projection_w"], dtype=np.float32)
+        self.projection_b = np.asarray(layers["projection_b"], dtype=np.float32)
+        self.conv_w = np.asarray(layers["conv_w"], dtype=np.float32)  # (kernel, in, filters)
+        self.conv_b = np.asarray(layers["conv_b"], dtype=np.float32)
+        self.output_w = np.asarray(layers["output_w"], dtype=np.float32)
+        self.output_b = np.asarray(layers["output_b"], dtype=np.float32)
+        self.classes = list(classes)
+        self.steps = steps
+        self.duration = duration
+        self.calibration = calibration
+        self.path = path
+        self.metadata = metadata or {}
+        if self.output_w.shape[1] != len(self.classes):
+            raise TemporalHeadError(f"head outputs {self.output_w.shape[1]} values "
+                                    f"for {len(self.classes)} classes")
+        if steps < self.conv_w.shape[0]:
+            raise TemporalHeadError(f"window of {steps} steps is shorter than the kernel")
+
+    @property
+    def embedding_dim(self):
+        return self.projection_w.shape[0]
+
+    def predict(self, windows, calibrated=True):
+        windows = np.asarray(windows, dtype=np.float32)
+        hidden = np.maximum(np.dot(windows, self.projection_w) + self.projection_b, 0.0)
+        kernel = self.conv_w.shape[0]
+        length = hidden.shape[1] - kernel + 1
+        conv = self.conv_b + sum(np.dot(hidden[:, k:k + length], self.conv_w[k]) for k in range(kernel))
+        pooled = np.maximum(conv, 0.0).max(axis=1)
+        probs = softmax(np.dot(pooled, self.output_w) + self.output_b)
+        return apply_calibration(probs, self.calibration) if calibrated else probs
+
+    def predict_ring(self, ring, end_time=None):
+        """Probabilities for the window ending at the newest embedding (None until the ring covers it)"""
+        window = resample_window(ring.latest(ring.capacity), ring.latest_timestamps(ring.capacity),
+                                 end_time, self.steps, self.duration)
+        if window is None:
+            return None
+        return self.predict(window[np.newaxis])[0]
+
+
+def write_temporal_head(path, layers, classes, steps=WINDOW_STEPS, duration=WINDOW_SECONDS,
+                        calibration=None, extra=None):
+    metadata = {
+        "format_version": HEAD_FORMAT_VERSION,
+        "kind": "temporal",
+        "classes": list(classes),
+        "steps": steps,
+        "duration": duration,
+        "embedding_dim": int(np.shape(layers["projection_w"])[0]),
+        "calibration": calibration,
+    }
+    if extra:
+        metadata.update(extra)
+    arrays = {name: np.asarray(value, dtype=np.float32) for name, value in layers.items()}
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def load_temporal_head(path):
+    try:
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            layers = {name: data[name] for name in data.files if name != "metadata"}
+    except (OSError, KeyError, ValueError) as e:
+        raise TemporalHeadError(f"cannot read temporal head {path}: {e}")
+    if metadata.get("kind") != "temporal":
+        raise TemporalHeadError(f"{path} is not a temporal head")
+    if metadata.get("format_version", 0) > HEAD_FORMAT_VERSION:
+        raise TemporalHeadError(f"{path} uses head format v{metadata['format_version']}, "
+                                f"this runtime reads v{HEAD_FORMAT_VERSION}")
+    try:
+        return TemporalHead(layers, metadata["classes"], metadata["steps"], metadata["duration"],
+                            metadata.get("calibration"), path, metadata)
+    except KeyError as e:
+        raise TemporalHeadError(f"{path} is missing {e}")
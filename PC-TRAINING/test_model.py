@@ -1,66 +1,27 @@
 import cv2
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-import os
-
-# Limit GPU memory growth to prevent OOM errors on Jetson Nano
-gpus = tf.config.experimental.list_physical_devices('GPU')
-if gpus:
-    try:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-    except RuntimeError as e:
-        print(f"GPU configuration error: {e}")
-
-# Load the trained model (with compatibility fallback)
-model = None
-
-# Try loading compatible version first
-if os.path.exists("gesture_model_jetson.h5"):
-    try:
-        model = load_model("gesture_model_jetson.h5", compile=False)
-        print("✓ Loaded gesture_model_jetson.h5")
-    except Exception as e:
-        print(f"⚠ Could not load gesture_model_jetson.h5: {e}")
-
-# Fallback to original
-if model is None and os.path.exists("gesture_model.h5"):
-    try:
-        model = load_model("gesture_model.h5", compile=False)
-        print("✓ Loaded gesture_model.h5")
-    except Exception as e:
-        print(f"⚠ Could not load gesture_model.h5: {e}")
-
-# Fallback to architecture + weights
-weights_files = ["gesture_model.weights.h5", "gesture_model_weights.h5"]
-if model is None and os.path.exists("model_architecture.json"):
-    for weights_file in weights_files:
-        if os.path.exists(weights_file):
-            try:
-                with open("model_architecture.json", 'r') as f:
-                    model = tf.keras.models.model_from_json(f.read())
-                model.load_weights(weights_file)
-                print("✓ Loaded from architecture + weights")
-                break
-            except Exception as e:
-                print(f"⚠ Could not load from {weights_file}: {e}")
-
-if model is None:
-    print("ERROR: Could not load model! Run fix_model_compatibility.py first.")
+import argparse
+from inference_backends import BackendError, add_backend_arguments, backend_from_args
+from model_bundle import BundleError, preprocess_roi
+
+parser = argparse.ArgumentParser(description="Live gesture recognition test")
+add_backend_arguments(parser, default_backend="keras")
+args = parser.parse_args()
+
+# Load the model through the selected backend (Keras tries the compatible H5,
+# the original H5, then architecture + weights)
+try:
+    backend = backend_from_args(args)
+except (BackendError, BundleError) as e:
+    print(f"ERROR: Could not load model! {e}")
     exit(1)
 
-# Get gesture class names
-if os.path.exists("class_names.txt"):
-    gesture_classes = []
-    with open("class_names.txt", 'r') as f:
-        gesture_classes = [line.strip() for line in f.readlines()]
-else:
-    gesture_classes = sorted(os.listdir("dataset"))
+gesture_classes = backend.classes
+IMG_SIZE = backend.img_size
+PREPROCESSING = backend.preprocessing
 
-print(f"Loaded model with classes: {gesture_classes}")
-
-IMG_SIZE = 128
+print(f"Loaded model with classes: {gesture_classes} (from {backend.metadata['source']})")
+print(f"Backend: {backend.describe()}")
 
 # Try external webcam (usually index 1)
 cap = cv2.VideoCapture(1)
@@ -88,12 +49,10 @@ while True:
 
     # Extract and preprocess ROI
     roi = frame[100:400, 100:400]
-    roi_resized = cv2.resize(roi, (IMG_SIZE, IMG_SIZE))
-    roi_normalized = roi_resized / 255.0
-    roi_input = np.expand_dims(roi_normalized, axis=0)
+    roi_input = preprocess_roi(roi, IMG_SIZE, PREPROCESSING)
 
     # Predict
-    predictions = model.predict(roi_input, verbose=0)
+    predictions = backend.predict(roi_input)
     predicted_class_idx = np.argmax(predictions[0])
     confidence = predictions[0][predicted_class_idx] * 100
     predicted_gesture = gesture_classes[predicted_class_idx]
@@ -120,4 +79,5 @@ while True:
         break
 
 cap.release()
+backend.close()
 cv2.destroyAllWindows()
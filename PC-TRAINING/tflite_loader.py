@@ -0,0 +1,165 @@
+"""
+Lightweight TFLite Interpreter Loading
+
+Importing full TensorFlow just to reach tf.lite.Interpreter costs seconds and
+hundreds of MB of RSS on the Nano. get_interpreter_class() prefers the small
+tflite_runtime package and only falls back to TensorFlow when it is missing;
+nothing is imported until the interpreter is actually needed.
+
+StartupTimer records the import / load / first-invoke breakdown that every
+runtime prints on launch and appends to startup_metrics.jsonl, so startup
+regressions show up in the log instead of in the field. Its clock starts
+at process start (from /proc), so the interpreter start and the module
+imports before the timer exists show up as the first phase.
+"""
+import json
+import os
+import threading
+import time
+
+STARTUP_LOG = "startup_metrics.jsonl"
+
+_interpreter_class = None
+_interpreter_source = None
+
+
+def get_interpreter_class():
+    """
+    Return an Interpreter class, importing it on first use.
+    Order: tflite_runtime, then tensorflow.lite (set TFLITE_BACKEND=tensorflow to force TF).
+    """
+    global _interpreter_class, _interpreter_source
+    if _interpreter_class is not None:
+        return _interpreter_class
+
+    if os.environ.get("TFLITE_BACKEND", "").lower() != "tensorflow":
+        try:
+            from tflite_runtime.interpreter import Interpreter
+            _interpreter_class = Interpreter
+            _interpreter_source = "tflite_runtime"
+            return _interpreter_class
+        except ImportError:
+            pass
+
+    import tensorflow as tf
+    _interpreter_class = tf.lite.Interpreter
+    _interpreter_source = f"tensorflow {tf.__version__}"
+    return _interpreter_class
+
+
+def interpreter_source():
+    """Name of the package the interpreter came from (None before first import)"""
+    return _interpreter_source
+
+
+def make_interpreter(model_path=None, model_content=None, num_threads=None):
+    """Create an interpreter, passing num_threads only where the installed version supports it"""
+    interpreter_class = get_interpreter_class()
+    kwargs = {"model_path": model_path} if model_path else {"model_content": model_content}
+    if num_threads:
+        try:
+            return interpreter_class(num_threads=num_threads, **kwargs)
+        except TypeError:
+            pass
+    return interpreter_class(**kwargs)
+
+
+def warm_up(interpreter):
+    """Run one invoke on zeros so the first real frame does not pay allocation costs"""
+    import numpy as np
+    input_details = interpreter.get_input_details()[0]
+    interpreter.set_tensor(input_details['index'],
+                           np.zeros(input_details['shape'], dtype=input_details['dtype']))
+    interpreter.invoke()
+
+
+def rss_mb():
+    """Resident set size of this process in MB (Linux only, None elsewhere)"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def process_start_time():
+    """Wall-clock time this process started (Linux only, None elsewhere)"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()  # The command name may contain spaces
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")  # starttime: ticks after boot
+    except (OSError, IndexError, ValueError):
+        return None
+    return time.time() - (uptime - started)
+
+
+class StartupTimer:
+    """
+    Collect named startup phases and report them once.
+    mark() closes sequential phases; timed() measures a call and may be used
+    from several threads at once when initialization runs concurrently.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = []
+        self._lock = threading.Lock()
+        self.last = time.time()
+        started = process_start_time()
+        if started is not None and started <= self.last:
+            self.start = started
+            self.record("imports", self.last - started)  # Interpreter start and module imports
+        else:
+            self.start = self.last
+
+    def mark(self, phase):
+        """Close the current phase under the given name"""
+        now = time.time()
+        self.record(phase, now - self.last)
+        self.last = now
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self.phases.append((phase, seconds))
+
+    def timed(self, phase, func, *args, **kwargs):
+        """Run func and record its duration under phase"""
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(phase, time.time() - start)
+
+    def total(self):
+        """Wall time since the process started (since the timer was created where /proc is missing)"""
+        return time.time() - self.start
+
+    def report(self, log_path=STARTUP_LOG, **extra):
+        """Print the breakdown and append it as one JSON line to log_path"""
+        rss = rss_mb()
+        total = self.total()
+        breakdown = "  ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases)
+        print(f"⏱ Startup: {breakdown}  | total {total * 1000:.0f}ms"
+              + (f" | RSS {rss:.0f} MB" if rss is not None else ""))
+
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "script": self.name,
+            "interpreter": _interpreter_source,
+            "phases_ms": {phase: round(seconds * 1000, 1) for phase, seconds in self.phases},
+            "total_ms": round(total * 1000, 1),
+            "rss_mb": round(rss, 1) if rss is not None else None,
+        }
+        record.update(extra)
+        if log_path:
+            try:
+                with open(log_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"⚠ Could not write {log_path}: {e}")
+        return record
@@ -0,0 +1,293 @@
+"""
+Early-Exit Cascade: Stage-1 Model Training and Threshold Tuning
+
+Most frames are either empty or an obvious pose, yet every frame pays for
+MobileNetV2 at 128 px. This trains a tiny CNN on 48 px copies of the same
+preprocessed input, with the gesture classes plus "background" (no hand,
+images from collect_data.py with gesture_name = "background").
+
+Exit thresholds are tuned per stage-1 class on the validation split: the lowest
+confidence at which frames answered by stage 1 are still right at least
+TARGET_PRECISION of the time (and no worse than the full model on that class).
+Classes without enough validation support never exit. Thresholds, per-stage
+invocation rates and the estimated cost per frame are stored in the stage-1
+bundle and written to cascade_report.json.
+
+Usage:
+    python train_cascade.py                              # train + tune + report
+    python train_cascade.py --tune-only                  # re-tune after retraining the full model
+    python3 media_control_mpv.py --backend cascade       # gesture_stage1.gmb -> gesture_model.gmb
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from evaluate_model import load_samples
+from model_analyzer import analyze_exports
+from model_bundle import preprocess_roi, update_bundle_metadata, write_bundle
+
+# ==================== CONFIGURATION ====================
+STAGE1_SIZE = 48
+STAGE1_FILE = "gesture_stage1.gmb"
+FULL_MODEL = "gesture_model.gmb"
+BACKGROUND_DIR = "background"
+BACKGROUND_CLASS = "background"
+SPLIT_FILE = "dataset_split.json"
+REPORT_FILE = "cascade_report.json"
+TARGET_PRECISION = 0.99   # Frames answered by stage 1 must be this accurate
+MIN_SUPPORT = 20          # Validation frames a class needs before it may exit early
+RUNTIME_THRESHOLD = 0.90  # Confidence at which the runtime acts (gesture exit floor, false triggers)
+VAL_FRACTION = 0.2
+SEED = 42
+EPOCHS = 30
+BATCH_SIZE = 32
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# ==================== DATA ====================
+def load_cascade_samples(split_file=SPLIT_FILE, data_dir="dataset", background_dir=BACKGROUND_DIR):
+    """(train, val) lists of (path, class); background images get their own seeded split"""
+    if os.path.exists(split_file):
+        train, val = load_samples(split_file=split_file, subset='train'), load_samples(split_file=split_file)
+    else:
+        print(f"⚠ {split_file} not found - random {VAL_FRACTION:.0%} split (run dataset_index.py)")
+        samples = load_samples(data_dir)
+        order = np.random.RandomState(SEED).permutation(len(samples))
+        cut = int(len(samples) * VAL_FRACTION)
+        val = [samples[i] for i in order[:cut]]
+        train = [samples[i] for i in order[cut:]]
+
+    background = []
+    if os.path.isdir(background_dir):
+        background = [(os.path.join(background_dir, name), BACKGROUND_CLASS)
+                      for name in sorted(os.listdir(background_dir)) if name.lower().endswith(IMAGE_EXTENSIONS)]
+    order = np.random.RandomState(SEED).permutation(len(background))
+    cut = int(len(background) * VAL_FRACTION)
+    val += [background[i] for i in order[:cut]]
+    train += [background[i] for i in order[cut:]]
+    return train, val
+
+
+def load_tensors(samples, classes, img_size, preprocessing):
+    """
+    Full-size tensors exactly as the runtime builds them; stage 1 gets the
+    same tensors resized, as CascadeBackend does.
+    """
+    tensors, labels = [], []
+    for path, class_name in samples:
+        image = cv2.imread(path)
+        if image is None or class_name not in classes:
+            continue
+        tensors.append(preprocess_roi(image, img_size, preprocessing)[0])
+        labels.append(classes.index(class_name))
+    return np.asarray(tensors, dtype=np.float32), np.asarray(labels)
+
+
+def downscale(tensors, size=STAGE1_SIZE):
+    return np.stack([cv2.resize(t, (size, size), interpolation=cv2.INTER_AREA) for t in tensors])
+
+
+# ==================== MODEL ====================
+def build_stage1(num_classes, size=STAGE1_SIZE):
+    import tensorflow as tf
+    model = tf.keras.Sequential([
+        tf.keras.layers.InputLayer(input_shape=(size, size, 3)),
+        tf.keras.layers.Conv2D(16, 3, strides=2, padding='same', activation='relu'),
+        tf.keras.layers.Conv2D(32, 3, strides=2, padding='same', activation='relu'),
+        tf.keras.layers.Conv2D(64, 3, strides=2, padding='same', activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.Dense(num_classes, activation='softmax'),
+    ])
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def convert_stage1(model):
+    """Builtin ops only, like the v1 full model, so it runs on the Nano's TF 2.3"""
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+    return converter.convert()
+
+
+# ==================== TUNING ====================
+def tune_exit_thresholds(probs, labels, classes, full_precision=None, target=TARGET_PRECISION,
+                         min_support=MIN_SUPPORT):
+    """
+    Lowest confidence per stage-1 class at which its early answers reach the
+    target precision (or the full model's precision on that class, if higher).
+    Gesture exits never go below the runtime threshold, or an early answer
+    could block a command the full model would have sent. Classes that never
+    qualify get 2.0, i.e. never exit.
+    """
+    top = np.argmax(probs, axis=1)
+    confidence = probs[np.arange(len(probs)), top]
+    correct = top == labels
+    thresholds = {}
+    for index, name in enumerate(classes):
+        required = max(target, (full_precision or {}).get(name, 0.0))
+        floor = 0.0 if name == BACKGROUND_CLASS else RUNTIME_THRESHOLD
+        mask = (top == index) & (confidence >= floor)
+        order = np.argsort(-confidence[mask])
+        hits = np.cumsum(correct[mask][order])
+        counts = np.arange(1, len(order) + 1)
+        # Largest prefix (most confident first) whose precision still meets the requirement
+        ok = (hits / counts >= required) & (counts >= min_support)
+        thresholds[name] = round(float(confidence[mask][order][ok.nonzero()[0][-1]]), 4) if ok.any() else 2.0
+    return thresholds
+
+
+def time_backend(backend, size, repeats=50):
+    batch = np.random.rand(1, size, size, 3).astype(np.float32)
+    backend.predict(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backend.predict(batch)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def cascade_report(stage1_probs, full_probs, labels, stage1_classes, thresholds, stage1_ms, full_ms):
+    """Exit rates, accuracy and estimated cost of the cascade against the full model alone"""
+    background = stage1_classes.index(BACKGROUND_CLASS)
+    gestures = [i for i, name in enumerate(stage1_classes) if i != background]
+    top = np.argmax(stage1_probs, axis=1)
+    limits = np.array([thresholds[name] for name in stage1_classes])
+    exits = stage1_probs[np.arange(len(top)), top] >= limits[top]
+    background_exit = exits & (top == background)
+    gesture_exit = exits & (top != background)
+
+    # Cascade output in full-model class order
+    cascade_probs = full_probs.copy()
+    cascade_probs[background_exit] = 1.0 / len(gestures)
+    answered = stage1_probs[gesture_exit][:, gestures]
+    cascade_probs[gesture_exit] = answered / answered.sum(axis=1, keepdims=True)
+
+    is_gesture = labels != background
+    full_label = np.array([gestures.index(label) if label != background else -1 for label in labels])
+    full_rate = float(np.mean(~exits))
+
+    def accuracy(probs):
+        return round(float(np.mean(np.argmax(probs[is_gesture], axis=1) == full_label[is_gesture])), 4)
+
+    def false_triggers(probs):
+        if not (~is_gesture).any():
+            return None
+        return round(float(np.mean(probs[~is_gesture].max(axis=1) >= RUNTIME_THRESHOLD)), 4)
+
+    return {
+        "frames": int(len(labels)),
+        "exit_thresholds": thresholds,
+        "rates": {
+            "stage1": 1.0,
+            "background_exit": round(float(np.mean(background_exit)), 4),
+            "gesture_exit": round(float(np.mean(gesture_exit)), 4),
+            "full": round(full_rate, 4),
+        },
+        "per_class_exit_rate": {name: round(float(np.mean(exits[labels == i])), 4)
+                                for i, name in enumerate(stage1_classes) if (labels == i).any()},
+        "gesture_accuracy": {"full_model": accuracy(full_probs), "cascade": accuracy(cascade_probs)},
+        "background_false_trigger_rate": {"full_model": false_triggers(full_probs),
+                                          "cascade": false_triggers(cascade_probs)},
+        "cost_ms_per_frame": {
+            "stage1": round(stage1_ms, 3),
+            "full_model": round(full_ms, 3),
+            "cascade": round(stage1_ms + full_rate * full_ms, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and tune the early-exit cascade stage-1 model")
+    parser.add_argument("--full-model", default=FULL_MODEL, help="model the cascade falls back to")
+    parser.add_argument("--output", default=STAGE1_FILE)
+    parser.add_argument("--split", default=SPLIT_FILE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--target-precision", type=float, default=TARGET_PRECISION)
+    parser.add_argument("--tune-only", action="store_true", help="keep the stage-1 model, re-tune thresholds")
+    args = parser.parse_args()
+
+    from inference_backends import create_backend
+
+    full = create_backend("auto", args.full_model, max_batch=BATCH_SIZE)
+    classes = list(full.classes)
+    stage1_classes = classes + [BACKGROUND_CLASS]
+    print("=" * 60)
+    print("EARLY-EXIT CASCADE")
+    print("=" * 60)
+    print(f"Full model: {full.describe()}")
+
+    train, val = load_cascade_samples(args.split)
+    x_val, y_val = load_tensors(val, stage1_classes, full.img_size, full.preprocessing)
+    if not (y_val == len(classes)).any():
+        print(f"⚠ No '{BACKGROUND_CLASS}' images: stage 1 can only exit on confident poses "
+              f"(collect some with gesture_name = \"{BACKGROUND_CLASS}\")")
+
+    if not args.tune_only:
+        x_train, y_train = load_tensors(train, stage1_classes, full.img_size, full.preprocessing)
+        print(f"Training stage 1 ({STAGE1_SIZE}px) on {len(y_train)} images, validating on {len(y_val)}")
+        model = build_stage1(len(stage1_classes))
+        model.fit(downscale(x_train), y_train, validation_data=(downscale(x_val), y_val),
+                  epochs=args.epochs, batch_size=BATCH_SIZE, verbose=2)
+        write_bundle(args.output, convert_stage1(model), stage1_classes, STAGE1_SIZE,
+                     preprocessing=full.preprocessing)
+        print(f"✓ Stage-1 bundle saved: {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+        analyze_exports([args.output])
+
+    stage1 = create_backend("tflite", args.output, max_batch=BATCH_SIZE)
+    if list(stage1.classes) != stage1_classes:
+        print(f"❌ ERROR: {args.output} classes {stage1.classes} do not match {stage1_classes}")
+        exit(1)
+    stage1_probs = np.concatenate([stage1.predict(downscale(x_val[i:i + BATCH_SIZE]))
+                                   for i in range(0, len(x_val), BATCH_SIZE)])
+    full_probs = np.concatenate([full.predict(x_val[i:i + BATCH_SIZE])
+                                 for i in range(0, len(x_val), BATCH_SIZE)])
+
+    # Full model precision per class, so stage 1 never answers worse than it
+    full_top = np.argmax(full_probs, axis=1)
+    full_precision = {name: float(np.mean(y_val[full_top == i] == i))
+                      for i, name in enumerate(classes) if (full_top == i).any()}
+    thresholds = tune_exit_thresholds(stage1_probs, y_val, stage1_classes, full_precision,
+                                      args.target_precision)
+
+    timed = create_backend("tflite", args.output)
+    stage1_ms = time_backend(timed, STAGE1_SIZE)
+    timed.close()
+    timed = create_backend("auto", args.full_model)
+    full_ms = time_backend(timed, full.img_size)
+    timed.close()
+    report = cascade_report(stage1_probs, full_probs, y_val, stage1_classes, thresholds, stage1_ms, full_ms)
+    report.update({"stage1_model": args.output, "full_model": args.full_model,
+                   "target_precision": args.target_precision})
+    stage1.close()
+    full.close()
+
+    update_bundle_metadata(args.output, cascade={
+        "background_class": BACKGROUND_CLASS,
+        "full_model": os.path.relpath(os.path.abspath(args.full_model),
+                                      os.path.dirname(os.path.abspath(args.output))),
+        "exit_thresholds": thresholds,
+        "rates": report["rates"],
+    })
+    with open(REPORT_FILE, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\nExit thresholds:")
+    for name, threshold in thresholds.items():
+        print(f"  {name:12} " + (f"{threshold:.3f}" if threshold <= 1.0 else "never exits"))
+    rates, cost = report["rates"], report["cost_ms_per_frame"]
+    print(f"\nStage 1 answers {(1 - rates['full']) * 100:.1f}% of frames "
+          f"({rates['background_exit'] * 100:.1f}% background, {rates['gesture_exit'] * 100:.1f}% poses)")
+    print(f"Gesture accuracy: full {report['gesture_accuracy']['full_model'] * 100:.2f}% | "
+          f"cascade {report['gesture_accuracy']['cascade'] * 100:.2f}%")
+    print(f"Cost per frame: {cost['full_model']:.2f} ms → {cost['cascade']:.2f} ms "
+          f"(stage 1 {cost['stage1']:.2f} ms + {rates['full'] * 100:.0f}% × full)")
+    print(f"\n✓ Thresholds stored in {args.output}, report saved: {REPORT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
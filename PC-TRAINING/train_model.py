@@ -15,31 +15,66 @@ if gpus:
 IMG_SIZE = 128
 BATCH_SIZE = 8  # Reduced from 16 for Jetson Nano's limited memory
 
-train_datagen = ImageDataGenerator(
-    rescale=1./255,
-    validation_split=0.2
-)
+SPLIT_FILE = "dataset_split.json"  # Group-aware split written by dataset_index.py
 
-train_generator = train_datagen.flow_from_directory(
-    "dataset",
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='training'
-)
 
-val_generator = train_datagen.flow_from_directory(
-    "dataset",
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='validation'
-)
+def load_image(path, label):
+    """Decode and scale one image the same way ImageDataGenerator does"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, (IMG_SIZE, IMG_SIZE), method='nearest')
+    return tf.cast(image, tf.float32) / 255.0, tf.one_hot(label, num_classes)
+
+
+def make_dataset(items, shuffle):
+    """Build a batched tf.data pipeline from [(path, class_name)]"""
+    paths = [path for path, _ in items]
+    labels = [class_names.index(class_name) for _, class_name in items]
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), seed=42, reshuffle_each_iteration=True)
+    dataset = dataset.map(load_image, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    return dataset.batch(BATCH_SIZE).prefetch(tf.data.experimental.AUTOTUNE)
+
+
+if os.path.exists(SPLIT_FILE):
+    # Near-duplicate frames never straddle train/val with this split
+    from dataset_index import load_split
+    class_names, train_items, val_items = load_split(SPLIT_FILE)
+    num_classes = len(class_names)
+    print(f"Using group-aware split from {SPLIT_FILE}: "
+          f"{len(train_items)} train / {len(val_items)} val images")
+    train_generator = make_dataset(train_items, shuffle=True)
+    val_generator = make_dataset(val_items, shuffle=False)
+else:
+    print(f"⚠ {SPLIT_FILE} not found - splitting by file order "
+          f"(run dataset_index.py to avoid near-duplicate leakage)")
+    train_datagen = ImageDataGenerator(
+        rescale=1./255,
+        validation_split=0.2
+    )
+
+    train_generator = train_datagen.flow_from_directory(
+        "dataset",
+        target_size=(IMG_SIZE, IMG_SIZE),
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='training'
+    )
+
+    val_generator = train_datagen.flow_from_directory(
+        "dataset",
+        target_size=(IMG_SIZE, IMG_SIZE),
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='validation'
+    )
+
+    # Auto-detect number of classes from dataset
+    class_names = list(train_generator.class_indices.keys())
+    num_classes = len(class_names)
 
-# Auto-detect number of classes from dataset
-num_classes = len(train_generator.class_indices)
 print(f"Number of classes detected: {num_classes}")
-print(f"Classes: {list(train_generator.class_indices.keys())}")
+print(f"Classes: {class_names}")
 
 base_model = tf.keras.applications.MobileNetV2(
     input_shape=(IMG_SIZE, IMG_SIZE, 3),
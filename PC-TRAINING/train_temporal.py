@@ -0,0 +1,208 @@
+"""
+Train the Temporal (Motion) Gesture Head
+
+Clips recorded with collect_data.py ('c', gesture_name = swipe_left /
+swipe_right / none) are embedded with the exported backbone - the same
+gesture_backbone.gmb the runtime uses, so the head sees exactly the runtime
+features - and a small Dense -> Conv1D -> max-pool -> Dense model is trained
+on time-resampled windows. The weights are exported as a NumPy head
+(temporal_head.py) with a temperature fitted on the validation clips.
+
+Embeddings are cached per clip (keyed by the backbone checksum), so retraining
+after recording a few more clips only embeds the new ones.
+
+Usage:
+    python train_temporal.py
+    python train_temporal.py --backbone gesture_backbone.gmb --epochs 80
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from calibration import fit_calibration, print_summary
+from model_bundle import load_bundle, preprocess_roi
+from temporal_head import (NONE_CLASS, TEMPORAL_HEAD_FILE, WINDOW_SECONDS, WINDOW_STEPS,
+                           TemporalHead, resample_window, write_temporal_head)
+
+# ==================== CONFIGURATION ====================
+CLIPS_DIR = "clips"
+PROJECTION_DIM = 32     # Per-frame projection of the 1280-d embedding
+CONV_FILTERS = 32
+CONV_KERNEL = 3
+WINDOWS_PER_CLIP = 8    # Augmented windows drawn from every clip per epoch set
+SPEED_RANGE = (0.8, 1.25)  # Random time scaling (slower/faster motions)
+VAL_FRACTION = 0.2
+SEED = 42
+EPOCHS = 60
+BATCH_SIZE = 32
+
+
+# ==================== DATA ====================
+def list_clips(clips_dir=CLIPS_DIR):
+    """[(clip_dir, class_name)] for every clip with a clip.json"""
+    clips = []
+    for class_name in sorted(os.listdir(clips_dir)):
+        class_dir = os.path.join(clips_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for clip_name in sorted(os.listdir(class_dir)):
+            clip_dir = os.path.join(class_dir, clip_name)
+            if os.path.exists(os.path.join(clip_dir, "clip.json")):
+                clips.append((clip_dir, class_name))
+    return clips
+
+
+def embed_clip(clip_dir, backend, backbone_sha):
+    """(embeddings, timestamps) of one clip, cached next to it"""
+    import cv2
+    cache_path = os.path.join(clip_dir, f"embeddings-{backbone_sha[:12]}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            return data["embeddings"], data["timestamps"]
+
+    with open(os.path.join(clip_dir, "clip.json"), "r") as f:
+        clip = json.load(f)
+    rois, timestamps = [], []
+    for name, timestamp in zip(clip["frames"], clip["timestamps"]):
+        image = cv2.imread(os.path.join(clip_dir, name))
+        if image is not None:
+            rois.append(preprocess_roi(image, backend.img_size, backend.preprocessing))
+            timestamps.append(timestamp)
+    if not rois:
+        return None, None
+    embeddings = np.concatenate([backend.embed(np.concatenate(rois[i:i + BATCH_SIZE]))
+                                 for i in range(0, len(rois), BATCH_SIZE)])
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    np.savez(cache_path, embeddings=embeddings, timestamps=timestamps)
+    return embeddings, timestamps
+
+
+def clip_windows(embeddings, timestamps, count, rng, steps=WINDOW_STEPS, duration=WINDOW_SECONDS):
+    """
+    Augmented windows from one clip: random speed scaling and random end time
+    (the motion lands at different positions in the window).
+    """
+    windows = []
+    for _ in range(count * 4):
+        if len(windows) == count:
+            break
+        scaled = timestamps * rng.uniform(*SPEED_RANGE)
+        if scaled[-1] - scaled[0] < duration:
+            continue
+        end_time = rng.uniform(scaled[0] + duration, scaled[-1])
+        window = resample_window(embeddings, scaled, end_time, steps, duration)
+        if window is not None:
+            windows.append(window)
+    return windows
+
+
+def build_windows(clips, classes, count, rng):
+    windows, labels = [], []
+    for embeddings, timestamps, class_name in clips:
+        for window in clip_windows(embeddings, timestamps, count, rng):
+            windows.append(window)
+            labels.append(classes.index(class_name))
+    return np.asarray(windows, dtype=np.float32), np.asarray(labels)
+
+
+# ==================== MODEL ====================
+def build_model(steps, dim, num_classes):
+    import tensorflow as tf
+    inputs = tf.keras.Input((steps, dim))
+    x = tf.keras.layers.Dense(PROJECTION_DIM, activation='relu', name='projection')(inputs)
+    x = tf.keras.layers.Conv1D(CONV_FILTERS, CONV_KERNEL, activation='relu', name='conv')(x)
+    x = tf.keras.layers.GlobalMaxPooling1D()(x)
+    x = tf.keras.layers.Dropout(0.3)(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation='softmax', name='output')(x)
+    model = tf.keras.Model(inputs, outputs)
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def export_layers(model):
+    """Keras weights in the layout TemporalHead expects"""
+    projection_w, projection_b = model.get_layer('projection').get_weights()
+    conv_w, conv_b = model.get_layer('conv').get_weights()
+    output_w, output_b = model.get_layer('output').get_weights()
+    return {"projection_w": projection_w, "projection_b": projection_b,
+            "conv_w": conv_w, "conv_b": conv_b,
+            "output_w": output_w, "output_b": output_b}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the temporal (motion) gesture head")
+    parser.add_argument("--clips", default=CLIPS_DIR)
+    parser.add_argument("--backbone", default="gesture_backbone.gmb",
+                        help="backbone bundle from the converters (split export)")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--output", default=TEMPORAL_HEAD_FILE)
+    args = parser.parse_args()
+
+    from inference_backends import create_backend
+
+    clips = list_clips(args.clips)
+    classes = sorted({class_name for _, class_name in clips})
+    print("=" * 60)
+    print("TEMPORAL GESTURE HEAD TRAINING")
+    print("=" * 60)
+    print(f"Clips: {len(clips)} | Classes: {classes}")
+    if NONE_CLASS not in classes:
+        print(f"⚠ No '{NONE_CLASS}' clips: every window will be classified as a motion gesture")
+    if len(classes) < 2:
+        print("❌ ERROR: Need clips of at least two classes (record them with collect_data.py)")
+        exit(1)
+
+    backend = create_backend("split", args.backbone, max_batch=BATCH_SIZE)
+    bundle = load_bundle(args.backbone, verify=False)
+    backbone_sha = bundle.metadata["model"]["sha256"]
+    bundle.close()
+    print(f"✓ Backbone: {backend.describe()}")
+
+    embedded = []
+    for clip_dir, class_name in clips:
+        embeddings, timestamps = embed_clip(clip_dir, backend, backbone_sha)
+        if embeddings is not None:
+            embedded.append((embeddings, timestamps, class_name))
+    backend.close()
+    print(f"✓ Embedded {len(embedded)} clips")
+
+    # Split by clip so augmented windows of one recording never straddle train and val
+    rng = np.random.RandomState(SEED)
+    order = rng.permutation(len(embedded))
+    val_count = max(1, int(len(embedded) * VAL_FRACTION))
+    val_clips = [embedded[i] for i in order[:val_count]]
+    train_clips = [embedded[i] for i in order[val_count:]]
+    x_train, y_train = build_windows(train_clips, classes, WINDOWS_PER_CLIP, rng)
+    x_val, y_val = build_windows(val_clips, classes, WINDOWS_PER_CLIP, rng)
+    if not len(x_train) or not len(x_val):
+        print(f"❌ ERROR: Clips are shorter than the {WINDOW_SECONDS}s window")
+        exit(1)
+    print(f"Windows: {len(x_train)} train / {len(x_val)} val "
+          f"({WINDOW_STEPS} steps over {WINDOW_SECONDS}s)")
+
+    model = build_model(WINDOW_STEPS, x_train.shape[-1], len(classes))
+    model.fit(x_train, y_train, validation_data=(x_val, y_val), epochs=args.epochs,
+              batch_size=BATCH_SIZE, verbose=2)
+
+    layers = export_layers(model)
+    head = TemporalHead(layers, classes)
+    keras_probs = model.predict(x_val, verbose=0)
+    numpy_probs = head.predict(x_val)
+    print(f"\n✓ NumPy head matches Keras: max |Δ| {np.max(np.abs(keras_probs - numpy_probs)):.2e}")
+    accuracy = float(np.mean(np.argmax(numpy_probs, axis=1) == y_val))
+    print(f"✓ Validation accuracy: {accuracy * 100:.2f}%")
+
+    calibration = fit_calibration(numpy_probs, y_val, source=f"{args.clips}:val")
+    print_summary(calibration)
+    write_temporal_head(args.output, layers, classes, calibration=calibration,
+                        extra={"backbone": os.path.basename(args.backbone),
+                               "backbone_sha256": backbone_sha,
+                               "val_accuracy": round(accuracy, 4)})
+    print(f"\n✓ Temporal head saved: {args.output}")
+    print(f"  Run: python3 media_control_mpv.py --backend split --temporal-head {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""
+Per-Class Threshold / Hold-Time / Cooldown Tuning
+
+One global confidence threshold and hold time has to suit the most confused
+class. This grid-searches them per class on recorded session traces
+(media_control_mpv.py --trace) and writes decision_config.json, which the
+runtimes load into GestureDecider.
+
+Labels: one CSV per trace (default <trace name>.labels.csv), one row per
+interval in which a gesture was really shown, in seconds from trace start:
+
+    start,end,gesture
+    12.4,14.0,volume_up
+    20.1,21.3,stop
+
+A fire of class g inside a g interval (plus LABEL_SLACK) counts as a hit,
+its delay from the interval start is the time-to-trigger; any other fire is
+a false trigger. For every class the hold timer is evaluated with NumPy over
+the whole trace for all thresholds at once per hold time; only the cooldown
+walks the (few) stable segments. The chosen settings minimize the median
+time-to-trigger per class while all classes together stay under the
+false-triggers-per-hour budget (the budget is shared out with one Lagrange
+multiplier).
+
+The grid search models each class on its own: play/stop fire once per hold
+with a cooldown, forward/reverse with their own cooldown. The runtime couples
+them (play/stop follow the play state, forward/reverse share one cooldown and
+the same one cannot fire twice without a release), so the metrics reported
+and saved for the baseline and the chosen settings come from replaying every
+trace through GestureDecider itself (session_trace.replay_decisions). When
+the replay exceeds the budget the search runs again with a tighter one; a
+config that still does not fit is only written with --force.
+
+Usage:
+    python tune_decisions.py session1.trace session2.trace
+    python tune_decisions.py traces/*.trace --budget 1.0 --output decision_config.json
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from gesture_decider import (COMMAND_COOLDOWN, CONFIDENCE_THRESHOLD, DECISION_CONFIG_FILE,
+                             DECISION_CONFIG_VERSION, GESTURE_HOLD_TIME, REPEAT_GESTURES,
+                             VOLUME_CHANGE_INTERVAL, GestureDecider, create_decider)
+from session_trace import TraceReader, replay_decisions
+
+# ==================== CONFIGURATION ====================
+ACTION_GESTURES = ('play', 'stop', 'forward', 'reverse') + REPEAT_GESTURES  # Classes that send commands
+THRESHOLDS = np.concatenate([np.arange(50.0, 99.0, 2.0), [99.0, 99.5]])  # Percent
+HOLD_TIMES = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.7, 1.0)
+COOLDOWNS = (0.0, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0)
+MIN_REPEAT_INTERVAL = 0.25    # Repeat gestures need a real interval (0 would fire every frame)
+FALSE_TRIGGER_BUDGET = 2.0    # False triggers per hour, all classes together
+LABEL_SLACK = 0.5             # Seconds after an interval in which a fire still counts as a hit
+LAMBDAS = np.concatenate([[0.0], np.logspace(-3, 2, 51)])  # Seconds of delay per false trigger/hour
+MAX_RESEARCHES = 10           # Tighter searches when the GestureDecider replay exceeds the budget
+BUDGET_MARGIN = 0.9           # Extra tightening per search, so it does not land just above the budget again
+
+
+# ==================== DATA ====================
+def load_trace(path):
+    reader = TraceReader(path)
+    try:
+        records = list(reader.frames())
+        classes = reader.classes
+        decider = reader.header.get("decider") or {}
+    finally:
+        reader.close()
+    if not records:
+        return None
+    probs = np.stack([record.probs for record in records])
+    return {
+        "path": path,
+        "classes": classes,
+        "decider": decider,
+        "timestamps": np.array([record.timestamp for record in records], dtype=np.float64),
+        "probs": probs,
+        "top": probs.argmax(axis=1),
+        "confidence": probs.max(axis=1) * 100.0,
+    }
+
+
+def default_labels_path(trace_path):
+    return os.path.splitext(trace_path)[0] + ".labels.csv"
+
+
+def load_labels(path, t0):
+    """{gesture: (n, 2) array of absolute [start, end] times}, sorted by start"""
+    intervals = {}
+    with open(path, "r", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[0].strip().startswith("#"):
+                continue
+            try:
+                start, end = float(row[0]), float(row[1])
+            except ValueError:
+                continue  # Header row
+            intervals.setdefault(row[2].strip(), []).append((t0 + start, t0 + end))
+    return {gesture: np.array(sorted(rows)) for gesture, rows in intervals.items()}
+
+
+# ==================== DECISION LOGIC (vectorized) ====================
+def held_times(timestamps, active):
+    """
+    Seconds the decider has been holding each frame's gesture, -1 where it is
+    not: the first frame of a run only starts the timer, as in observe().
+    """
+    previous = np.concatenate(([False], active[:-1]))
+    starts = active & ~previous
+    run_start = np.maximum.accumulate(np.where(starts, timestamps, -np.inf))
+    return np.where(active & previous, timestamps - run_start, -1.0)
+
+
+def stable_segments(stable):
+    """(first, last) frame indexes of every run of stable frames"""
+    previous = np.concatenate(([False], stable[:-1]))
+    following = np.concatenate((stable[1:], [False]))
+    return np.flatnonzero(stable & ~previous), np.flatnonzero(stable & ~following)
+
+
+def fire_times(timestamps, firsts, lasts, cooldown, repeat):
+    """Timestamps at which act() fires within the stable segments"""
+    fires = []
+    last_fire = -np.inf
+    for first, last in zip(firsts, lasts):
+        index = first
+        while True:
+            if timestamps[index] - last_fire < cooldown:
+                index = int(np.searchsorted(timestamps, last_fire + cooldown, "left"))
+                if index > last:
+                    break
+            fires.append(timestamps[index])
+            last_fire = timestamps[index]
+            if not repeat:
+                break
+            index = int(np.searchsorted(timestamps, last_fire + cooldown, "left"))
+            if index > last:
+                break
+    return np.array(fires)
+
+
+def score_fires(fires, intervals, slack=LABEL_SLACK):
+    """(time-to-trigger per interval, inf when missed; number of false triggers)"""
+    if intervals is None or not len(intervals):
+        return np.zeros(0), len(fires)
+    ends = intervals[:, 1] + slack
+    if not len(fires):
+        return np.full(len(intervals), np.inf), 0
+    first = np.searchsorted(fires, intervals[:, 0], "left")
+    candidate = fires[np.minimum(first, len(fires) - 1)]
+    hit = (first < len(fires)) & (candidate <= ends)
+    ttt = np.where(hit, candidate - intervals[:, 0], np.inf)
+    owner = np.searchsorted(intervals[:, 0], fires, "right") - 1
+    inside = (owner >= 0) & (fires <= ends[np.maximum(owner, 0)])
+    return ttt, int(np.count_nonzero(~inside))
+
+
+def cooldowns_for(gesture):
+    return [c for c in COOLDOWNS if gesture not in REPEAT_GESTURES or c >= MIN_REPEAT_INTERVAL]
+
+
+def evaluate_class(traces, labels, class_index, gesture, thresholds, hold_times, cooldowns, slack=LABEL_SLACK):
+    """
+    Grid results for one class over all traces: time-to-trigger per labelled
+    interval (T, H, C, intervals) and false trigger counts (T, H, C).
+    """
+    repeat = gesture in REPEAT_GESTURES
+    shape = (len(thresholds), len(hold_times), len(cooldowns))
+    ttts, false = [], np.zeros(shape, dtype=np.int64)
+    for trace, trace_labels in zip(traces, labels):
+        timestamps = trace["timestamps"]
+        intervals = trace_labels.get(gesture)
+        n = 0 if intervals is None else len(intervals)
+        ttt = np.full(shape + (n,), np.inf)
+        is_class = trace["top"] == class_index
+        # (T, frames): hold timers for every threshold at once
+        held = np.stack([held_times(timestamps, is_class & (trace["confidence"] >= t)) for t in thresholds])
+        for h, hold in enumerate(hold_times):
+            stable = held >= hold
+            for t in range(len(thresholds)):
+                firsts, lasts = stable_segments(stable[t])
+                for c, cooldown in enumerate(cooldowns):
+                    fires = fire_times(timestamps, firsts, lasts, cooldown, repeat)
+                    ttt[t, h, c], false[t, h, c] = score_fires(fires, intervals, slack)
+        ttts.append(ttt)
+    return np.concatenate(ttts, axis=-1), false
+
+
+def summarize(ttt, false, hours):
+    """Median time-to-trigger (inf if most intervals are missed), recall, false triggers/hour"""
+    if ttt.shape[-1]:
+        median = np.median(ttt, axis=-1)
+        recall = np.mean(np.isfinite(ttt), axis=-1)
+    else:
+        median = np.full(false.shape, np.inf)
+        recall = np.zeros(false.shape)
+    return median, recall, false / max(hours, 1e-9)
+
+
+def replay_metrics(traces, labels, make_decider, gestures, hours, slack=LABEL_SLACK):
+    """Per-class metrics of the real decision logic: every trace replayed through a fresh make_decider()"""
+    ttts = {gesture: [] for gesture in gestures}
+    false = dict.fromkeys(gestures, 0)
+    for trace, trace_labels in zip(traces, labels):
+        frames = zip(range(len(trace["timestamps"])), trace["timestamps"], trace["probs"])
+        issued = replay_decisions(frames, trace["classes"], make_decider())
+        for gesture in gestures:
+            fires = np.array([timestamp for _, timestamp, sent in issued if sent == gesture])
+            ttt, count = score_fires(fires, trace_labels.get(gesture), slack)
+            ttts[gesture].append(ttt)
+            false[gesture] += count
+    metrics = {}
+    for gesture in gestures:
+        ttt = np.concatenate(ttts[gesture])
+        median, recall, rate = summarize(ttt, np.array(false[gesture]), hours)
+        metrics[gesture] = class_metrics(median, recall, rate, len(ttt))
+    return metrics
+
+
+def chosen_config(choice, grids):
+    """{gesture: settings} for the grid point allocate_budget picked per class"""
+    class_config = {}
+    for gesture, index in choice.items():
+        (thresholds, hold_times, cooldowns), intervals = grids[gesture]
+        t, h, c = np.unravel_index(index, (len(thresholds), len(hold_times), len(cooldowns)))
+        class_config[gesture] = {"confidence_threshold": float(thresholds[t]), "hold_time": float(hold_times[h]),
+                                 "cooldown": float(cooldowns[c])}
+    return class_config
+
+
+# ==================== BUDGET ====================
+def allocate_budget(candidates, budget, fixed_rate=0.0):
+    """
+    Pick one grid point per class: for each multiplier, every class minimizes
+    median + lambda * false_rate on its own; keep the best choice whose total
+    false-trigger rate fits the budget. Returns ({gesture: flat index}, feasible).
+    """
+    best, best_key = None, None
+    for lam in LAMBDAS:
+        choice, total_rate, medians = {}, fixed_rate, []
+        for gesture, (median, recall, rate) in candidates.items():
+            cost = median + lam * rate
+            # Ties: higher recall, fewer false triggers, then the first grid point (lowest cooldown)
+            index = int(np.lexsort((np.arange(cost.size), rate.ravel(), -recall.ravel(), cost.ravel()))[0])
+            choice[gesture] = index
+            total_rate += rate.ravel()[index]
+            medians.append(median.ravel()[index])
+        if total_rate > budget + 1e-9:
+            continue
+        finite = [m for m in medians if np.isfinite(m)]
+        key = (len(medians) - len(finite), sum(finite), total_rate)
+        if best_key is None or key < best_key:
+            best, best_key = choice, key
+    if best is not None:
+        return best, True
+    # Budget unreachable: fewest false triggers per class
+    return {gesture: int(np.lexsort((median.ravel(), rate.ravel()))[0])
+            for gesture, (median, recall, rate) in candidates.items()}, False
+
+
+# ==================== REPORT ====================
+def class_metrics(median, recall, rate, intervals):
+    return {
+        "intervals": int(intervals),
+        "recall": round(float(recall), 4),
+        "median_time_to_trigger": round(float(median), 3) if np.isfinite(median) else None,
+        "false_triggers_per_hour": round(float(rate), 3),
+    }
+
+
+def format_metrics(metrics):
+    median = metrics["median_time_to_trigger"]
+    return (f"recall {metrics['recall'] * 100:5.1f}% | TTT {median:.2f}s" if median is not None
+            else f"recall {metrics['recall'] * 100:5.1f}% | TTT    -  ") + \
+        f" | {metrics['false_triggers_per_hour']:.2f} false/h"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune per-class decision settings on labelled session traces")
+    parser.add_argument("traces", nargs="+", help="session traces from media_control_mpv.py --trace")
+    parser.add_argument("--labels", nargs="*", default=None,
+                        help="label CSVs in trace order (default: <trace>.labels.csv)")
+    parser.add_argument("--budget", type=float, default=FALSE_TRIGGER_BUDGET, help="false triggers per hour")
+    parser.add_argument("--slack", type=float, default=LABEL_SLACK)
+    parser.add_argument("--output", default=DECISION_CONFIG_FILE)
+    parser.add_argument("--force", action="store_true", help="save the config even if it exceeds the budget")
+    args = parser.parse_args()
+
+    label_paths = args.labels or [default_labels_path(path) for path in args.traces]
+    if len(label_paths) != len(args.traces):
+        parser.error("give one label file per trace")
+
+    traces, labels = [], []
+    for trace_path, label_path in zip(args.traces, label_paths):
+        trace = load_trace(trace_path)
+        if trace is None:
+            print(f"⚠ {trace_path} has no frames, skipped")
+            continue
+        if not os.path.exists(label_path):
+            print(f"⚠ {label_path} not found, skipping {trace_path}")
+            continue
+        if traces and trace["classes"] != traces[0]["classes"]:
+            print(f"❌ ERROR: {trace_path} classes {trace['classes']} differ from {traces[0]['classes']}")
+            exit(1)
+        traces.append(trace)
+        labels.append(load_labels(label_path, trace["timestamps"][0]))
+    if not traces:
+        print("❌ ERROR: No labelled traces")
+        exit(1)
+
+    classes = traces[0]["classes"]
+    hours = sum(trace["timestamps"][-1] - trace["timestamps"][0] for trace in traces) / 3600.0
+    recorded = dict(traces[0]["decider"])
+    settings = {"confidence_threshold": recorded.get("confidence_threshold", CONFIDENCE_THRESHOLD),
+                "hold_time": recorded.get("hold_time", GESTURE_HOLD_TIME),
+                "command_cooldown": recorded.get("command_cooldown", COMMAND_COOLDOWN),
+                "volume_interval": recorded.get("volume_interval", VOLUME_CHANGE_INTERVAL)}
+    base = GestureDecider(class_config=recorded.get("class_config"), **settings)
+    print("=" * 60)
+    print("DECISION TUNING")
+    print("=" * 60)
+    print(f"Traces: {len(traces)} | {sum(len(t['timestamps']) for t in traces)} frames over {hours * 60:.1f} min")
+    print(f"Budget: {args.budget:.2f} false triggers/hour | baseline: {base.confidence_threshold:.0f}% / "
+          f"{base.hold_time:.2f}s hold")
+
+    start = time.time()
+    gestures = [gesture for gesture in ACTION_GESTURES if gesture in classes]
+    baseline = replay_metrics(traces, labels, lambda: GestureDecider(class_config=recorded.get("class_config"),
+                                                                     **settings), gestures, hours, args.slack)
+    candidates, grids, fixed = {}, {}, {}
+    for gesture in gestures:
+        class_index = classes.index(gesture)
+        intervals = baseline[gesture]["intervals"]
+        if not intervals:
+            # Nothing to measure time-to-trigger on: keep the global settings, count their false triggers
+            fixed[gesture] = baseline[gesture]
+            continue
+        grid = (THRESHOLDS, HOLD_TIMES, cooldowns_for(gesture))
+        ttt, false = evaluate_class(traces, labels, class_index, gesture, *grid, slack=args.slack)
+        candidates[gesture] = summarize(ttt, false, hours)
+        grids[gesture] = (grid, intervals)
+    print(f"✓ Evaluated {sum(len(g[0][0]) * len(g[0][1]) * len(g[0][2]) for g in grids.values())} "
+          f"settings per trace in {time.time() - start:.1f}s")
+    if not candidates:
+        print("❌ ERROR: No labelled intervals for any command gesture")
+        exit(1)
+
+    fixed_rate = sum(m["false_triggers_per_hour"] for m in fixed.values())
+    search_budget = args.budget
+    for _ in range(MAX_RESEARCHES + 1):
+        choice, feasible = allocate_budget(candidates, search_budget, fixed_rate)
+        class_config = chosen_config(choice, grids)
+        # What the runtime will actually do with these settings (loaded as create_decider does)
+        metrics = replay_metrics(traces, labels, lambda: create_decider({"classes": class_config}, **settings),
+                                 gestures, hours, args.slack)
+        total_rate = sum(m["false_triggers_per_hour"] for m in metrics.values())
+        if total_rate <= args.budget + 1e-9 or not feasible:
+            break
+        # forward/reverse share a cooldown and play/stop follow the play state, which the search does not see
+        search_budget *= args.budget / total_rate * BUDGET_MARGIN
+        print(f"⚠ Replay: {total_rate:.2f} false triggers/hour; searching again with a "
+              f"{search_budget:.2f} budget")
+    over_budget = total_rate > args.budget + 1e-9
+    if over_budget and not feasible:
+        print(f"⚠ No settings meet {search_budget:.2f} false triggers/hour; using the fewest false triggers")
+
+    print(f"\n{'class':<12} {'settings':<24} before → after")
+    for gesture in metrics:
+        tuned = class_config.get(gesture)
+        label = (f"{tuned['confidence_threshold']:.1f}% {tuned['hold_time']:.2f}s "
+                 f"cd {tuned['cooldown']:.2f}s") if tuned else "global (no labels)"
+        print(f"{gesture:<12} {label:<24} {format_metrics(baseline[gesture])}")
+        if tuned:
+            print(f"{'':<37} → {format_metrics(metrics[gesture])}")
+    print(f"\nFalse triggers/hour: {sum(m['false_triggers_per_hour'] for m in baseline.values()):.2f} → "
+          f"{total_rate:.2f} (budget {args.budget:.2f}, replayed through GestureDecider)")
+    if over_budget and not args.force:
+        print(f"❌ ERROR: No config meets {args.budget:.2f} false triggers/hour in the replay; "
+              f"{args.output} not written (raise --budget, or --force to save it anyway)")
+        exit(1)
+    if over_budget:
+        print("⚠ Saving a config over the budget (--force)")
+
+    config = {
+        "format_version": DECISION_CONFIG_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "traces": [os.path.basename(trace["path"]) for trace in traces],
+        "hours": round(hours, 4),
+        "budget_false_triggers_per_hour": args.budget,
+        "search_budget_false_triggers_per_hour": round(search_budget, 4),
+        "label_slack": args.slack,
+        "classes": class_config,
+        "metrics": metrics,
+        "baseline": {"settings": recorded, "metrics": baseline},
+    }
+    tmp_path = args.output + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, args.output)
+    print(f"\n✓ Decision config saved: {args.output}")
+    print(f"  Jetson: copy it next to media_control_mpv.py (or pass --decision-config {args.output})")
+
+
+if __name__ == "__main__":
+    main()